@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Token-bucket bandwidth limit shared by all downloads of a run.
+
+Every downloaded chunk takes its size in tokens from one bucket that refills
+at the current rate, so the total download speed stays at or below the
+limit however many files and streams are running. The rate can follow a
+time-of-day schedule and can be changed while the downloader runs, and all
+downloads can be paused at their next chunk and resumed.
+"""
+
+import asyncio
+import time
+from datetime import datetime
+
+# Bucket size in seconds of the current rate: how far a pause lets later
+# downloads burst above the limit
+BURST_SECONDS = 1.0
+
+_UNSET = object()
+
+
+def parse_rate(value):
+    """Accept bytes/s as a number or a string like '2MB', '512KB', '1.5M'; None = unlimited."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    text = value.strip().upper().rstrip('/S').rstrip('B')
+    if text in ('', 'NONE', 'OFF', 'UNLIMITED'):
+        return None
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    if text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+class BandwidthLimiter:
+    """Shared token bucket; consume() waits until the bytes fit under the rate."""
+
+    def __init__(self, rate=None, schedule=None):
+        """
+        Args:
+            rate: Default limit in bytes per second (None = unlimited)
+            schedule: List of (start 'HH:MM', end 'HH:MM', rate) windows in local
+                time that override the default; a window may wrap past midnight
+        """
+        self.default_rate = parse_rate(rate)
+        self.schedule = [
+            (self._minutes(start), self._minutes(end), parse_rate(window_rate))
+            for start, end, window_rate in (schedule or [])
+        ]
+        self.override = _UNSET  # set_rate() value, takes precedence over the schedule
+        self.tokens = 0.0
+        self.bytes_total = 0
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._resumed = asyncio.Event()  # cleared while paused
+        self._resumed.set()
+
+    @staticmethod
+    def _minutes(hhmm):
+        hours, minutes = hhmm.split(':')
+        return int(hours) * 60 + int(minutes)
+
+    def current_rate(self):
+        """Limit in effect right now, in bytes per second (None = unlimited)."""
+        if self.override is not _UNSET:
+            return self.override
+
+        now = datetime.now()
+        minute = now.hour * 60 + now.minute
+        for start, end, rate in self.schedule:
+            in_window = start <= minute < end if start <= end else (minute >= start or minute < end)
+            if in_window:
+                return rate
+        return self.default_rate
+
+    def set_rate(self, rate):
+        """Change the limit while running (None = unlimited) until clear_override()."""
+        self.override = parse_rate(rate)
+
+    def clear_override(self):
+        """Go back to the default rate and schedule."""
+        self.override = _UNSET
+
+    @property
+    def paused(self):
+        return not self._resumed.is_set()
+
+    def pause(self):
+        """Hold every download at its next chunk until resume()."""
+        self._resumed.clear()
+
+    def resume(self):
+        self._resumed.set()
+
+    async def wait_resumed(self):
+        """Wait until the limiter is not paused."""
+        await self._resumed.wait()
+
+    def _refill(self):
+        now = time.monotonic()
+        rate = self.current_rate()
+        if rate:
+            self.tokens = min(rate * BURST_SECONDS, self.tokens + (now - self._last_refill) * rate)
+        else:
+            self.tokens = 0.0
+        self._last_refill = now
+        return rate
+
+    async def consume(self, nbytes):
+        """Account for nbytes just downloaded, waiting until the rate allows more."""
+        self.bytes_total += nbytes
+        if self.paused:
+            await self._resumed.wait()
+        if self.current_rate() is None:
+            return
+
+        # One waiter at a time, so streams get the bandwidth in arrival order
+        async with self._lock:
+            self._refill()
+            self.tokens -= nbytes
+            while self.tokens < 0:
+                rate = self._refill()
+                if not rate:
+                    break
+                # Short sleeps so a rate change or schedule switch applies quickly
+                await asyncio.sleep(min(1.0, -self.tokens / rate))
+
+    def progress_callback(self):
+        """A download_media progress callback that feeds this limiter."""
+        done = {'bytes': 0}
+
+        async def callback(current, total):
+            delta = current - done['bytes']
+            done['bytes'] = current
+            await self.consume(delta)
+        return callback
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark of keyword categorisation on a large synthetic file name corpus.
+
+Compares the compiled matcher behind organize_existing_files.categorize_file
+with the keyword-by-keyword loop it replaced, checks that both give the same
+category for every name, and reports names/s.
+
+Usage:
+    python benchmark_categorize.py
+    python benchmark_categorize.py --names 500000 --seed 3
+"""
+
+import argparse
+import random
+import time
+from collections import Counter
+
+from categorize_files import categorize_files_by_keywords
+from keyword_matcher import KeywordMatcher
+from organize_existing_files import CATEGORIES, categorize_file
+
+FILLER_WORDS = [
+    'final', 'revised', 'copy', 'scan', 'slides', 'week', 'module', 'part', 'version',
+    'kmtc', 'year', 'semester', 'group', 'handout', 'summary', 'intro', 'chapter',
+]
+EXTENSIONS = ['.pdf', '.PDF', '.docx', '.doc', '.pptx', '.ppt', '.jpg', '.png', '.mp4', '.mkv', '.txt', '']
+
+
+def make_corpus(count, seed=0):
+    """File names mixing category keywords (sometimes several, sometimes none) with filler."""
+    rng = random.Random(seed)
+    keywords = [keyword for words in CATEGORIES.values() for keyword in words]
+    names = []
+    for _ in range(count):
+        parts = [rng.choice(FILLER_WORDS) for _ in range(rng.randint(1, 4))]
+        for _ in range(rng.choice([0, 0, 1, 1, 1, 2, 3])):
+            keyword = rng.choice(keywords)
+            parts.insert(rng.randint(0, len(parts)), keyword.upper() if rng.random() < 0.2 else keyword)
+        parts.append(str(rng.randint(1, 999)))
+        separator = rng.choice([' ', '_', '-', ''])
+        names.append(separator.join(parts) + rng.choice(EXTENSIONS))
+    return names
+
+
+def categorize_file_loop(filename):
+    """The previous implementation: test every keyword of every category in turn."""
+    filename_lower = filename.lower()
+    for category, keywords in CATEGORIES.items():
+        for keyword in keywords:
+            if keyword in filename_lower:
+                return category
+    if filename_lower.endswith(('.jpg', '.jpeg', '.png', '.gif')):
+        return '19_Images_Photos'
+    elif filename_lower.endswith(('.mp4', '.avi', '.mov', '.mkv')):
+        return '20_Videos'
+    elif filename_lower.endswith(('.pdf', '.PDF')):
+        return '21_PDFs_Uncategorized'
+    elif filename_lower.endswith(('.doc', '.docx')):
+        return '22_Documents_Uncategorized'
+    elif filename_lower.endswith(('.ppt', '.pptx')):
+        return '23_Presentations_Uncategorized'
+    return '99_Uncategorized'
+
+
+def categorize_by_keywords_loop(metadata, categories):
+    """The previous categorize_files_by_keywords matching, returning (filename, category) pairs."""
+    result = []
+    for filename, data in metadata:
+        combined_text = f"{data.get('message_text', '').lower()} {filename.lower()}"
+        result.append((filename, next(
+            (category for category, keywords in categories.items()
+             if any(keyword.lower() in combined_text for keyword in keywords)),
+            'uncategorized'
+        )))
+    return result
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--names', type=int, default=200_000, help='file names in the corpus')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the corpus')
+    args = parser.parse_args()
+
+    names = make_corpus(args.names, args.seed)
+    keyword_count = sum(len(words) for words in CATEGORIES.values())
+    print(f"Corpus: {len(names)} file names, {len(CATEGORIES)} categories, {keyword_count} keywords\n")
+
+    _, compile_seconds = timed(KeywordMatcher, CATEGORIES)
+    old, old_seconds = timed(lambda: [categorize_file_loop(name) for name in names])
+    new, new_seconds = timed(lambda: [categorize_file(name) for name in names])
+    mismatches = sum(1 for a, b in zip(old, new) if a != b)
+
+    # categorize_files.categorize_files_by_keywords: captions plus file names
+    rng = random.Random(args.seed)
+    metadata = [(name, {'message_text': rng.choice(names)}) for name in names]
+    old_by_keywords, old_kw_seconds = timed(categorize_by_keywords_loop, metadata, CATEGORIES)
+    categorized, new_kw_seconds = timed(categorize_files_by_keywords, metadata, CATEGORIES)
+    # File names repeat in the corpus, so compare (name, category) pairs as multisets
+    new_by_keywords = [(info['filename'], category) for category, files in categorized.items() for info in files]
+    mismatches += sum((Counter(old_by_keywords) - Counter(new_by_keywords)).values())
+
+    print(f"{'Matcher':<38} {'Time (s)':>9} {'names/s':>12}")
+    print("-" * 61)
+    for label, seconds in [
+        ("categorize_file, keyword loop", old_seconds),
+        ("categorize_file, compiled", new_seconds),
+        ("categorize_files_by_keywords, loop", old_kw_seconds),
+        ("categorize_files_by_keywords, compiled", new_kw_seconds),
+    ]:
+        print(f"{label:<38} {seconds:>9.2f} {len(names) / seconds:>12,.0f}")
+    print("-" * 61)
+    print(f"Compiling the rules: {compile_seconds * 1000:.1f} ms")
+    print(f"Speed-up: {old_seconds / new_seconds:.1f}x (categorize_file), "
+          f"{old_kw_seconds / new_kw_seconds:.1f}x (categorize_files_by_keywords)")
+    print(f"Different results: {mismatches}")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
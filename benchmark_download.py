@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+End-to-end throughput benchmark of download_telegram_files.main.
+
+Runs the real downloader (scan, scheduler, workers, tracker store) against
+fake_telegram.FakeTelegramClient in a temporary folder and reports messages
+scanned/s, files/s, MB/s and the time spent saving the tracker.
+
+Usage:
+    python benchmark_download.py
+    python benchmark_download.py --messages 2000 --latency-ms 80 --scenarios small-files rescan
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import download_telegram_files as downloader
+from fake_telegram import FakeTelegramClient, make_channel
+
+KB = 1024
+MB = 1024 * 1024
+
+# name -> (description, channel options, client options, downloader settings)
+SCENARIOS = {
+    'small-files': (
+        "many small documents (latency-bound)",
+        {'min_size': 20 * KB, 'max_size': 400 * KB},
+        {},
+        {},
+    ),
+    'large-files': (
+        "few large documents (ranged downloads)",
+        {'min_size': 20 * MB, 'max_size': 40 * MB, 'count_divisor': 20},
+        {},
+        {},
+    ),
+    'multi-channel': (
+        "three channels sharing the workers",
+        {'min_size': 20 * KB, 'max_size': 400 * KB, 'channels': 3},
+        {},
+        {},
+    ),
+    'flaky': (
+        "2% of requests fail",
+        {'min_size': 20 * KB, 'max_size': 400 * KB},
+        {'error_rate': 0.02},
+        {},
+    ),
+    'flood': (
+        "1% of requests answered with a 1 s FloodWait",
+        {'min_size': 20 * KB, 'max_size': 400 * KB},
+        {'flood_rate': 0.01, 'flood_seconds': 1},
+        {},
+    ),
+    'duplicates': (
+        "30% of documents are re-uploads of earlier ones",
+        {'min_size': 20 * KB, 'max_size': 400 * KB, 'duplicate_ratio': 0.3},
+        {},
+        {},
+    ),
+    'rescan': (
+        "full rescan of an already downloaded channel (scan + tracker lookups only)",
+        {'min_size': 20 * KB, 'max_size': 400 * KB},
+        {},
+        {'prime': True},
+    ),
+}
+
+
+class TrackerTimer:
+    """Wraps tracker functions and adds up the time spent in them (outermost call only)."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.calls = 0
+        self._depth = 0
+
+    def wrap(self, func):
+        def timed(*args, **kwargs):
+            self._depth += 1
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._depth -= 1
+                if not self._depth:
+                    self.seconds += time.perf_counter() - start
+                    self.calls += 1
+        return timed
+
+
+def folder_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+async def run_downloader(client, full_rescan=False):
+    """Run main() with its output suppressed. Returns (channel states, seconds)."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        states = await downloader.main(full_rescan=full_rescan, client_factory=lambda: client)
+    return states, time.perf_counter() - start
+
+
+async def run_scenario(name, args):
+    description, channel_options, client_options, settings = SCENARIOS[name]
+    channel_options = dict(channel_options)
+    channel_count = channel_options.pop('channels', 1)
+    message_count = max(1, args.messages // channel_options.pop('count_divisor', 1))
+
+    channels = [
+        make_channel(1000 + i, f"Benchmark channel {i + 1}", message_count, seed=args.seed, **channel_options)
+        for i in range(channel_count)
+    ]
+    client_options = dict(
+        latency=args.latency_ms / 1000,
+        bandwidth=args.bandwidth_mbps * MB / 8,
+        seed=args.seed,
+        **client_options
+    )
+
+    downloader.CHANNELS = [channel.id for channel in channels]
+    downloader.DOWNLOAD_WORKERS = args.workers
+    downloader.EXPORT_JSON_AFTER_RUN = False
+
+    if settings.get('prime'):
+        # Download everything once without timing it, then measure the rescan
+        await run_downloader(FakeTelegramClient(channels, **client_options))
+
+    timer = TrackerTimer()
+    originals = {attr: getattr(downloader, attr) for attr in ('record_download', 'commit_tracker', 'finish_channel')}
+    for func_name, func in originals.items():
+        setattr(downloader, func_name, timer.wrap(func))
+    try:
+        client = FakeTelegramClient(channels, **client_options)
+        states, elapsed = await run_downloader(client, full_rescan=settings.get('prime', False))
+    finally:
+        for func_name, func in originals.items():
+            setattr(downloader, func_name, func)
+
+    files = sum(state['file_count'] for state in states)
+    failed = sum(state['failed_count'] for state in states)
+    size = sum(folder_size(state['download_dir']) for state in states) if files else 0
+    return {
+        'name': name,
+        'description': description,
+        'messages': message_count * channel_count,
+        'files': files,
+        'failed': failed,
+        'bytes': size,
+        'seconds': elapsed,
+        'tracker_seconds': timer.seconds,
+        'requests': sum(v for k, v in client.stats.items() if k not in ('bytes_served', 'errors', 'flood_waits')),
+    }
+
+
+def print_report(results, args):
+    print("=" * 96)
+    print("DOWNLOAD THROUGHPUT BENCHMARK")
+    print("=" * 96)
+    print(f"Messages per channel: {args.messages}, workers: {args.workers}, "
+          f"latency: {args.latency_ms} ms/request, link: {args.bandwidth_mbps} Mbit/s")
+    print("-" * 96)
+    print(f"{'Scenario':<15} {'Time (s)':>9} {'msgs/s':>9} {'files':>7} {'files/s':>9} "
+          f"{'MB/s':>8} {'requests':>9} {'tracker (ms)':>13} {'tracker %':>10}")
+    for r in results:
+        seconds = r['seconds'] or 1e-9
+        files = f"{r['files']}" + (f" ❌{r['failed']}" if r['failed'] else '')
+        print(f"{r['name']:<15} {seconds:>9.2f} {r['messages'] / seconds:>9.0f} {files:>7} "
+              f"{r['files'] / seconds:>9.1f} {r['bytes'] / MB / seconds:>8.2f} {r['requests']:>9} "
+              f"{r['tracker_seconds'] * 1000:>13.1f} {100 * r['tracker_seconds'] / seconds:>9.1f}%")
+    print("-" * 96)
+    for r in results:
+        print(f"{r['name']:<15} {r['description']}")
+    print("=" * 96)
+
+
+async def run_benchmarks(args):
+    results = []
+    for name in args.scenarios:
+        # Every scenario starts from empty channel folders
+        with tempfile.TemporaryDirectory() as tmp:
+            cwd = os.getcwd()
+            os.chdir(tmp)
+            try:
+                results.append(await run_scenario(name, args))
+            finally:
+                os.chdir(cwd)
+    print_report(results, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS),
+                        help='scenarios to run (default: all)')
+    parser.add_argument('--messages', type=int, default=500, help='messages per channel')
+    parser.add_argument('--workers', type=int, default=downloader.DOWNLOAD_WORKERS, help='download workers')
+    parser.add_argument('--latency-ms', type=float, default=50, help='round trip per request')
+    parser.add_argument('--bandwidth-mbps', type=float, default=400, help='shared link bandwidth')
+    parser.add_argument('--seed', type=int, default=0, help='seed for channel contents and errors')
+    asyncio.run(run_benchmarks(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark the parallel ranged download against the single-stream download_media path.
+
+Runs both paths against fake_telegram.FakeTelegramClient with a fixed round-trip
+latency per request and a shared link bandwidth, so results are repeatable and
+no Telegram account is needed.
+
+Usage:
+    python benchmark_parallel_download.py --size-mb 200 --latency-ms 150
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from telethon.tl import types
+
+from document_download import download_document, get_document_file_name
+from fake_telegram import FakeChannel, FakeMessage, FakeTelegramClient, make_document
+
+
+async def download_single(client, message, directory, part_size):
+    """Sequential download, one request in flight, like Telethon's download_media."""
+    document = message.media.document
+    path = os.path.join(directory, 'single_' + get_document_file_name(document))
+    with open(path, 'wb') as f:
+        async for chunk in client.iter_download(document, request_size=part_size):
+            f.write(chunk)
+    return path
+
+
+def make_client(message, args):
+    channel = FakeChannel(1, 'Benchmark', [message])
+    return FakeTelegramClient([channel], args.latency_ms / 1000, args.bandwidth_mbps * 1024 * 1024 / 8)
+
+
+def sha256_of(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+async def run_benchmark(args):
+    size = int(args.size_mb * 1024 * 1024)
+    part_size = args.part_kb * 1024
+    date = datetime.now()
+    message = FakeMessage(1, date, media=types.MessageMediaDocument(
+        document=make_document(1, 'benchmark.mp4', size, 'video/mp4', date)
+    ))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        single_path = await download_single(make_client(message, args), message, tmp, part_size)
+        single_time = time.perf_counter() - start
+
+        results = []
+        for connections in args.connections:
+            start = time.perf_counter()
+            path, _ = await download_document(
+                make_client(message, args), message, tmp, os.path.join(tmp, 'partial'),
+                connections=connections, part_size=part_size
+            )
+            elapsed = time.perf_counter() - start
+            identical = sha256_of(path) == sha256_of(single_path)
+            os.remove(path)
+            results.append((connections, elapsed, identical))
+
+    size_mb = size / (1024 * 1024)
+    print("=" * 60)
+    print("PARALLEL DOWNLOAD BENCHMARK")
+    print("=" * 60)
+    print(f"File size: {size_mb:.1f} MB, part size: {args.part_kb} KB")
+    print(f"Latency: {args.latency_ms} ms/request, link: {args.bandwidth_mbps} Mbit/s")
+    print("-" * 60)
+    print(f"{'Mode':<24} {'Time (s)':>10} {'MB/s':>10} {'Speedup':>9}")
+    print(f"{'single stream':<24} {single_time:>10.2f} {size_mb / single_time:>10.2f} {'1.00x':>9}")
+    for connections, elapsed, identical in results:
+        label = f"parallel x{connections}"
+        speedup = f"{single_time / elapsed:.2f}x"
+        flag = '' if identical else '  ❌ content mismatch'
+        print(f"{label:<24} {elapsed:>10.2f} {size_mb / elapsed:>10.2f} {speedup:>9}{flag}")
+    print("=" * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size-mb', type=float, default=64, help='document size in MB')
+    parser.add_argument('--part-kb', type=int, default=512, help='bytes per request in KB')
+    parser.add_argument('--latency-ms', type=float, default=120, help='round trip per request')
+    parser.add_argument('--bandwidth-mbps', type=float, default=200, help='shared link bandwidth')
+    parser.add_argument('--connections', type=int, nargs='+', default=[2, 4, 8],
+                        help='parallel stream counts to compare')
+    asyncio.run(run_benchmark(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -3,63 +3,45 @@
 Script to search and categorize downloaded Telegram files based on their message context.
 """
 
-import json
 import os
 import re
 import shutil
 from pathlib import Path
 
+import tracker_store
+from keyword_matcher import KeywordMatcher
+
 def load_metadata(channel_folder):
-    """Load the metadata file from a channel folder."""
-    metadata_file = os.path.join(channel_folder, 'file_metadata.json')
-    if not os.path.exists(metadata_file):
-        print(f"Error: Metadata file not found at {metadata_file}")
+    """Open the tracker store holding the file metadata of a channel folder."""
+    if not tracker_store.has_tracker(channel_folder):
+        print(f"Error: No metadata found in {channel_folder}")
         return None
     
-    with open(metadata_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return tracker_store.open_store(channel_folder, readonly=True)
 
-def search_files(metadata, search_term, search_in='text'):
+def search_files(store, search_term, search_in='text'):
     """
     Search for files based on message text or filename.
     
     Args:
-        metadata: Dictionary of file metadata
+        store: Tracker store from load_metadata
         search_term: Term to search for (case-insensitive)
         search_in: 'text', 'filename', or 'both'
     
     Returns:
         List of matching files with their metadata
     """
-    results = []
-    search_term = search_term.lower()
-    
-    for filename, data in metadata.items():
-        match = False
-        
-        if search_in in ['text', 'both']:
-            message_text = data.get('message_text', '').lower()
-            if search_term in message_text:
-                match = True
-        
-        if search_in in ['filename', 'both']:
-            if search_term in filename.lower():
-                match = True
-        
-        if match:
-            results.append({
-                'filename': filename,
-                **data
-            })
-    
-    return results
+    return [
+        {'filename': filename, **data}
+        for filename, data in tracker_store.search_metadata(store, search_term, search_in)
+    ]
 
 def categorize_files_by_keywords(metadata, categories):
     """
     Categorize files based on keyword mapping.
     
     Args:
-        metadata: Dictionary of file metadata
+        metadata: Iterable of (filename, metadata) pairs, e.g. tracker_store.iter_metadata(store)
         categories: Dict of {category_name: [keywords]}
     
     Returns:
@@ -68,29 +50,19 @@ def categorize_files_by_keywords(metadata, categories):
     categorized = {cat: [] for cat in categories.keys()}
     categorized['uncategorized'] = []
     
-    for filename, data in metadata.items():
+    # Keywords compiled once; the first category with a match wins
+    matcher = KeywordMatcher(categories)
+    
+    for filename, data in metadata:
         message_text = data.get('message_text', '').lower()
         file_text = filename.lower()
         combined_text = f"{message_text} {file_text}"
         
-        matched = False
-        for category, keywords in categories.items():
-            for keyword in keywords:
-                if keyword.lower() in combined_text:
-                    categorized[category].append({
-                        'filename': filename,
-                        **data
-                    })
-                    matched = True
-                    break
-            if matched:
-                break
-        
-        if not matched:
-            categorized['uncategorized'].append({
-                'filename': filename,
-                **data
-            })
+        category = matcher.match(combined_text) or 'uncategorized'
+        categorized[category].append({
+            'filename': filename,
+            **data
+        })
     
     return categorized
 
@@ -149,7 +121,7 @@ def main():
     
     # Find channel folders
     channel_folders = [d for d in os.listdir('.') if os.path.isdir(d) and 
-                      os.path.exists(os.path.join(d, 'file_metadata.json'))]
+                      tracker_store.has_tracker(d)]
     
     if not channel_folders:
         print("No channel folders with metadata found in current directory.")
@@ -171,11 +143,11 @@ def main():
             print("Invalid choice.")
             return
     
-    metadata = load_metadata(channel_folder)
-    if not metadata:
+    store = load_metadata(channel_folder)
+    if not store:
         return
     
-    print(f"\nLoaded metadata for {len(metadata)} files.\n")
+    print(f"\nLoaded metadata for {tracker_store.count_metadata(store)} files.\n")
     print("Options:")
     print("1. Search files by keyword")
     print("2. Categorize files automatically")
@@ -187,7 +159,7 @@ def main():
     if choice == '1':
         search_term = input("Enter search term: ")
         search_in = input("Search in (text/filename/both) [both]: ").strip() or 'both'
-        results = search_files(metadata, search_term, search_in)
+        results = search_files(store, search_term, search_in)
         print_search_results(results)
     
     elif choice == '2':
@@ -204,7 +176,7 @@ def main():
         }
         
         print("\nCategorizing files...")
-        categorized = categorize_files_by_keywords(metadata, categories)
+        categorized = categorize_files_by_keywords(tracker_store.iter_metadata(store), categories)
         
         for category, files in categorized.items():
             if files:
@@ -221,8 +193,8 @@ def main():
             print("\n✓ Files organized!")
     
     elif choice == '3':
-        print(f"\nAll files ({len(metadata)}):\n")
-        for i, (filename, data) in enumerate(metadata.items(), 1):
+        print(f"\nAll files ({tracker_store.count_metadata(store)}):\n")
+        for i, (filename, data) in enumerate(tracker_store.iter_metadata(store), 1):
             print(f"{i}. {filename}")
             if data.get('message_text'):
                 preview = data['message_text'][:100]
@@ -1,58 +1,94 @@
 #!/usr/bin/env python3
 """
 Check if download script is running and optionally stop it.
+
+Reads the run lock of every channel folder (see run_lock.py) instead of
+searching the process table, so it finds renamed or containerised runs
+too and only ever signals the process that holds a lock.
 """
 
-import subprocess
+import os
+import signal
+import socket
 import sys
 
-def check_running():
-    """Check if download_telegram_files.py is running."""
+from run_lock import LOCK_FILE, read_lock
+
+def find_locks():
+    """Return (channel_folder, running, info) for every channel folder with a run lock."""
+    locks = []
+    for folder in sorted(os.listdir('.')):
+        if os.path.isfile(os.path.join(folder, LOCK_FILE)):
+            running, info = read_lock(folder)
+            locks.append((folder, running, info or {}))
+    return locks
+
+def print_run(folder, info):
+    """Print the run description held in a channel's lock."""
+    progress = info.get('progress', {})
+    print(f"\n📁 {folder}")
+    print(f"   PID: {info.get('pid', '?')} on {info.get('host', '?')}, mode: {info.get('mode', '?')}")
+    print(f"   Started: {info.get('started', '?')}, last update: {info.get('updated', '?')}")
+    if progress:
+        size_mb = (progress.get('bytes_downloaded') or 0) / (1024 * 1024)
+        print(f"   Downloaded: {progress.get('files_downloaded', 0)} files ({size_mb:.1f} MB), "
+              f"skipped: {progress.get('skipped', 0)}, failed: {progress.get('failed', 0)}, "
+              f"in progress: {progress.get('pending', 0)}")
+    if info.get('control_socket'):
+        print(f"   Control: python download_control.py --socket '{info['control_socket']}' status")
+
+def stop_run(info):
+    """Ask a run to stop; it commits its tracker before exiting."""
+    pid = info.get('pid')
+    if not pid:
+        print("   ⚠️  The lock does not say which process holds it")
+        return
+    if info.get('host') != socket.gethostname():
+        print(f"   ⚠️  PID {pid} runs on {info.get('host')}; stop it there")
+        return
     try:
-        result = subprocess.run(
-            ['ps', 'aux'],
-            capture_output=True,
-            text=True
-        )
-        
-        processes = []
-        for line in result.stdout.split('\n'):
-            if 'download_telegram_files.py' in line and 'grep' not in line:
-                processes.append(line)
-        
-        return processes
-    except Exception as e:
-        print(f"Error checking processes: {e}")
-        return []
+        os.kill(pid, signal.SIGTERM)
+        print(f"   ✅ Sent stop signal to PID {pid}")
+    except OSError as e:
+        print(f"   ❌ Could not signal PID {pid}: {e}")
 
 def main():
     print("="*60)
     print("DOWNLOAD SCRIPT STATUS CHECKER")
     print("="*60)
-    
-    processes = check_running()
-    
-    if not processes:
+
+    locks = find_locks()
+    running = [(folder, info) for folder, is_running, info in locks if is_running]
+
+    if not running:
         print("\n✅ No download script is currently running")
         print("   Safe to run download_telegram_files.py")
+        for folder, _, info in locks:
+            if info.get('finished'):
+                print(f"   Last run on {folder}: {info.get('started', '?')} - {info['finished']}")
+            else:
+                print(f"   ⚠️  Last run on {folder} (started {info.get('started', '?')}) ended without "
+                      f"saving its tracker; the next run rescans what it missed")
         return
-    
-    print(f"\n⚠️  Found {len(processes)} instance(s) running:")
-    for i, proc in enumerate(processes, 1):
-        print(f"\n{i}. {proc[:100]}...")
-    
+
+    print(f"\n⚠️  Found {len(running)} channel(s) being downloaded:")
+    for folder, info in running:
+        print_run(folder, info)
+
     if len(sys.argv) > 1 and sys.argv[1] == '--kill':
-        confirm = input("\n⚠️  Kill all instances? (yes/no): ")
+        confirm = input("\n⚠️  Stop all these runs? (yes/no): ")
         if confirm.lower() == 'yes':
-            subprocess.run(['pkill', '-f', 'download_telegram_files.py'])
-            print("✅ All instances killed")
+            # Several channels can share one run; signal each process once
+            stopped = set()
+            for folder, info in running:
+                if info.get('pid') not in stopped:
+                    stopped.add(info.get('pid'))
+                    stop_run(info)
         else:
             print("Operation cancelled")
     else:
-        print("\nTo kill these processes, run:")
+        print("\nTo stop these runs (the tracker is saved first), run:")
         print("  python check_download_running.py --kill")
-        print("Or manually:")
-        print("  pkill -f download_telegram_files.py")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Content-level duplicate detection for re-uploaded documents.
+
+Telegram gives every upload a new document ID, so the same lecture PDF posted
+twice is downloaded twice. Before downloading, a document is compared with
+already downloaded files of a channel, cheapest check first:
+
+1. Same size (and a compatible file name / MIME type) in the tracker.
+2. Telegram's server-side SHA-256 hashes of the document's byte ranges
+   (upload.getFileHashes), checked against the same ranges of the local copy,
+   so a duplicate is recognised without downloading it. A few sampled ranges
+   are fetched and checked first; the rest only for files that match them.
+3. When the server has no hashes, the content hash computed while the file
+   downloaded is compared with the content hashes in the tracker.
+"""
+
+import asyncio
+import hashlib
+import os
+
+from telethon import errors, utils
+from telethon.tl import functions
+
+import tracker_store
+
+# Where server hashes are sampled first, as fractions of the file size. Only
+# candidates matching these ranges get the rest of the hashes fetched and
+# checked; the full check reuses the samples, so a duplicate costs about one
+# request more than fetching everything at once.
+SAMPLE_POINTS = (0.0, 1.0)
+
+
+async def fetch_hash_batch(client, rate_controller, location, offset):
+    """One upload.getFileHashes answer: hashes of the ranges from offset on, or None."""
+    try:
+        result = await rate_controller.call(
+            client, functions.upload.GetFileHashesRequest(location=location, offset=offset)
+        )
+    except errors.RPCError:
+        return None
+    return result or None
+
+
+async def fetch_sample_hashes(client, rate_controller, document):
+    """
+    Return a few batches of Telegram's FileHash list (see SAMPLE_POINTS), or None.
+
+    None means the server did not provide hashes for this file (not every
+    data center does), so the caller has to fall back to a local hash.
+    """
+    _, location = utils.get_input_location(document)
+    hashes = []
+    for point in SAMPLE_POINTS:
+        offset = max(0, min(int(document.size * point), document.size - 1))
+        if any(h.offset <= offset < h.offset + h.limit for h in hashes):
+            continue
+        batch = await fetch_hash_batch(client, rate_controller, location, offset)
+        if not batch:
+            return None
+        hashes.extend(batch)
+    return hashes
+
+
+async def fetch_server_hashes(client, rate_controller, document, known=None):
+    """
+    Return Telegram's FileHash list covering the whole document, or None.
+
+    Args:
+        known: FileHash objects fetched before (e.g. the samples); their
+            ranges are not requested again
+    """
+    _, location = utils.get_input_location(document)
+    covered = {file_hash.offset: file_hash for file_hash in known or []}
+    hashes = []
+    offset = 0
+    while offset < document.size:
+        if offset in covered:
+            batch = [covered[offset]]
+        else:
+            batch = await fetch_hash_batch(client, rate_controller, location, offset)
+            if not batch:
+                return None
+
+        hashes.extend(batch)
+        last = batch[-1]
+        if last.offset + last.limit <= offset:
+            return None
+        offset = last.offset + last.limit
+    return hashes
+
+
+def matches_server_hashes(path, file_hashes):
+    """Check the byte ranges of a local file against Telegram's FileHash list."""
+    with open(path, 'rb') as f:
+        for file_hash in file_hashes:
+            f.seek(file_hash.offset)
+            if hashlib.sha256(f.read(file_hash.limit)).digest() != file_hash.hash:
+                return False
+    return True
+
+
+def local_copy(channel_folder, entry):
+    """Path of a tracked file's copy in the channel folder, or None if it is gone."""
+    if not entry.get('filename'):
+        return None
+    # Entries from before file_path was recorded are in the downloads folder
+    relative_path = entry.get('file_path') or os.path.join('downloads', entry['filename'])
+    path = os.path.join(channel_folder, relative_path)
+    if os.path.isfile(path) and os.path.getsize(path) == entry.get('file_size'):
+        return path
+    return None
+
+
+async def find_duplicate(client, rate_controller, store, channel_folder, document, file_name,
+                         use_server_hashes=True):
+    """
+    Look for an already downloaded file with the same content as a document.
+
+    Returns:
+        (file_id, entry, path) of the original download, or None
+    """
+    candidates = [
+        (file_id, entry, local_copy(channel_folder, entry))
+        for file_id, entry in tracker_store.find_same_size_files(
+            store, document.size, file_name, document.mime_type
+        )
+    ]
+    candidates = [candidate for candidate in candidates if candidate[2]]
+    if not candidates or not use_server_hashes:
+        return None
+
+    # Local files are read off the event loop, so the other downloads keep going
+    loop = asyncio.get_running_loop()
+
+    # A few ranges first: most same-size files differ right away
+    sample = await fetch_sample_hashes(client, rate_controller, document)
+    if not sample:
+        return None
+    candidates = [
+        candidate for candidate in candidates
+        if await loop.run_in_executor(None, matches_server_hashes, candidate[2], sample)
+    ]
+    if not candidates:
+        return None
+
+    file_hashes = await fetch_server_hashes(client, rate_controller, document, known=sample)
+    if not file_hashes:
+        return None
+    sampled = {file_hash.offset for file_hash in sample}
+    rest = [file_hash for file_hash in file_hashes if file_hash.offset not in sampled]
+
+    for file_id, entry, path in candidates:
+        if await loop.run_in_executor(None, matches_server_hashes, path, rest):
+            return file_id, entry, path
+    return None
+
+
+def link_or_skip(original_path, target_path, mode):
+    """
+    Make a duplicate that was not downloaded available without storing its bytes twice.
+
+    mode 'hardlink' creates target_path as a hard link to the original (the
+    original's path is used when the filesystem cannot link); 'skip' creates
+    nothing.
+
+    Returns:
+        Path the duplicate is available under
+    """
+    if mode == 'hardlink':
+        try:
+            os.link(original_path, target_path)
+            return target_path
+        except OSError:
+            pass
+    return original_path
+
+
+def replace_downloaded_copy(original_path, path, mode):
+    """
+    Drop the bytes of a duplicate that was downloaded before it was recognised.
+
+    mode 'hardlink' swaps the file for a hard link to the original (keeping the
+    copy when the filesystem cannot link); 'skip' deletes it.
+
+    Returns:
+        Path the duplicate is available under
+    """
+    if mode == 'hardlink':
+        link_path = path + '.link'
+        try:
+            os.link(original_path, link_path)
+            os.replace(link_path, path)
+        except OSError:
+            pass
+        return path
+    os.remove(path)
+    return original_path
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Free-space check before each download.
+
+A download starts only when the target volume has room for the file's
+declared size plus a safety margin, counting space already promised to
+downloads that are still running. Otherwise the download waits for space
+to be freed ('pause') or is skipped and retried on the next run ('skip'),
+instead of failing halfway through with a full disk.
+"""
+
+import asyncio
+import errno
+import os
+import shutil
+from contextlib import asynccontextmanager
+
+
+def free_bytes(path):
+    """Free bytes on the volume holding path (or its closest existing parent)."""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        path = os.path.dirname(path)
+    return shutil.disk_usage(path).free
+
+
+class DiskSpaceGuard:
+    """Reserves disk space for running downloads and holds back those that do not fit."""
+
+    def __init__(self, min_free=1024 ** 3, action='pause', check_interval=30, label=""):
+        """
+        Args:
+            min_free: Bytes that must stay free after every download
+            action: 'pause' to wait for free space, 'skip' to give up on the file
+            check_interval: Seconds between free-space checks while paused
+            label: Prefix for progress lines
+        """
+        self.min_free = min_free
+        self.action = action
+        self.check_interval = check_interval
+        self.label = label
+        self._reservations = {}  # running download -> function returning bytes it still needs
+        self.paused = False
+
+    @property
+    def reserved(self):
+        """Bytes promised to running downloads and not yet taken from the free space."""
+        return sum(still_needed() for still_needed in self._reservations.values())
+
+    def fits(self, path, size):
+        return free_bytes(path) - self.reserved - size >= self.min_free
+
+    @asynccontextmanager
+    async def space_for(self, path, size, name='', allocated=None):
+        """
+        Reserve size bytes on path's volume for the duration of the block.
+
+        Args:
+            path: Where the file is written
+            size: Bytes the file needs
+            name: File name for progress lines
+            allocated: Optional function returning how many of those bytes the
+                download already holds on disk (e.g. its preallocated .part
+                file). That part has left free_bytes(), so only the rest stays
+                reserved and no space is counted twice.
+
+        Raises:
+            OSError(ENOSPC) if the space is not available and action is 'skip'
+        """
+        def still_needed():
+            return max(0, size - (allocated() if allocated else 0))
+
+        while not self.fits(path, still_needed()):
+            if self.action != 'pause':
+                raise OSError(errno.ENOSPC, f"Not enough disk space for {name or 'file'} "
+                                            f"({still_needed() / (1024 * 1024):.1f} MB)")
+            if not self.paused:
+                self.paused = True
+                print(f"{self.label}💾 Low disk space: {free_bytes(path) / (1024 * 1024):.0f} MB free, "
+                      f"{name or 'next file'} needs {still_needed() / (1024 * 1024):.1f} MB "
+                      f"+ {self.min_free / (1024 * 1024):.0f} MB margin; waiting for space...")
+            await asyncio.sleep(self.check_interval)
+
+        if self.paused:
+            self.paused = False
+            print(f"{self.label}💾 Disk space available again, continuing")
+
+        key = object()
+        self._reservations[key] = still_needed
+        try:
+            yield
+        finally:
+            del self._reservations[key]
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Resumable, optionally parallel download of a single Telegram document.
+
+The document is split into fixed-size parts. One or more streams fetch the
+parts (stream i fetches parts i, i + n, i + 2n, ...) and every part is written
+straight into a preallocated .part file at its own offset. A small JSON
+checkpoint next to the .part file records how many leading bytes are safely
+on disk, so an interrupted download continues from there on the next run.
+The content is hashed as the parts arrive (see file_hashing.py).
+"""
+
+import asyncio
+import json
+import os
+from datetime import datetime
+
+from telethon import utils
+from telethon.network import MTProtoSender
+from telethon.tl import functions
+from telethon.tl.alltlobjects import LAYER
+
+from file_hashing import StreamingHasher
+
+# Size of every ranged request. Must be a multiple of 4 KB that divides 1 MB,
+# otherwise Telegram rejects the offset/limit pair.
+DEFAULT_PART_SIZE = 512 * 1024
+
+# Number of parallel streams per document
+DEFAULT_CONNECTIONS = 4
+
+# Write a checkpoint whenever this many more leading bytes are complete
+DEFAULT_CHECKPOINT_INTERVAL = 8 * 1024 * 1024
+
+
+def get_document_file_name(document):
+    """Return the file name attribute of a document, or a generated fallback."""
+    for attr in document.attributes:
+        if hasattr(attr, 'file_name') and attr.file_name:
+            return os.path.basename(attr.file_name)
+    return f"document_{document.id}{utils.get_extension(document)}"
+
+
+def unique_path(directory, file_name, taken=None):
+    """Return a path in directory that does not overwrite an existing file.
+
+    Uses the same "name (1).ext" scheme as Telethon's download_media so files
+    look the same whichever download path produced them.
+
+    Args:
+        taken: Optional predicate for names that are in use somewhere else
+            (e.g. in another category folder) and must be skipped too
+    """
+    def free(name):
+        return not os.path.exists(os.path.join(directory, name)) and not (taken and taken(name))
+
+    if free(file_name):
+        return os.path.join(directory, file_name)
+
+    name, ext = os.path.splitext(file_name)
+    counter = 1
+    while not free(f"{name} ({counter}){ext}"):
+        counter += 1
+    return os.path.join(directory, f"{name} ({counter}){ext}")
+
+
+def preallocate(f, size):
+    """Reserve size bytes for an open output file."""
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(f.fileno(), 0, size)
+            return
+        except OSError:
+            # Not supported by this filesystem, fall back to a sparse file
+            pass
+    f.truncate(size)
+
+
+def partial_paths(partial_dir, document):
+    """Return (part_file, checkpoint_file) for a document's in-progress download."""
+    base = os.path.join(partial_dir, f"{document.id}.part")
+    return base, base + '.json'
+
+
+def bytes_on_disk(partial_dir, document):
+    """
+    Disk space a document's .part file already takes up (0 if there is none).
+
+    The .part file is preallocated to the full size, so a resumed download
+    only needs the rest. Blocks are counted instead of the file length, so a
+    sparse .part file (no fallocate) counts only what was written.
+    """
+    part_file = partial_paths(partial_dir, document)[0]
+    try:
+        stat = os.stat(part_file)
+    except OSError:
+        return 0
+    allocated = stat.st_blocks * 512 if hasattr(stat, 'st_blocks') else stat.st_size
+    return min(allocated, document.size)
+
+
+def load_checkpoint(part_file, checkpoint_file, document, part_size):
+    """Return the number of bytes that can be reused from an earlier attempt."""
+    if not (os.path.exists(part_file) and os.path.exists(checkpoint_file)):
+        return 0
+
+    try:
+        with open(checkpoint_file, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return 0
+
+    bytes_done = checkpoint.get('bytes_done', 0)
+    if (checkpoint.get('document_id') != document.id
+            or checkpoint.get('expected_size') != document.size
+            or bytes_done % part_size != 0
+            or os.path.getsize(part_file) < bytes_done):
+        # Different file, different part layout or truncated data: start over
+        return 0
+
+    return bytes_done
+
+
+def save_checkpoint(checkpoint_file, document, file_name, bytes_done):
+    """Atomically record how many leading bytes of the .part file are complete."""
+    checkpoint = {
+        "document_id": document.id,
+        "file_name": file_name,
+        "expected_size": document.size,
+        "bytes_done": bytes_done,
+        "updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+    tmp_file = checkpoint_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_file, checkpoint_file)
+
+
+async def open_extra_sender(client, dc_id):
+    """Open an additional MTProto connection to the data center holding a file.
+
+    Telethon multiplexes all requests over one connection per DC. A separate
+    sender per stream spreads a large download over several TCP connections.
+    """
+    dc = await client._get_dc(dc_id)
+    same_dc = dc_id == client.session.dc_id
+    auth_key = client.session.auth_key if same_dc else None
+
+    sender = MTProtoSender(auth_key, loggers=client._log)
+    await sender.connect(client._connection(
+        dc.ip_address,
+        dc.port,
+        dc.id,
+        loggers=client._log,
+        proxy=client._proxy
+    ))
+
+    if not same_dc:
+        # Borrow our authorization for the other DC
+        auth = await client(functions.auth.ExportAuthorizationRequest(dc_id))
+        client._init_request.query = functions.auth.ImportAuthorizationRequest(
+            id=auth.id, bytes=auth.bytes
+        )
+        await sender.send(functions.InvokeWithLayerRequest(LAYER, client._init_request))
+
+    return sender
+
+
+async def iter_stream_parts(client, document, offset, stride, count, part_size, sender=None):
+    """Yield (offset, bytes) for count parts starting at offset, stride bytes apart."""
+    if sender is None:
+        # Shared client connection; Telethon handles file references and DC migration
+        async for chunk in client.iter_download(
+            document,
+            offset=offset,
+            stride=stride,
+            limit=count,
+            request_size=part_size,
+            file_size=document.size
+        ):
+            yield offset, chunk
+            offset += stride
+        return
+
+    _, location = utils.get_input_location(document)
+    for _ in range(count):
+        result = await sender.send(functions.upload.GetFileRequest(
+            location, offset=offset, limit=part_size
+        ))
+        yield offset, result.bytes
+        offset += stride
+
+
+async def download_document(client, message, download_dir, partial_dir,
+                            connections=1,
+                            part_size=DEFAULT_PART_SIZE,
+                            extra_senders=False,
+                            checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL,
+                            rate_controller=None,
+                            bandwidth_limiter=None,
+                            name_taken=None):
+    """
+    Download message.media.document, resuming any earlier partial download.
+
+    Args:
+        client: Connected TelegramClient
+        message: Message whose media is a document
+        download_dir: Directory the finished file is saved into
+        partial_dir: Directory holding .part files and their checkpoints
+        connections: Number of concurrent streams (1 = single sequential stream)
+        part_size: Bytes per ranged request
+        extra_senders: Open a dedicated connection to the file's DC per stream
+        checkpoint_interval: Bytes between checkpoint writes
+        rate_controller: Optional RateController; flood errors pause every stream
+            and the interrupted stream continues from its current part
+        bandwidth_limiter: Optional BandwidthLimiter shared with other downloads
+        name_taken: Optional predicate for file names already used outside
+            download_dir; the finished file gets a unique name instead
+
+    Returns:
+        (path of the downloaded file, {'content_hash': ..., 'fast_hash': ...})
+    """
+    document = message.media.document
+    size = document.size
+    file_name = get_document_file_name(document)
+
+    os.makedirs(partial_dir, exist_ok=True)
+    part_file, checkpoint_file = partial_paths(partial_dir, document)
+
+    bytes_done = load_checkpoint(part_file, checkpoint_file, document, part_size)
+    if bytes_done:
+        print(f'↩️  Resuming {file_name} at {bytes_done / (1024 * 1024):.1f} MB of {size / (1024 * 1024):.1f} MB')
+
+    total_parts = (size + part_size - 1) // part_size
+    first_part = bytes_done // part_size
+    remaining_parts = total_parts - first_part
+    connections = max(1, min(connections, remaining_parts))
+    stride = connections * part_size
+
+    # Parts finished out of order, waiting for the contiguous prefix to reach them
+    progress = {'next_part': first_part, 'finished': set(), 'checkpointed': bytes_done}
+    hasher = StreamingHasher(first_part)
+
+    def part_finished(index, f):
+        progress['finished'].add(index)
+        while progress['next_part'] in progress['finished']:
+            progress['finished'].remove(progress['next_part'])
+            progress['next_part'] += 1
+
+        done = min(progress['next_part'] * part_size, size)
+        if done - progress['checkpointed'] >= checkpoint_interval and done < size:
+            # Data must be on disk before the checkpoint claims it is
+            f.flush()
+            os.fsync(f.fileno())
+            save_checkpoint(checkpoint_file, document, file_name, done)
+            progress['checkpointed'] = done
+
+    async def run_stream(index, f, sender):
+        next_part = first_part + index
+        while next_part < total_parts:
+            count = (total_parts - next_part + connections - 1) // connections
+            try:
+                async for offset, chunk in iter_stream_parts(
+                    client, document, next_part * part_size, stride, count, part_size, sender
+                ):
+                    # No await between seek and write, so streams never interleave here
+                    f.seek(offset)
+                    f.write(chunk)
+                    part_finished(offset // part_size, f)
+                    hasher.add_part(offset // part_size, chunk)
+                    if bandwidth_limiter:
+                        await bandwidth_limiter.consume(len(chunk))
+                    next_part = offset // part_size + connections
+                    if rate_controller:
+                        rate_controller.on_success()
+                        # Hold the next request back while a flood pause is in effect
+                        await rate_controller.wait_ready()
+            except Exception as e:
+                if rate_controller is None or not await rate_controller.handle_error(e):
+                    raise
+
+    senders = []
+    try:
+        with open(part_file, 'r+b' if bytes_done else 'wb') as f:
+            if not bytes_done:
+                preallocate(f, size)
+                save_checkpoint(checkpoint_file, document, file_name, 0)
+            else:
+                # Hashes cannot be checkpointed, so only the kept prefix is read back,
+                # off the event loop (it can be GBs); no stream runs until it is hashed
+                await asyncio.get_running_loop().run_in_executor(
+                    None, hasher.hash_prefix, part_file, bytes_done
+                )
+            if extra_senders:
+                senders = [await open_extra_sender(client, document.dc_id) for _ in range(connections)]
+            await asyncio.gather(*(
+                run_stream(i, f, senders[i] if senders else None)
+                for i in range(connections)
+            ))
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        # Keep the .part file; record everything that is safely written
+        done = min(progress['next_part'] * part_size, size)
+        if done > progress['checkpointed'] and os.path.exists(part_file):
+            save_checkpoint(checkpoint_file, document, file_name, done)
+        raise
+    finally:
+        for sender in senders:
+            await sender.disconnect()
+
+    # Pick the final name and move the file there without awaiting in between,
+    # so concurrent downloads of same-named documents never pick the same path
+    file_path = unique_path(download_dir, file_name, name_taken)
+    os.replace(part_file, file_path)
+    os.remove(checkpoint_file)
+
+    return file_path, hasher.result()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Control socket of a running download.
+
+download_telegram_files.py listens on a local Unix-domain socket
+(CONTROL_SOCKET, download_control.sock by default). Each connection sends
+one command line and gets one JSON reply. From another terminal:
+
+    python download_control.py status           # live progress of every channel
+    python download_control.py pause            # hold all downloads at their next chunk
+    python download_control.py resume
+    python download_control.py workers 2        # concurrent downloads (adaptive below that)
+    python download_control.py bandwidth 2MB    # cap; 'off' = unlimited, 'schedule' = back to config
+    python download_control.py drain            # finish running files, save the tracker, exit
+
+The socket file is only accessible to the user running the download.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+
+DEFAULT_SOCKET = 'download_control.sock'
+
+# Longest time the client waits for a reply, in seconds
+REPLY_TIMEOUT = 10
+
+
+def socket_in_use(path):
+    """Check whether a process is listening on the socket file at path."""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+async def serve_control(path, handle_command):
+    """
+    Answer control commands on a Unix socket until cancelled.
+
+    Args:
+        path: Socket file to create (a stale one left by a crashed run is replaced)
+        handle_command: Coroutine function (command, args) -> JSON-serialisable reply;
+            raising ValueError sends the message back as an error
+    """
+
+    async def handle(reader, writer):
+        try:
+            words = (await reader.readline()).decode('utf-8').split()
+            if not words:
+                reply = {'error': 'empty command'}
+            else:
+                try:
+                    reply = await handle_command(words[0].lower(), words[1:])
+                except ValueError as e:
+                    reply = {'error': str(e)}
+            writer.write(json.dumps(reply, ensure_ascii=False, default=str).encode('utf-8') + b'\n')
+            await writer.drain()
+        finally:
+            writer.close()
+
+    if os.path.exists(path):
+        if socket_in_use(path):
+            raise OSError(f"another download is already listening on {path}")
+        os.unlink(path)
+
+    server = await asyncio.start_unix_server(handle, path)
+    os.chmod(path, 0o600)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def send_command(path, command):
+    """Send one command line to a running download and return its JSON reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.settimeout(REPLY_TIMEOUT)
+        conn.connect(path)
+        conn.sendall(command.encode('utf-8') + b'\n')
+        reply = b''
+        while not reply.endswith(b'\n'):
+            chunk = conn.recv(65536)
+            if not chunk:
+                break
+            reply += chunk
+    return json.loads(reply)
+
+
+def print_status(status):
+    """Print a status reply in a readable form."""
+    rate = status.get('bandwidth_limit')
+    print(f"Mode: {status.get('mode')}, "
+          f"{'⏸  PAUSED' if status.get('paused') else 'draining' if status.get('draining') else 'running'}")
+    print(f"Concurrent downloads: {status.get('downloading')} running, limit {status.get('workers')}")
+    print(f"Bandwidth limit: {'unlimited' if rate is None else f'{rate / (1024 * 1024):.2f} MB/s'}, "
+          f"average {status.get('bytes_per_second', 0) / (1024 * 1024):.2f} MB/s")
+    for title, progress in status.get('channels', {}).items():
+        size_mb = progress.get('bytes_downloaded', 0) / (1024 * 1024)
+        print(f"\n📁 {title}")
+        print(f"   Downloaded: {progress.get('files_downloaded', 0)} files ({size_mb:.1f} MB), "
+              f"skipped: {progress.get('skipped', 0)}, failed: {progress.get('failed', 0)}, "
+              f"queued or running: {progress.get('pending', 0)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Control a running download_telegram_files.py.")
+    parser.add_argument('command', choices=['status', 'pause', 'resume', 'workers', 'bandwidth', 'drain'])
+    parser.add_argument('value', nargs='?', help="worker count, or bandwidth like 2MB / off / schedule")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help=f"control socket (default: {DEFAULT_SOCKET})")
+    parser.add_argument('--json', action='store_true', help="print the raw JSON reply")
+    args = parser.parse_args()
+
+    if args.command in ('workers', 'bandwidth') and args.value is None:
+        parser.error(f"{args.command} needs a value")
+
+    try:
+        reply = send_command(args.socket, f"{args.command} {args.value or ''}".strip())
+    except OSError as e:
+        print(f"❌ No running download on {args.socket}: {e}")
+        raise SystemExit(1)
+
+    if args.json:
+        print(json.dumps(reply, indent=2, ensure_ascii=False))
+    elif 'error' in reply:
+        print(f"❌ {reply['error']}")
+        raise SystemExit(1)
+    elif args.command == 'status':
+        print_status(reply)
+    else:
+        print(f"✓ {reply.get('message', 'done')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Declarative pre-download filters and download priorities.
+
+Filters are checked against the message and its media attributes (MIME type,
+extension, size, date, caption) while the channel is scanned, before a single
+byte of the file is downloaded. Messages that pass are queued with a priority
+so the files that matter most are downloaded first.
+
+Filter settings (all optional, None = no restriction):
+
+    {
+        'mime_types': ['application/pdf', 'application/vnd.*'],  # * wildcards allowed
+        'extensions': ['.pdf', '.docx'],
+        'exclude_extensions': ['.mp4'],
+        'min_size': 0,                      # bytes
+        'max_size': 500 * 1024 * 1024,      # bytes
+        'date_from': '2024-01-01',          # message date, inclusive
+        'date_to': '2024-12-31',
+        'caption_keywords': ['revision', 'past paper'],  # any of them, case-insensitive
+    }
+"""
+
+import fnmatch
+import os
+from datetime import datetime
+
+PRIORITY_POLICIES = ['newest-first', 'oldest-first', 'small-first', 'keyword']
+
+
+def media_attributes(message):
+    """Return (mime_type, extension, size, file_name) of a message's media."""
+    document = getattr(message.media, 'document', None)
+    if document:
+        file_name = next(
+            (attr.file_name for attr in document.attributes if getattr(attr, 'file_name', None)), None
+        )
+        extension = os.path.splitext(file_name)[1].lower() if file_name else ''
+        return document.mime_type, extension, document.size, file_name
+
+    photo = getattr(message.media, 'photo', None)
+    if photo:
+        sizes = [getattr(size, 'size', 0) for size in photo.sizes]
+        sizes += [max(size.sizes) for size in photo.sizes if hasattr(size, 'sizes')]
+        return 'image/jpeg', '.jpg', max(sizes or [0]), None
+
+    return None, '', 0, None
+
+
+def _parse_date(value):
+    if value is None or hasattr(value, 'year'):
+        return value
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+class DownloadFilter:
+    """Compiled filter settings; check() tells whether a message should be downloaded."""
+
+    def __init__(self, settings=None):
+        settings = settings or {}
+        self.mime_types = settings.get('mime_types')
+        self.extensions = _lower_set(settings.get('extensions'))
+        self.exclude_extensions = _lower_set(settings.get('exclude_extensions')) or set()
+        self.min_size = settings.get('min_size')
+        self.max_size = settings.get('max_size')
+        self.date_from = _parse_date(settings.get('date_from'))
+        self.date_to = _parse_date(settings.get('date_to'))
+        keywords = settings.get('caption_keywords')
+        self.caption_keywords = [keyword.lower() for keyword in keywords] if keywords else None
+
+    def check(self, message):
+        """
+        Returns:
+            None if the message passes, otherwise the reason it was filtered out
+        """
+        mime_type, extension, size, _ = media_attributes(message)
+
+        if self.mime_types is not None and not any(
+                fnmatch.fnmatchcase(mime_type or '', pattern) for pattern in self.mime_types):
+            return f"type {mime_type}"
+        if self.extensions is not None and extension not in self.extensions:
+            return f"extension {extension or '(none)'}"
+        if extension in self.exclude_extensions:
+            return f"extension {extension}"
+        if self.min_size is not None and size < self.min_size:
+            return f"size {size / (1024 * 1024):.1f} MB"
+        if self.max_size is not None and size > self.max_size:
+            return f"size {size / (1024 * 1024):.1f} MB"
+
+        if (self.date_from or self.date_to) and message.date:
+            day = message.date.date()
+            if (self.date_from and day < self.date_from) or (self.date_to and day > self.date_to):
+                return f"date {day}"
+
+        if self.caption_keywords is not None:
+            caption = (message.text or '').lower()
+            if not any(keyword in caption for keyword in self.caption_keywords):
+                return "caption keywords"
+
+        return None
+
+
+def _lower_set(values):
+    return {value.lower() for value in values} if values is not None else None
+
+
+def priority_key(policy, keywords=None):
+    """
+    Return a function mapping a message to its sort key (lowest is downloaded first).
+
+    Args:
+        policy: One of PRIORITY_POLICIES
+        keywords: For 'keyword': captions or file names containing any of these
+            come first (newest first within each group)
+    """
+    if policy == 'newest-first':
+        return lambda message: -message.id
+    if policy == 'oldest-first':
+        return lambda message: message.id
+    if policy == 'small-first':
+        return lambda message: (media_attributes(message)[2], -message.id)
+    if policy == 'keyword':
+        keywords = [keyword.lower() for keyword in keywords or []]
+
+        def keyword_first(message):
+            text = f"{message.text or ''} {media_attributes(message)[3] or ''}".lower()
+            return (0 if any(keyword in text for keyword in keywords) else 1, -message.id)
+        return keyword_first
+    raise ValueError(f"Unknown priority policy {policy!r}, expected one of {PRIORITY_POLICIES}")
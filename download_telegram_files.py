@@ -1,16 +1,34 @@
 #!/usr/bin/env python3
 """
-Script to download files from a Telegram channel.
+Script to download files from one or more Telegram channels.
 Requires telethon library and Telegram API credentials.
 """
 
+import argparse
 import asyncio
-import os
+import errno
 import json
+import os
+import signal
+import time
 import socks
 from telethon import TelegramClient
 from telethon.network.connection.tcpabridged import ConnectionTcpAbridged
 from datetime import datetime
+from bandwidth_limiter import BandwidthLimiter
+from content_dedup import find_duplicate, link_or_skip, local_copy, replace_downloaded_copy
+from document_download import bytes_on_disk, download_document, unique_path
+from download_control import serve_control, socket_in_use
+from disk_guard import DiskSpaceGuard
+from download_filters import DownloadFilter, media_attributes, priority_key
+from file_hashing import hash_file
+from preview_download import download_preview
+from fair_scheduler import FairScheduler
+from organize_existing_files import categorize_message
+from rate_controller import RateController
+from run_lock import RunLock
+from run_metrics import Metrics, start_prometheus, stats_file_writer
+import tracker_store
 
 # Replace with your own values
 API_ID = 20314147  # Get from https://my.telegram.org/auth
@@ -20,6 +38,11 @@ PHONE_NUMBER = '+254718952129'  # Your Telegram phone number
 # Channel username or ID
 CHANNEL = -1002128927866  # The channel ID
 
+# All channels to mirror in one run (usernames or IDs). They share one
+# Telegram session and the download workers; each keeps its own folder,
+# tracker and progress.
+CHANNELS = [CHANNEL]
+
 # Proxy settings (set to None if not using proxy)
 # For SOCKS5 proxy: ('socks5', 'proxy_ip', proxy_port)
 # For SOCKS5 with auth: ('socks5', 'proxy_ip', proxy_port, True, 'username', 'password')
@@ -39,15 +62,940 @@ PROXY = None  # Example: ('socks5', '127.0.0.1', 1080)
 # PROXY = ('socks5', 'proxy.server.com', 1080, True, 'username', 'password')  # SOCKS5 with auth
 # PROXY = ('http', 'proxy.server.com', 8080)  # HTTP proxy
 
+# Download concurrency
+# Number of files downloaded at the same time at the start of a run. Channels
+# full of small PDFs are latency-bound, so a few parallel downloads multiply
+# throughput. The number then adapts between DOWNLOAD_WORKERS_MIN and
+# DOWNLOAD_WORKERS_MAX: one more after a run of healthy responses, halved
+# whenever Telegram answers with a FloodWait or a request times out.
+DOWNLOAD_WORKERS = 4
+DOWNLOAD_WORKERS_MIN = 1
+DOWNLOAD_WORKERS_MAX = 12
+
+# FloodWait handling
+# Every request goes through one rate controller that pauses all requests for
+# exactly as long as Telegram asks. Waits longer than this (seconds) are not
+# waited out; the affected download fails and is retried on the next run.
+MAX_FLOOD_WAIT = 15 * 60
+
+# Maximum number of messages per channel waiting for a free download worker.
+# Keeps the message scan from running too far ahead of the downloads.
+DOWNLOAD_QUEUE_SIZE = 50
+
+# Parallel ranged download of large documents
+# Every document is downloaded into <channel>/partial/<id>.part with a checkpoint,
+# so an interrupted download resumes where it stopped on the next run.
+# Documents at least this big are fetched as several concurrent byte ranges
+# instead of one sequential stream. Set to None to always use a single stream.
+PARALLEL_DOWNLOAD_THRESHOLD = 20 * 1024 * 1024  # 20 MB
+PARALLEL_CONNECTIONS = 4  # concurrent ranges per large document
+PARALLEL_PART_SIZE = 512 * 1024  # bytes per ranged request
+# Open a dedicated connection to the file's data center for every range
+# (uses Telethon internals; leave False unless the shared connection is the bottleneck)
+PARALLEL_EXTRA_SENDERS = False
+
+# Tracker persistence
+# The tracker and metadata live in <channel>/tracker.db (SQLite). Finished files
+# are committed in groups instead of one transaction per file.
+TRACKER_COMMIT_FILES = 20  # commit after this many finished files...
+TRACKER_COMMIT_SECONDS = 5  # ...or after this many seconds, whichever is first
+# Also write downloaded_files_tracker.json / file_metadata.json after each run
+# (same as: python tracker_store.py export "<channel folder>")
+EXPORT_JSON_AFTER_RUN = False
+
+# Content-level deduplication
+# Admins often re-upload the same document as a new message, which gives it a
+# new file ID. Such duplicates are recognised by size plus Telegram's server-side
+# file hashes before downloading, or by the SHA-256 of the finished download:
+# 'hardlink' = hard link to the existing copy under the new file name,
+# 'skip' = only record the duplicate in the tracker, None = download every upload
+DEDUP_MODE = 'hardlink'
+# Ask Telegram for file hashes so duplicates are not downloaded at all
+DEDUP_SERVER_HASHES = True
+
+# What to download
+# Checked on the message and its media attributes while scanning, before any
+# bytes are downloaded. Every key is optional; see download_filters.py.
+DOWNLOAD_FILTERS = {
+    # 'mime_types': ['application/pdf', 'application/vnd.*'],
+    # 'extensions': ['.pdf', '.docx', '.pptx'],
+    # 'exclude_extensions': ['.mp4', '.mkv'],
+    # 'min_size': 0,
+    # 'max_size': 500 * 1024 * 1024,
+    # 'date_from': '2024-01-01',
+    # 'date_to': '2024-12-31',
+    # 'caption_keywords': ['notes', 'past paper'],
+}
+
+# Download order within a channel:
+# 'newest-first' (scan order), 'oldest-first', 'small-first' or 'keyword'
+# (captions/file names containing PRIORITY_KEYWORDS first)
+PRIORITY_POLICY = 'newest-first'
+PRIORITY_KEYWORDS = []
+# Messages per channel the scan may queue ahead of the downloads when a
+# priority policy other than 'newest-first' is active, so the policy can pick
+# from a large window (DOWNLOAD_QUEUE_SIZE is used otherwise)
+PRIORITY_WINDOW = 5000
+
+# Bandwidth limit for all downloads together, in bytes per second
+# (None = unlimited). Strings like '2MB' or '512KB' work too.
+BANDWIDTH_LIMIT = None
+# Time-of-day windows (local time) that override BANDWIDTH_LIMIT, e.g. keep
+# the office uplink usable during working hours:
+# BANDWIDTH_SCHEDULE = [('08:00', '18:00', '1MB'), ('18:00', '08:00', None)]
+BANDWIDTH_SCHEDULE = []
+
+# Disk-space guard
+# A download only starts if the volume keeps at least MIN_FREE_SPACE bytes free
+# after it (counting other running downloads). Otherwise DISK_FULL_ACTION decides:
+# 'pause' = wait until space is freed, 'skip' = leave the file for the next run
+MIN_FREE_SPACE = 1024 * 1024 * 1024  # 1 GB
+DISK_FULL_ACTION = 'pause'
+DISK_CHECK_INTERVAL = 30  # seconds between checks while paused
+
+# Categorise on download
+# Save each file straight into <channel>/organized/<category>/ (the layout of
+# organize_existing_files.py) instead of downloads/, so files are written once
+# and no separate organise pass is needed. The path is kept in the tracker.
+ORGANIZE_ON_DOWNLOAD = False
+# Use the message caption when the file name only gives a by-type category
+# (e.g. "scan_0042.pdf" posted as "Haematology past paper")
+CATEGORIZE_BY_CAPTION = True
+
+# Download mode
+# 'full' = the files themselves; 'preview' = only a photo size or the document
+# thumbnail, saved to <channel>/previews and tracked as preview-only, so a large
+# channel can be triaged in minutes. A later 'full' run downloads the real files
+# of everything that only has a preview.
+# 'index' = download nothing; record every media message (IDs, caption, file
+# name, MIME type, declared size, date) in the tracker's channel index, to see
+# what a channel holds before spending bandwidth on it
+DOWNLOAD_MODE = 'full'
+# Photo size for previews: 's' (100px), 'm' (320px), 'x' (800px), 'y' (1280px);
+# the closest smaller size is used when a photo or thumbnail lacks it
+PREVIEW_SIZE = 'm'
+
+# Seconds Telethon waits between history batches of 100 messages. Its default
+# (1 s on long histories) dominates scan time; FloodWaits are handled by the
+# rate controller instead
+HISTORY_WAIT_TIME = 0
+# Take the messages to download from the channel index built by an 'index' run
+# (only those not downloaded yet, fetched by ID) plus any newer messages,
+# instead of walking the channel history again
+SCAN_FROM_INDEX = False
+
+# Metrics (all off by default; also settable with command-line flags)
+METRICS_PORT = None  # e.g. 9464: Prometheus text endpoint on http://127.0.0.1:9464/metrics
+STATS_FILE = None  # e.g. 'download_stats.json': JSON snapshot rewritten every STATS_INTERVAL s
+STATS_INTERVAL = 10
+EVENT_LOG_FILE = None  # e.g. 'download_events.jsonl': one JSON line per download/skip/error
+
+# Each channel folder is locked while a run uses it (<channel>/.download.lock);
+# the lock file's progress counters are rewritten this often, in seconds
+LOCK_UPDATE_INTERVAL = 5
+
+# Unix socket for changing a running download (see download_control.py):
+# status, pause/resume, workers N, bandwidth RATE, drain. None = no socket
+CONTROL_SOCKET = 'download_control.sock'
+
 # DOWNLOAD_DIR will be set dynamically
 
-async def main():
-    # Create the client with alternative connection and retry settings
-    print("Initializing Telegram client...")
+
+def get_file_info(message):
+    """Return (file_unique_id, file_name) for a media message."""
+    file_unique_id = None
+    file_name = None
+
+    if hasattr(message.media, 'document') and message.media.document:
+        # Get unique file ID (this stays the same even if file is moved/renamed)
+        file_unique_id = str(message.media.document.id)
+
+        # Get the file name
+        for attr in message.media.document.attributes:
+            if hasattr(attr, 'file_name'):
+                file_name = attr.file_name
+                break
+    elif hasattr(message.media, 'photo'):
+        # For photos, use photo ID
+        file_unique_id = str(message.media.photo.id)
+        file_name = f"photo_{message.id}.jpg"
+
+    return file_unique_id, file_name
+
+
+def get_mime_type(message):
+    document = getattr(message.media, 'document', None)
+    return document.mime_type if document else None
+
+
+def filter_settings():
+    """DOWNLOAD_FILTERS as stored in the sync state (JSON values only)."""
+    return json.loads(json.dumps(DOWNLOAD_FILTERS, sort_keys=True, default=str))
+
+
+def sync_keys():
+    """Sync state keys of the high-water mark and filters for DOWNLOAD_MODE.
+
+    Preview runs keep their own, so previewing a channel does not stop the
+    next full run from scanning the messages that were only previewed.
+    """
+    if DOWNLOAD_MODE == 'preview':
+        return 'preview_last_message_id', 'preview_filters'
+    if DOWNLOAD_MODE == 'index':
+        # The index records every media message, whatever the filters
+        return 'index_last_message_id', None
+    return 'last_message_id', 'filters'
+
+
+def target_folder(state, message, file_name):
+    """Folder a file is saved into: downloads/, or its category folder with ORGANIZE_ON_DOWNLOAD."""
+    if not ORGANIZE_ON_DOWNLOAD:
+        return state['download_dir']
+    caption = message.text if CATEGORIZE_BY_CAPTION else ''
+    folder = os.path.join(state['organized_dir'], categorize_message(file_name or '', caption))
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def name_taken(state, file_unique_id):
+    """
+    Predicate for file names the tracker already uses for another file.
+
+    Metadata is keyed by the bare file name, so a name saved in one category
+    folder (ORGANIZE_ON_DOWNLOAD) must not be reused in another one.
+    """
+    def taken(name):
+        metadata = tracker_store.get_metadata(state['store'], name)
+        return metadata is not None and metadata.get('file_unique_id') != file_unique_id
+    return taken
+
+
+def download_connections(document):
+    """Number of concurrent ranges to fetch a document with."""
+    if PARALLEL_DOWNLOAD_THRESHOLD is not None and document.size >= PARALLEL_DOWNLOAD_THRESHOLD:
+        return PARALLEL_CONNECTIONS
+    return 1
+
+
+def record_download(state, message, file_unique_id, file_path, hashes):
+    """Store metadata and tracker entries for a finished download.
+
+    Runs without awaiting anything, so concurrent workers can never interleave
+    their updates to the tracker store.
+    """
+    store = state['store']
+
+    if DEDUP_MODE:
+        # Same content as a file downloaded earlier under another file ID?
+        original = tracker_store.find_file_by_hash(store, hashes['content_hash'])
+        if original and original[0] != file_unique_id:
+            original_path = local_copy(state['main_folder'], original[1])
+            if original_path:
+                path = replace_downloaded_copy(original_path, file_path, DEDUP_MODE)
+                record_duplicate(state, message, file_unique_id, (*original, original_path), path)
+                return
+
+    # Extract message text and context
+    message_text = message.text or ""
+    message_date = message.date.strftime("%Y-%m-%d %H:%M:%S") if message.date else ""
+    message_id = message.id
+
+    state['file_count'] += 1
+    downloaded_file_name = os.path.basename(file_path)
+    file_size = os.path.getsize(file_path)
+
+    # Store metadata about this file
+    tracker_store.put_metadata(store, downloaded_file_name, {
+        "message_id": message_id,
+        "message_text": message_text,
+        "date": message_date,
+        "file_size": file_size,
+        "mime_type": get_mime_type(message),
+        "file_unique_id": file_unique_id
+    })
+
+    # Track this download to prevent re-downloading. An existing entry
+    # (shouldn't happen but just in case) keeps fields that might have been added
+    if file_unique_id:
+        entry = {
+            "filename": downloaded_file_name,
+            "message_id": message_id,
+            "download_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "original_message_date": message_date,
+            "message_text": message_text,
+            "file_size": file_size,
+            "mime_type": get_mime_type(message),
+            "content_hash": hashes['content_hash'],
+            "fast_hash": hashes['fast_hash'],
+            "file_path": relative_path(state, file_path),
+            "preview_only": None  # upgrades an entry that only had a preview
+        }
+        tracker_store.put_file(store, file_unique_id, entry)
+
+    # Update statistics
+    stats = tracker_store.get_statistics(store)
+    stats['last_download_date'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    tracker_store.set_state(store, 'statistics', stats)
+
+    state['metrics'].inc('files_downloaded_total', channel=state['title'])
+    state['metrics'].inc('bytes_downloaded_total', file_size, channel=state['title'])
+
+    shown_name = relative_path(state, file_path) if ORGANIZE_ON_DOWNLOAD else downloaded_file_name
+    print(f'{state["label"]}✓ Downloaded ({state["file_count"]}): {shown_name}')
+    if message_text:
+        # Show first 100 chars of message text
+        preview = message_text[:100] + "..." if len(message_text) > 100 else message_text
+        print(f'  📝 Message: {preview}')
+
+    # Group commit: make a batch of finished files durable at once
+    state['uncommitted'] += 1
+    if commit_due(state):
+        commit_tracker(state)
+
+
+def relative_path(state, file_path):
+    """Path of a saved file relative to its channel folder, as stored in the tracker."""
+    return os.path.relpath(file_path, state['main_folder']).replace(os.sep, '/')
+
+
+def record_duplicate(state, message, file_unique_id, original, file_path):
+    """
+    Record a file whose content was already downloaded under another file ID.
+
+    Args:
+        original: (file_id, entry, path) of the earlier download
+        file_path: Where the duplicate is available (a hard link, or the original)
+    """
+    store = state['store']
+    original_id, original_entry, original_path = original
+    message_text = message.text or ""
+    message_date = message.date.strftime("%Y-%m-%d %H:%M:%S") if message.date else ""
+    file_name = os.path.basename(file_path)
+
+    if file_path != original_path:
+        # A new name in the downloads folder gets its own metadata, like any download
+        tracker_store.put_metadata(store, file_name, {
+            "message_id": message.id,
+            "message_text": message_text,
+            "date": message_date,
+            "file_size": original_entry.get('file_size'),
+            "mime_type": get_mime_type(message),
+            "file_unique_id": file_unique_id
+        })
+
+    if file_unique_id:
+        tracker_store.put_file(store, file_unique_id, {
+            "filename": file_name,
+            "message_id": message.id,
+            "download_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "original_message_date": message_date,
+            "message_text": message_text,
+            "file_size": original_entry.get('file_size', 0),
+            "mime_type": get_mime_type(message),
+            "content_hash": original_entry.get('content_hash'),
+            "fast_hash": original_entry.get('fast_hash'),
+            "duplicate_of": original_id,
+            "file_path": relative_path(state, file_path),
+            "preview_only": None
+        })
+
+    state['duplicate_count'] += 1
+    state['duplicate_bytes'] += original_entry.get('file_size', 0)
+    state['metrics'].inc('files_skipped_total', cause='duplicate', channel=state['title'])
+    state['metrics'].event('duplicate', channel=state['title'], message_id=message.id,
+                           file=file_name, duplicate_of=original_id)
+    linked = "hard-linked" if file_path != original_path else "not stored again"
+    print(f'{state["label"]}🔗 Duplicate of {original_entry.get("filename")} ({linked}): {file_name}')
+
+    state['uncommitted'] += 1
+    if commit_due(state):
+        commit_tracker(state)
+
+
+def record_preview(state, message, file_unique_id, file_name, preview_path):
+    """Track a preview-only entry; the full file is downloaded by a later 'full' run."""
+    message_text = message.text or ""
+    message_date = message.date.strftime("%Y-%m-%d %H:%M:%S") if message.date else ""
+
+    if file_unique_id:
+        tracker_store.put_file(state['store'], file_unique_id, {
+            "filename": file_name,
+            "message_id": message.id,
+            "download_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "original_message_date": message_date,
+            "message_text": message_text,
+            "file_size": media_attributes(message)[2],
+            "mime_type": get_mime_type(message),
+            "preview_file": os.path.basename(preview_path) if preview_path else None,
+            "preview_only": 1
+        })
+
+    state['preview_count'] += 1
+    if preview_path:
+        preview_bytes = os.path.getsize(preview_path)
+        state['preview_bytes'] += preview_bytes
+        state['metrics'].inc('bytes_downloaded_total', preview_bytes, channel=state['title'])
+        print(f'{state["label"]}🖼️  Preview ({state["preview_count"]}): {os.path.basename(preview_path)}')
+    else:
+        print(f'{state["label"]}🖼️  No thumbnail for {file_name or "unnamed file"} (ID: {message.id})')
+    state['metrics'].inc('previews_downloaded_total', channel=state['title'])
+    state['metrics'].event('previewed', channel=state['title'], message_id=message.id,
+                           file=os.path.basename(preview_path) if preview_path else None)
+
+    state['uncommitted'] += 1
+    if commit_due(state):
+        commit_tracker(state)
+
+
+def commit_due(state):
+    """Check whether enough files or time have built up for a group commit."""
+    if not state['uncommitted']:
+        return False
+    return (state['uncommitted'] >= TRACKER_COMMIT_FILES
+            or time.monotonic() - state['last_commit'] >= TRACKER_COMMIT_SECONDS)
+
+
+def commit_tracker(state):
+    start = time.perf_counter()
+    state['store'].commit()
+    state['metrics'].inc('tracker_commit_seconds_total', time.perf_counter() - start, channel=state['title'])
+    state['metrics'].inc('tracker_commits_total', channel=state['title'])
+    state['uncommitted'] = 0
+    state['last_commit'] = time.monotonic()
+
+
+async def tracker_flusher(channel_states):
+    """Commit finished files every TRACKER_COMMIT_SECONDS, even when downloads are slow."""
+    while True:
+        await asyncio.sleep(TRACKER_COMMIT_SECONDS)
+        for state in channel_states:
+            if commit_due(state):
+                commit_tracker(state)
+
+
+def channel_progress(state):
+    """Progress counters of a channel, as written to its run lock."""
+    return {
+        'files_downloaded': state['file_count'],
+        'bytes_downloaded': state['metrics'].counter('bytes_downloaded_total', channel=state['title']),
+        'skipped': state['skipped_count'],
+        'filtered': state['filtered_count'],
+        'duplicates': state['duplicate_count'],
+        'previews': state['preview_count'],
+        'indexed': state['indexed_count'],
+        'failed': state['failed_count'],
+        'pending': state['pending'],
+        'newest_message_id': state['newest_message_id'],
+        'scan_done': state['scan_done'],
+    }
+
+
+async def lock_updater(channel_states):
+    """Keep the progress in every channel's run lock current."""
+    while True:
+        await asyncio.sleep(LOCK_UPDATE_INTERVAL)
+        for state in channel_states:
+            state['lock'].update(channel_progress(state))
+
+
+async def download_worker(client, scheduler, run):
+    """Take messages off the scheduler and download them until cancelled or draining."""
+    while not run['draining']:
+        # Only rate_controller.limit workers hold a slot, the rest wait here
+        async with run['rate_controller'].slot():
+            _, job = await scheduler.get()
+            # While paused, no request is made for a new file
+            await run['bandwidth_limiter'].wait_resumed()
+            if run['draining']:
+                # Not recorded, so the next run picks the file up again
+                return
+            run['downloading'] += 1
+            try:
+                await download_job(client, run, *job)
+            finally:
+                run['downloading'] -= 1
+
+
+async def drain_run(run):
+    """Let the running downloads finish, then stop the run (which commits the trackers)."""
+    while run['downloading']:
+        await asyncio.sleep(0.2)
+    run['main_task'].cancel()
+
+
+async def control_command(run, channel_states, command, args):
+    """
+    Carry out one command received on the control socket.
+
+    Returns:
+        JSON-serialisable reply
+
+    Raises:
+        ValueError for unknown commands and bad arguments
+    """
+    rate_controller = run['rate_controller']
+    bandwidth_limiter = run['bandwidth_limiter']
+
+    if command == 'status':
+        snapshot = run['metrics'].snapshot()
+        return {
+            'mode': DOWNLOAD_MODE,
+            'paused': bandwidth_limiter.paused,
+            'draining': run['draining'],
+            'downloading': run['downloading'],
+            'workers': rate_controller.limit,
+            'workers_max': DOWNLOAD_WORKERS_MAX,
+            'flood_wait_seconds_left': round(rate_controller.paused_for(), 1),
+            'bandwidth_limit': bandwidth_limiter.current_rate(),
+            'files_per_second': snapshot['files_per_second'],
+            'bytes_per_second': snapshot['bytes_per_second'],
+            'channels': {state['title']: channel_progress(state) for state in channel_states},
+        }
+
+    if command == 'pause':
+        bandwidth_limiter.pause()
+        print(f"⏸  Paused from the control socket ({run['downloading']} download(s) held at their next chunk)")
+        return {'message': f"Paused; {run['downloading']} download(s) held at their next chunk"}
+
+    if command == 'resume':
+        bandwidth_limiter.resume()
+        print("▶️  Resumed from the control socket")
+        return {'message': "Resumed"}
+
+    if command == 'workers':
+        try:
+            workers = int(args[0])
+        except (IndexError, ValueError):
+            raise ValueError("usage: workers <count>")
+        # There are DOWNLOAD_WORKERS_MAX worker tasks; the limit cannot go above that
+        workers = max(1, min(workers, DOWNLOAD_WORKERS_MAX))
+        rate_controller.set_limit(workers)
+        print(f"🔧 Concurrent downloads set to {workers} from the control socket")
+        return {'message': f"Concurrent downloads: at most {workers}"}
+
+    if command == 'bandwidth':
+        if not args:
+            raise ValueError("usage: bandwidth <rate like 2MB> | off | schedule")
+        if args[0].lower() in ('schedule', 'default'):
+            bandwidth_limiter.clear_override()
+        else:
+            bandwidth_limiter.set_rate(args[0])
+        rate = bandwidth_limiter.current_rate()
+        limit_text = 'unlimited' if rate is None else f"{rate / (1024 * 1024):.2f} MB/s"
+        print(f"🔧 Bandwidth limit set to {limit_text} from the control socket")
+        return {'message': f"Bandwidth limit: {limit_text}"}
+
+    if command == 'drain':
+        if not run['draining']:
+            run['draining'] = True
+            # Paused downloads have to run to finish
+            bandwidth_limiter.resume()
+            run['drain_task'] = asyncio.create_task(drain_run(run))
+            print(f"🛑 Draining: finishing {run['downloading']} running download(s), then saving and exiting")
+        return {'message': f"Draining; {run['downloading']} download(s) still running"}
+
+    raise ValueError(f"unknown command {command!r} "
+                     f"(status, pause, resume, workers N, bandwidth RATE, drain)")
+
+
+async def download_job(client, run, state, message, file_unique_id, file_name):
+    """Download one queued file and record it in its channel's tracker."""
+    rate_controller = run['rate_controller']
+    metrics = run['metrics']
+    started = time.perf_counter()
+    try:
+        if DOWNLOAD_MODE == 'preview':
+            # A few KB per message; no dedup or disk check needed
+            preview_path = await download_preview(
+                client, message, state['preview_dir'], PREVIEW_SIZE,
+                rate_controller=rate_controller, bandwidth_limiter=run['bandwidth_limiter']
+            )
+            record_preview(state, message, file_unique_id, file_name, preview_path)
+            return
+
+        print(f'{state["label"]}📥 Downloading: {file_name or "unnamed file"}...')
+        document = getattr(message.media, 'document', None)
+        # Categorised before downloading, so the file is written to its final place once
+        folder = target_folder(state, message, file_name)
+        taken = name_taken(state, file_unique_id)
+        if document and DEDUP_MODE:
+            # Re-upload of a file we already have? Checked before spending any bandwidth
+            original = await find_duplicate(
+                client, rate_controller, state['store'], state['main_folder'],
+                document, file_name, use_server_hashes=DEDUP_SERVER_HASHES
+            )
+            if original:
+                # Picking the name and linking happen without an await in between
+                target = unique_path(folder, file_name or os.path.basename(original[2]), taken)
+                path = link_or_skip(original[2], target, DEDUP_MODE)
+                record_duplicate(state, message, file_unique_id, original, path)
+                return
+
+        # Wait for (or give up on) enough free space before any bytes are written.
+        # A document's .part file (preallocated, or kept from an earlier run)
+        # already holds its share of the space, so that share is not reserved.
+        allocated = (lambda: bytes_on_disk(state['partial_dir'], document)) if document else None
+        async with run['disk_guard'].space_for(state['main_folder'], media_attributes(message)[2],
+                                               file_name, allocated=allocated):
+            if document:
+                # Written to a .part file first, so an interrupted download resumes
+                # Hashed as the parts arrive, so the file is never read back
+                file_path, hashes = await download_document(
+                    client,
+                    message,
+                    folder,
+                    state['partial_dir'],
+                    connections=download_connections(document),
+                    part_size=PARALLEL_PART_SIZE,
+                    extra_senders=PARALLEL_EXTRA_SENDERS,
+                    rate_controller=rate_controller,
+                    bandwidth_limiter=run['bandwidth_limiter'],
+                    name_taken=taken
+                )
+            else:
+                file_path = await rate_controller.call(
+                    client.download_media, message, folder,
+                    progress_callback=run['bandwidth_limiter'].progress_callback()
+                )
+                if file_path:
+                    # Photos are small; hashed off the event loop so other downloads keep going
+                    hashes = await asyncio.get_running_loop().run_in_executor(None, hash_file, file_path)
+                    # Telethon picked the name; renamed (without an await before
+                    # record_download) if another folder already uses it
+                    if taken(os.path.basename(file_path)):
+                        unique = unique_path(folder, os.path.basename(file_path), taken)
+                        os.replace(file_path, unique)
+                        file_path = unique
+
+        if file_path:
+            seconds = time.perf_counter() - started
+            metrics.observe_download(seconds)
+            metrics.event('downloaded', channel=state['title'], message_id=message.id,
+                          file=os.path.basename(file_path), bytes=os.path.getsize(file_path),
+                          seconds=round(seconds, 3))
+            tracker_start = time.perf_counter()
+            record_download(state, message, file_unique_id, file_path, hashes)
+            metrics.inc('tracker_write_seconds_total', time.perf_counter() - tracker_start,
+                        channel=state['title'])
+    except Exception as e:
+        state['failed_count'] += 1
+        cause = errno.errorcode.get(getattr(e, 'errno', None) or 0, type(e).__name__)
+        metrics.inc('errors_total', cause=cause, channel=state['title'])
+        metrics.event('failed', channel=state['title'], message_id=message.id,
+                      file=file_name, cause=cause, error=str(e))
+        print(f'{state["label"]}❌ Failed to download {file_name or "unnamed file"} (ID: {message.id}): {e}')
+    except asyncio.CancelledError:
+        # Stopped halfway (Ctrl+C, SIGTERM, drain): the file is not done, so
+        # the high-water mark must not pass it
+        state['interrupted'] = True
+        raise
+    finally:
+        state['in_flight'].discard(file_unique_id)
+        state['pending'] -= 1
+        if state['scan_done'] and not state['pending']:
+            state['drained'].set()
+
+
+async def open_channel(client, run, channel_ref, full_rescan, label):
+    """Resolve a channel and prepare its folders, tracker store and sync state."""
+    # Get the channel entity
+    channel = await run['rate_controller'].call(client.get_entity, channel_ref)
+    
+    # Get channel title for folder name
+    channel_title = channel.title
+    main_folder = channel_title
+    DOWNLOAD_DIR = os.path.join(main_folder, 'downloads')
+    
+    # Unfinished downloads and their checkpoints live outside the downloads folder
+    partial_dir = os.path.join(main_folder, 'partial')
+    preview_dir = os.path.join(main_folder, 'previews')
+    # Category folders, when files are organised as they are downloaded
+    organized_dir = os.path.join(main_folder, 'organized')
+    
+    # Refuse to run next to another run of this channel (raises AlreadyRunning)
+    lock = RunLock(main_folder, DOWNLOAD_MODE).acquire()
+    
+    # Ensure download directory exists
+    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+    
+    # Open the tracker store (stores message_id + file_id to prevent re-downloads).
+    # The first run migrates the old JSON tracker and metadata files into it.
+    store = tracker_store.open_store(main_folder)
+
+    # Highest message ID of the last run that processed everything below it
+    sync_state = tracker_store.get_state(store, 'sync_state', {})
+    last_id_key, filters_key = sync_keys()
+    last_message_id = sync_state.get(last_id_key)
+    if DOWNLOAD_MODE == 'preview' and sync_state.get('filters', {}) == filter_settings():
+        # Messages a full run already downloaded need no preview
+        last_message_id = max(last_message_id or 0, sync_state.get('last_message_id') or 0) or None
+    min_id = 0 if full_rescan or not last_message_id else last_message_id
+    if min_id and filters_key and sync_state.get(filters_key, {}) != filter_settings():
+        # Messages below the high-water mark were judged by other filters
+        print("Download filters changed since the last run; scanning the whole history")
+        min_id = 0
+
+    if DOWNLOAD_MODE == 'index':
+        print(f"\nIndexing media messages of '{channel_title}' (nothing is downloaded)...")
+    elif DOWNLOAD_MODE == 'preview':
+        print(f"\nDownloading previews from '{channel_title}'...")
+        print(f"Previews will be saved to: {preview_dir}")
+    else:
+        print(f"\nDownloading files from '{channel_title}'...")
+        print(f"Files will be saved to: {organized_dir if ORGANIZE_ON_DOWNLOAD else DOWNLOAD_DIR}")
+    print(f"Download tracker: {tracker_store.db_path(main_folder)}")
+    print(f"Already tracked: {tracker_store.get_statistics(store)['total_downloads']} files")
+    if min_id:
+        print(f"Incremental sync: only messages newer than ID {min_id} (use --full-rescan for all)")
+    else:
+        print("Full scan of channel history")
+
+    # Per-channel state shared by the scanner and the download workers
+    return {
+        'channel': channel,
+        'title': channel_title,
+        'label': label.format(title=channel_title),  # prefix for progress lines
+        'main_folder': main_folder,
+        'download_dir': DOWNLOAD_DIR,
+        'partial_dir': partial_dir,
+        'preview_dir': preview_dir,
+        'organized_dir': organized_dir,
+        'store': store,
+        'lock': lock,
+        'metrics': run['metrics'],
+        'sync_state': sync_state,
+        'last_message_id': last_message_id,
+        'min_id': min_id,
+        'newest_message_id': None,
+        'uncommitted': 0,  # finished files not yet committed
+        'last_commit': time.monotonic(),
+        'in_flight': set(),  # file IDs queued or downloading right now
+        'pending': 0,  # jobs queued or downloading right now
+        'scan_done': False,
+        'interrupted': False,  # a download was cancelled before it finished
+        'scan_complete': False,  # the scan reached the end of the history
+        'drained': asyncio.Event(),  # set once the scan is done and nothing is pending
+        'file_count': 0,
+        'skipped_count': 0,
+        'filtered_count': 0,  # media messages that did not pass DOWNLOAD_FILTERS
+        'failed_count': 0,
+        'duplicate_count': 0,  # re-uploads of files we already had
+        'duplicate_bytes': 0,
+        'preview_count': 0,  # preview mode: thumbnails saved (or found missing)
+        'preview_bytes': 0,
+        'indexed_count': 0,  # index mode: media messages recorded
+        'indexed_bytes': 0,
+    }
+
+
+async def indexed_messages(client, run, state):
+    """
+    Messages to download according to the channel index: everything newer than
+    the index (from the history), then indexed messages not downloaded yet (by ID).
+    """
+    rate_controller = run['rate_controller']
+    sync_state = state['sync_state']
+    index_last_id = max(sync_state.get('index_last_message_id') or 0, state['min_id'] or 0)
+    async for message in rate_controller.iter_messages(
+            client, state['channel'], min_id=index_last_id, wait_time=HISTORY_WAIT_TIME):
+        yield message
+
+    message_ids = tracker_store.undownloaded_message_ids(state['store'], state['min_id'] or 0)
+    message_ids = [message_id for message_id in message_ids if message_id <= index_last_id]
+    print(f"{state['label']}🗂️  {len(message_ids)} indexed messages not downloaded yet")
+    # 100 IDs per request, the most messages.getMessages accepts
+    for start in range(0, len(message_ids), 100):
+        batch = message_ids[start:start + 100]
+        # Fetched fresh: downloads need the current file references
+        messages = await rate_controller.call(client.get_messages, state['channel'], ids=batch)
+        for message in messages:
+            if message is not None:  # deleted since it was indexed
+                yield message
+
+
+async def scan_channel(client, run, state, scheduler, download_filter):
+    """Walk a channel's messages and queue every media file that still needs downloading."""
+    store = state['store']
+    metrics = run['metrics']
+    if SCAN_FROM_INDEX:
+        messages = indexed_messages(client, run, state)
+    else:
+        messages = run['rate_controller'].iter_messages(
+            client, state['channel'], min_id=state['min_id'], wait_time=HISTORY_WAIT_TIME)
+    try:
+        async for message in messages:
+            metrics.inc('messages_scanned_total', channel=state['title'])
+
+            # Messages arrive newest first
+            if state['newest_message_id'] is None:
+                state['newest_message_id'] = message.id
+
+            if not message.media:
+                continue
+
+            # Filters only look at attributes, so nothing is downloaded for filtered files
+            reason = download_filter.check(message)
+            if reason:
+                state['filtered_count'] += 1
+                metrics.inc('files_skipped_total', cause='filtered', channel=state['title'])
+                metrics.event('filtered', channel=state['title'], message_id=message.id, reason=reason)
+                if state['filtered_count'] <= 5:
+                    print(f'{state["label"]}🚫 Filtered out ({reason}): message {message.id}')
+                elif state['filtered_count'] == 6:
+                    print(f'{state["label"]}🚫 ... filtering more messages ...')
+                continue
+
+            # Get file unique identifier to track downloads
+            file_unique_id, file_name = get_file_info(message)
+
+            # Check if this file was already downloaded (by unique ID, not filename)
+            # (in preview mode a preview counts; in full mode it is upgraded)
+            if file_unique_id and tracker_store.is_tracked(
+                    store, file_unique_id, include_previews=DOWNLOAD_MODE == 'preview'):
+                state['skipped_count'] += 1
+                metrics.inc('files_skipped_total', cause='already_downloaded', channel=state['title'])
+                if state['skipped_count'] <= 5:  # Show first 5 skipped
+                    tracked_info = tracker_store.get_file(store, file_unique_id)
+                    print(f'{state["label"]}⏭️  Already downloaded: {tracked_info.get("filename", "unknown")} (ID: {message.id})')
+                elif state['skipped_count'] == 6:
+                    print(f'{state["label"]}⏭️  ... skipping more already-downloaded files ...')
+                continue
+
+            # The same file can be posted more than once; only fetch it once per run
+            if file_unique_id and file_unique_id in state['in_flight']:
+                state['skipped_count'] += 1
+                metrics.inc('files_skipped_total', cause='posted_twice', channel=state['title'])
+                continue
+            if file_unique_id:
+                state['in_flight'].add(file_unique_id)
+
+            # Blocks while this channel's queue is full so the scan never races far ahead
+            state['pending'] += 1
+            await scheduler.put(state['channel'].id, (state, message, file_unique_id, file_name))
+        state['scan_complete'] = True
+    except Exception as e:
+        # Treated like a failed download: the high-water mark must not move
+        state['failed_count'] += 1
+        metrics.inc('errors_total', cause='scan_' + type(e).__name__, channel=state['title'])
+        metrics.event('scan_failed', channel=state['title'], error=str(e))
+        print(f'{state["label"]}❌ Error while scanning channel: {e}')
+    finally:
+        state['scan_done'] = True
+        if not state['pending']:
+            state['drained'].set()
+
+
+async def index_channel(client, run, state):
+    """Record every media message of a channel in its index, without downloading anything."""
+    store = state['store']
+    metrics = run['metrics']
+    indexed_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    batch = []
+    try:
+        async for message in run['rate_controller'].iter_messages(
+                client, state['channel'], min_id=state['min_id'], wait_time=HISTORY_WAIT_TIME):
+            metrics.inc('messages_scanned_total', channel=state['title'])
+            if state['newest_message_id'] is None:
+                state['newest_message_id'] = message.id
+            if not message.media:
+                continue
+
+            file_unique_id, file_name = get_file_info(message)
+            mime_type, _, file_size, _ = media_attributes(message)
+            batch.append({
+                'message_id': message.id,
+                'file_id': file_unique_id,
+                'file_name': file_name,
+                'mime_type': mime_type,
+                'file_size': file_size,
+                'message_date': message.date.strftime("%Y-%m-%d %H:%M:%S") if message.date else None,
+                'message_text': message.text or '',
+                'indexed_date': indexed_date,
+            })
+            state['indexed_count'] += 1
+            state['indexed_bytes'] += file_size
+
+            # One multi-row insert and commit per 500 media messages
+            if len(batch) >= 500:
+                tracker_store.put_index_entries(store, batch)
+                commit_tracker(state)
+                batch = []
+                print(f"{state['label']}🗂️  Indexed {state['indexed_count']} media messages "
+                      f"({state['indexed_bytes'] / (1024 ** 3):.2f} GB), at ID {message.id}")
+        state['scan_complete'] = True
+    except Exception as e:
+        state['failed_count'] += 1
+        metrics.inc('errors_total', cause='scan_' + type(e).__name__, channel=state['title'])
+        metrics.event('scan_failed', channel=state['title'], error=str(e))
+        print(f'{state["label"]}❌ Error while indexing channel: {e}')
+    finally:
+        tracker_store.put_index_entries(store, batch)
+        state['scan_done'] = True
+        state['drained'].set()
+
+
+def finish_channel(state):
+    """Commit a fully drained channel, move its high-water mark and close its store."""
+    store = state['store']
+    commit_tracker(state)
+
+    # Only move the high-water mark once every message below it was handled,
+    # otherwise the failed files would never be looked at again
+    if state['failed_count']:
+        print(f"{state['label']}⚠️  {state['failed_count']} download(s) failed; next run rescans from ID {state['min_id'] or 0}")
+    elif state['interrupted'] or not state['scan_complete'] or state['pending']:
+        print(f"{state['label']}⚠️  Run interrupted; next run rescans from ID {state['min_id'] or 0}")
+    elif ((state['newest_message_id'] and state['newest_message_id'] > (state['last_message_id'] or 0))
+          or (sync_keys()[1] and state['sync_state'].get(sync_keys()[1], {}) != filter_settings())):
+        sync_state = state['sync_state']
+        last_id_key, filters_key = sync_keys()
+        if state['newest_message_id'] and state['newest_message_id'] > (state['last_message_id'] or 0):
+            sync_state[last_id_key] = state['newest_message_id']
+        if filters_key:
+            sync_state[filters_key] = filter_settings()
+        sync_state['last_sync_date'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        tracker_store.set_state(store, 'sync_state', sync_state)
+        store.commit()
+
+    if EXPORT_JSON_AFTER_RUN:
+        tracker_store.export_to_json(store, state['main_folder'])
+    state['total_tracked'] = tracker_store.get_statistics(store)['total_downloads']
+    if DOWNLOAD_MODE == 'index':
+        tracker_store.print_index_summary(store)
+    store.close()
+    state['lock'].release(channel_progress(state))
+
+
+def register_gauges(run, scheduler, channel_states):
+    """Expose the live state of the run's shared components as metrics gauges."""
+    metrics = run['metrics']
+    rate_controller = run['rate_controller']
+    metrics.gauge('queue_depth', lambda: {
+        (('channel', state['title']),): scheduler.qsize(state['channel'].id) for state in channel_states
+    }, 'Files waiting for a download worker')
+    metrics.gauge('downloads_active', lambda: run['downloading'], 'Files downloading right now')
+    metrics.gauge('download_concurrency_limit', lambda: rate_controller.limit,
+                  'Adaptive limit on concurrent downloads')
+    metrics.gauge('flood_waits_total', lambda: rate_controller.flood_waits, 'FloodWait errors received')
+    metrics.gauge('flood_wait_seconds_total', lambda: rate_controller.flood_seconds,
+                  'Seconds all requests were paused for FloodWaits')
+    metrics.gauge('request_timeouts_total', lambda: rate_controller.timeouts, 'Requests that timed out')
+    metrics.gauge('bandwidth_limit_bytes_per_second', lambda: run['bandwidth_limiter'].current_rate(),
+                  'Current bandwidth limit (absent = unlimited)')
+    metrics.gauge('disk_reserved_bytes', lambda: run['disk_guard'].reserved,
+                  'Disk space promised to running downloads')
+    metrics.gauge('disk_full_paused', lambda: int(run['disk_guard'].paused),
+                  '1 while downloads wait for free disk space')
+    metrics.gauge('downloads_paused', lambda: int(run['bandwidth_limiter'].paused),
+                  '1 while downloads are paused from the control socket')
+
+
+def create_client():
+    """Create the Telegram client with alternative connection and retry settings."""
     if PROXY:
         print(f"Using proxy: {PROXY[0]}://{PROXY[1]}:{PROXY[2]}")
-    
-    client = TelegramClient(
+
+    return TelegramClient(
         'session_name', 
         API_ID, 
         API_HASH,
@@ -55,9 +1003,22 @@ async def main():
         connection=ConnectionTcpAbridged,
         connection_retries=5,
         retry_delay=3,
-        timeout=30
+        timeout=30,
+        # FloodWaits are handled by the rate controller, not slept away inside Telethon
+        flood_sleep_threshold=0
     )
 
+
+async def main(full_rescan=False, client_factory=create_client):
+    """
+    Mirror every channel in CHANNELS.
+
+    client_factory returns the client to use; fake_telegram.FakeTelegramClient
+    can be passed in to run without a Telegram account.
+    """
+    print("Initializing Telegram client...")
+    client = client_factory()
+
     try:
         # Connect and sign in
         print("Connecting to Telegram...")
@@ -72,167 +1033,193 @@ async def main():
         await client.disconnect()
         return
 
-    # Get the channel entity
-    channel = await client.get_entity(CHANNEL)
-    
-    # Get channel title for folder name
-    channel_title = channel.title
-    main_folder = channel_title
-    DOWNLOAD_DIR = os.path.join(main_folder, 'downloads')
-    
-    # Ensure download directory exists
-    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
-    
-    # Create a metadata file to store message context
-    metadata_file = os.path.join(main_folder, 'file_metadata.json')
-    
-    # Create a tracking file to store downloaded file IDs (prevents re-downloading moved files)
-    download_tracker_file = os.path.join(main_folder, 'downloaded_files_tracker.json')
-    
-    # Load existing metadata if it exists
-    if os.path.exists(metadata_file):
-        with open(metadata_file, 'r', encoding='utf-8') as f:
-            metadata = json.load(f)
-    else:
-        metadata = {}
-    
-    # Load download tracker (stores message_id + file_id to prevent re-downloads)
-    if os.path.exists(download_tracker_file):
-        with open(download_tracker_file, 'r', encoding='utf-8') as f:
-            download_tracker = json.load(f)
-        
-        # Ensure all existing entries have message_text field (add empty if missing)
-        # This prevents losing fields if tracker was created before we added this feature
-        for file_id, info in download_tracker.get('downloaded_files', {}).items():
-            if 'message_text' not in info:
-                info['message_text'] = ''
-            if 'file_size' not in info:
-                info['file_size'] = 0
-    else:
-        download_tracker = {
-            'downloaded_files': {},  # {file_unique_id: {filename, message_id, date}}
-            'statistics': {
-                'total_downloads': 0,
-                'last_download_date': None
-            }
-        }
+    # Every request of the run goes through one controller, so a FloodWait pauses them all
+    rate_controller = RateController(
+        initial=DOWNLOAD_WORKERS,
+        minimum=DOWNLOAD_WORKERS_MIN,
+        maximum=DOWNLOAD_WORKERS_MAX,
+        max_flood_wait=MAX_FLOOD_WAIT
+    )
 
-    print(f"Downloading files from '{channel_title}'...")
-    print(f"Files will be saved to: {DOWNLOAD_DIR}")
-    print(f"Metadata will be saved to: {metadata_file}")
-    print(f"Download tracker: {download_tracker_file}")
-    print(f"Already tracked: {len(download_tracker['downloaded_files'])} files")
+    # Limits shared by every download of the run
+    run = {
+        'metrics': Metrics(EVENT_LOG_FILE),
+        'rate_controller': rate_controller,
+        'bandwidth_limiter': BandwidthLimiter(BANDWIDTH_LIMIT, BANDWIDTH_SCHEDULE),
+        'disk_guard': DiskSpaceGuard(MIN_FREE_SPACE, DISK_FULL_ACTION, DISK_CHECK_INTERVAL),
+        'main_task': asyncio.current_task(),
+        'downloading': 0,  # files being downloaded right now
+        'draining': False,  # set by the control socket's drain command
+    }
 
-    # Get messages (adjust limit as needed)
-    file_count = 0
-    skipped_count = 0
-    
-    async for message in client.iter_messages(channel):
-        if message.media:
-            # Get file unique identifier to track downloads
-            file_unique_id = None
-            file_name = None
-            
-            if hasattr(message.media, 'document') and message.media.document:
-                # Get unique file ID (this stays the same even if file is moved/renamed)
-                file_unique_id = str(message.media.document.id)
-                
-                # Get the file name
-                for attr in message.media.document.attributes:
-                    if hasattr(attr, 'file_name'):
-                        file_name = attr.file_name
-                        break
-            elif hasattr(message.media, 'photo'):
-                # For photos, use photo ID
-                file_unique_id = str(message.media.photo.id)
-                file_name = f"photo_{message.id}.jpg"
-            
-            # Check if this file was already downloaded (by unique ID, not filename)
-            if file_unique_id and file_unique_id in download_tracker['downloaded_files']:
-                skipped_count += 1
-                tracked_info = download_tracker['downloaded_files'][file_unique_id]
-                if skipped_count <= 5:  # Show first 5 skipped
-                    print(f'⏭️  Already downloaded: {tracked_info.get("filename", "unknown")} (ID: {message.id})')
-                elif skipped_count == 6:
-                    print(f'⏭️  ... skipping more already-downloaded files ...')
-                continue
-            
-            # Extract message text and context
-            message_text = message.text or ""
-            message_date = message.date.strftime("%Y-%m-%d %H:%M:%S") if message.date else ""
-            message_id = message.id
-            
-            # Download the file
-            print(f'📥 Downloading: {file_name or "unnamed file"}...')
-            file_path = await client.download_media(message, DOWNLOAD_DIR)
-            
-            if file_path:
-                file_count += 1
-                downloaded_file_name = os.path.basename(file_path)
-                
-                # Store metadata about this file
-                metadata[downloaded_file_name] = {
-                    "message_id": message_id,
-                    "message_text": message_text,
-                    "date": message_date,
-                    "file_size": os.path.getsize(file_path),
-                    "mime_type": message.media.document.mime_type if hasattr(message.media, 'document') else None,
-                    "file_unique_id": file_unique_id
-                }
-                
-                # Track this download to prevent re-downloading
-                if file_unique_id:
-                    # Check if entry already exists (shouldn't happen but just in case)
-                    if file_unique_id in download_tracker['downloaded_files']:
-                        # Update existing entry, preserving fields that might have been added
-                        existing = download_tracker['downloaded_files'][file_unique_id]
-                        existing.update({
-                            "filename": downloaded_file_name,
-                            "message_id": message_id,
-                            "download_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                            "original_message_date": message_date,
-                            "message_text": message_text,
-                            "file_size": os.path.getsize(file_path)
-                        })
-                    else:
-                        # Create new entry
-                        download_tracker['downloaded_files'][file_unique_id] = {
-                            "filename": downloaded_file_name,
-                            "message_id": message_id,
-                            "download_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                            "original_message_date": message_date,
-                            "message_text": message_text,
-                            "file_size": os.path.getsize(file_path)
-                        }
-                
-                # Update statistics
-                download_tracker['statistics']['total_downloads'] = len(download_tracker['downloaded_files'])
-                download_tracker['statistics']['last_download_date'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                
-                print(f'✓ Downloaded ({file_count}): {downloaded_file_name}')
-                if message_text:
-                    # Show first 100 chars of message text
-                    preview = message_text[:100] + "..." if len(message_text) > 100 else message_text
-                    print(f'  📝 Message: {preview}')
-                
-                # Save metadata and tracker after each download
-                with open(metadata_file, 'w', encoding='utf-8') as f:
-                    json.dump(metadata, f, indent=2, ensure_ascii=False)
-                
-                with open(download_tracker_file, 'w', encoding='utf-8') as f:
-                    json.dump(download_tracker, f, indent=2, ensure_ascii=False)
+    # Progress lines only need the channel name when several channels interleave
+    label = "[{title}] " if len(CHANNELS) > 1 else ""
+    channel_states = []
+    for channel_ref in CHANNELS:
+        try:
+            channel_states.append(await open_channel(client, run, channel_ref, full_rescan, label))
+        except Exception as e:
+            print(f"❌ Could not open channel {channel_ref}: {e}")
+
+    print(f"\nChannels: {len(channel_states)}, download workers: {DOWNLOAD_WORKERS} "
+          f"(adapts between {DOWNLOAD_WORKERS_MIN} and {DOWNLOAD_WORKERS_MAX})")
+
+    # Every channel scan feeds its own bounded queue; the workers drain them in
+    # turn, taking the highest-priority job of each channel
+    download_filter = DownloadFilter(DOWNLOAD_FILTERS)
+    message_priority = priority_key(PRIORITY_POLICY, PRIORITY_KEYWORDS)
+    queue_size = DOWNLOAD_QUEUE_SIZE if PRIORITY_POLICY == 'newest-first' else PRIORITY_WINDOW
+    scheduler = FairScheduler(queue_size, priority=lambda job: message_priority(job[1]))
+    for state in channel_states:
+        scheduler.add_channel(state['channel'].id)
+
+    # Enough workers for the highest limit; the controller decides how many run
+    workers = [
+        asyncio.create_task(download_worker(client, scheduler, run))
+        for _ in range(DOWNLOAD_WORKERS_MAX)
+    ]
+    background = [
+        asyncio.create_task(tracker_flusher(channel_states)),
+        asyncio.create_task(lock_updater(channel_states)),
+    ]
+    register_gauges(run, scheduler, channel_states)
+    if METRICS_PORT:
+        try:
+            metrics_server = await start_prometheus(run['metrics'], METRICS_PORT)
+        except OSError as e:
+            print(f"⚠️  Metrics endpoint not started on port {METRICS_PORT}: {e}")
+        else:
+            # Cancelling serve_forever() closes the server
+            background.append(asyncio.create_task(metrics_server.serve_forever()))
+            print(f"Metrics: http://127.0.0.1:{METRICS_PORT}/metrics")
+    if STATS_FILE:
+        background.append(asyncio.create_task(stats_file_writer(run['metrics'], STATS_FILE, STATS_INTERVAL)))
+        print(f"Stats file: {STATS_FILE}")
+
+    # SIGTERM (check_download_running.py --kill, service managers) stops the run
+    # like Ctrl+C: through the finally below, which commits the trackers
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, run['main_task'].cancel)
+    except NotImplementedError:  # Windows
+        pass
+
+    if CONTROL_SOCKET and hasattr(asyncio, 'start_unix_server'):
+        if socket_in_use(CONTROL_SOCKET):
+            print(f"⚠️  {CONTROL_SOCKET} belongs to another running download; no control socket for this run")
+        else:
+            background.append(asyncio.create_task(serve_control(
+                CONTROL_SOCKET, lambda command, args: control_command(run, channel_states, command, args)
+            )))
+            for state in channel_states:
+                state['lock'].info['control_socket'] = os.path.abspath(CONTROL_SOCKET)
+            print(f"Control socket: {CONTROL_SOCKET} "
+                  f"(python download_control.py status|pause|resume|workers N|bandwidth RATE|drain)")
+
+    try:
+        if DOWNLOAD_MODE == 'index':
+            await asyncio.gather(*(index_channel(client, run, state) for state in channel_states))
+        else:
+            await asyncio.gather(*(
+                scan_channel(client, run, state, scheduler, download_filter)
+                for state in channel_states
+            ))
+
+        # Let the workers finish everything that was queued
+        for state in channel_states:
+            await state['drained'].wait()
+    finally:
+        for worker in workers:
+            worker.cancel()
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*workers, *background, return_exceptions=True)
+        # Commit whatever finished, even if the run was interrupted
+        for state in channel_states:
+            finish_channel(state)
+        run['metrics'].close()
 
     print(f"\n{'='*60}")
     print(f"✓ Download complete!")
     print(f"{'='*60}")
-    print(f"New files downloaded: {file_count}")
-    print(f"Files skipped (already downloaded): {skipped_count}")
-    print(f"Total tracked files: {len(download_tracker['downloaded_files'])}")
-    print(f"✓ Metadata saved to: {metadata_file}")
-    print(f"✓ Download tracker saved to: {download_tracker_file}")
+    if rate_controller.flood_waits or rate_controller.timeouts:
+        print(f"Flood waits: {rate_controller.flood_waits} ({rate_controller.flood_seconds}s paused), "
+              f"timeouts: {rate_controller.timeouts}")
+    print(f"Concurrent downloads at the end: {rate_controller.limit}")
+    for state in channel_states:
+        if len(channel_states) > 1:
+            print(f"\n{state['title']}")
+        if DOWNLOAD_MODE == 'index':
+            print(f"Media messages indexed: {state['indexed_count']} "
+                  f"({state['indexed_bytes'] / (1024 ** 3):.2f} GB declared)")
+        elif DOWNLOAD_MODE == 'preview':
+            print(f"Previews downloaded: {state['preview_count']} "
+                  f"({state['preview_bytes'] / (1024 * 1024):.1f} MB)")
+        else:
+            print(f"New files downloaded: {state['file_count']}")
+        print(f"Files skipped (already downloaded): {state['skipped_count']}")
+        if state['filtered_count']:
+            print(f"Files filtered out: {state['filtered_count']}")
+        if state['duplicate_count']:
+            print(f"Duplicates of earlier uploads: {state['duplicate_count']} "
+                  f"({state['duplicate_bytes'] / (1024 * 1024):.1f} MB not downloaded or stored twice)")
+        if state['failed_count']:
+            print(f"Files failed: {state['failed_count']}")
+        print(f"Total tracked files: {state['total_tracked']}")
+        print(f"✓ Download tracker saved to: {tracker_store.db_path(state['main_folder'])}")
+        if EXPORT_JSON_AFTER_RUN:
+            print(f"✓ JSON export saved to: {state['main_folder']}")
 
     # Disconnect
     await client.disconnect()
+    return channel_states
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Download files from Telegram channels.")
+    parser.add_argument(
+        '--full-rescan',
+        action='store_true',
+        help="walk the whole history of every channel instead of only messages newer than the last run"
+    )
+    parser.add_argument(
+        '--preview',
+        action='store_true',
+        help="download only photo previews and document thumbnails (DOWNLOAD_MODE = 'preview')"
+    )
+    parser.add_argument(
+        '--index-only',
+        action='store_true',
+        help="record every media message in the channel index without downloading (DOWNLOAD_MODE = 'index')"
+    )
+    parser.add_argument(
+        '--from-index',
+        action='store_true',
+        help="download what the channel index lists as not downloaded yet, instead of walking the history"
+    )
+    parser.add_argument(
+        '--organize',
+        action='store_true',
+        help="save files straight into organized/<category>/ instead of downloads/ (ORGANIZE_ON_DOWNLOAD)"
+    )
+    parser.add_argument('--preview-size', choices=['s', 'm', 'x', 'y', 'w'],
+                        help="photo size to download in preview mode (default: PREVIEW_SIZE)")
+    parser.add_argument('--metrics-port', type=int, help="serve Prometheus metrics on 127.0.0.1:PORT/metrics")
+    parser.add_argument('--stats-file', help="rewrite a JSON stats snapshot to this file while running")
+    parser.add_argument('--log-json', metavar='FILE', help="append one JSON line per download event to FILE")
+    parser.add_argument('--control-socket', metavar='PATH',
+                        help=f"Unix socket for download_control.py (default: {CONTROL_SOCKET})")
+    return parser.parse_args()
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    args = parse_args()
+    DOWNLOAD_MODE = 'index' if args.index_only else 'preview' if args.preview else DOWNLOAD_MODE
+    SCAN_FROM_INDEX = args.from_index or SCAN_FROM_INDEX
+    ORGANIZE_ON_DOWNLOAD = args.organize or ORGANIZE_ON_DOWNLOAD
+    PREVIEW_SIZE = args.preview_size or PREVIEW_SIZE
+    METRICS_PORT = args.metrics_port or METRICS_PORT
+    STATS_FILE = args.stats_file or STATS_FILE
+    EVENT_LOG_FILE = args.log_json or EVENT_LOG_FILE
+    CONTROL_SOCKET = args.control_socket or CONTROL_SOCKET
+    try:
+        asyncio.run(main(full_rescan=args.full_rescan))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        print("\n⚠️  Download stopped; finished files are saved in the tracker")
\ No newline at end of file
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Round-robin download queue shared by several channels.
+
+Every channel has its own bounded queue. Download workers take jobs from
+the channels in turn, so a channel with thousands of pending files cannot
+starve the others: each channel with work gets the next free worker in
+rotation. Within a channel, jobs come out in priority order (lowest key
+first, ties in arrival order) when a priority function is given.
+"""
+
+import asyncio
+import heapq
+from itertools import count
+
+
+class FairScheduler:
+    """Bounded per-channel queues drained in round-robin order."""
+
+    def __init__(self, maxsize_per_channel=50, priority=None):
+        """
+        Args:
+            maxsize_per_channel: Jobs a channel may queue before put() waits
+            priority: Optional function job -> sort key; None keeps arrival order
+        """
+        self.maxsize = maxsize_per_channel
+        self.priority = priority
+        self._arrival = count()
+        self._queues = {}  # channel key -> heap of (priority, arrival, job)
+        self._order = []  # channel keys in rotation order
+        self._next = 0  # position in _order to serve next
+        self._changed = asyncio.Condition()
+
+    def add_channel(self, key):
+        if key not in self._queues:
+            self._queues[key] = []
+            self._order.append(key)
+
+    def qsize(self, key=None):
+        """Jobs waiting for one channel, or for all channels."""
+        if key is not None:
+            return len(self._queues[key])
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def put(self, key, job):
+        """Queue a job for a channel, waiting while that channel's queue is full."""
+        async with self._changed:
+            await self._changed.wait_for(lambda: len(self._queues[key]) < self.maxsize)
+            rank = self.priority(job) if self.priority else 0
+            heapq.heappush(self._queues[key], (rank, next(self._arrival), job))
+            self._changed.notify_all()
+
+    def _pop_next(self):
+        for step in range(len(self._order)):
+            index = (self._next + step) % len(self._order)
+            queue = self._queues[self._order[index]]
+            if queue:
+                # The following channel is served first next time
+                self._next = (index + 1) % len(self._order)
+                return self._order[index], heapq.heappop(queue)[2]
+        return None
+
+    async def get(self):
+        """Wait for the next job in rotation. Returns (channel key, job)."""
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.qsize() > 0)
+            key, job = self._pop_next()
+            self._changed.notify_all()
+            return key, job
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+In-process fake of the parts of TelegramClient the downloader uses.
+
+Serves synthetic channels with a configurable number of messages, document
+sizes, per-request latency, link bandwidth and injected errors, so the
+download path can be exercised and benchmarked without a Telegram account:
+
+    client = FakeTelegramClient([make_channel(1, 'Test channel', 500)], latency=0.05)
+    await download_telegram_files.main(client_factory=lambda: client)
+
+Requests are counted per kind in client.stats.
+"""
+
+import asyncio
+import hashlib
+import os
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+from telethon import errors
+from telethon.tl import functions, types
+
+# Telegram returns history in batches of at most this many messages
+HISTORY_BATCH_SIZE = 100
+
+# upload.getFileHashes answers with this many hashes of this many bytes each
+FILE_HASH_SIZE = 128 * 1024
+FILE_HASHES_PER_REQUEST = 8
+
+# Bytes of a document thumbnail or of a photo's 'm' size
+THUMB_SIZE = 24 * 1024
+
+DEFAULT_REQUEST_SIZE = 512 * 1024
+
+
+def file_bytes(document_id, offset, length):
+    """Deterministic content of a synthetic file, identical however it is fetched."""
+    out = bytearray()
+    position = offset
+    while len(out) < length:
+        # Each 4 KB block is derived from its index, so any range can be produced alone
+        block = hashlib.sha256(f"{document_id}:{position // 4096}".encode()).digest() * 128
+        block_start = position % 4096
+        take = min(length - len(out), 4096 - block_start)
+        out += block[block_start:block_start + take]
+        position += take
+    return bytes(out)
+
+
+class FakeMessage:
+    """The subset of telethon's Message that the downloader reads."""
+
+    def __init__(self, id, date, text='', media=None):
+        self.id = id
+        self.date = date
+        self.text = text
+        self.message = text
+        self.media = media
+
+
+class FakeChannel:
+    def __init__(self, id, title, messages, content_ids=None):
+        self.id = id
+        self.title = title
+        self.messages = messages  # oldest first, like message IDs
+        # Re-uploaded documents: new document ID -> ID whose bytes it serves
+        self.content_ids = content_ids or {}
+
+
+def make_document(document_id, file_name, size, mime_type, date):
+    return types.Document(
+        id=document_id,
+        access_hash=0,
+        file_reference=b'',
+        date=date,
+        mime_type=mime_type,
+        size=size,
+        dc_id=4,
+        attributes=[types.DocumentAttributeFilename(file_name)],
+        thumbs=[types.PhotoSize(type='m', w=320, h=240, size=min(size, THUMB_SIZE))]
+    )
+
+
+def make_photo(photo_id, date, size):
+    return types.Photo(
+        id=photo_id,
+        access_hash=0,
+        file_reference=b'',
+        date=date,
+        sizes=[
+            types.PhotoSize(type='s', w=100, h=75, size=min(size, THUMB_SIZE // 8)),
+            types.PhotoSize(type='m', w=320, h=240, size=min(size, THUMB_SIZE)),
+            types.PhotoSize(type='x', w=1280, h=960, size=size),
+        ],
+        dc_id=4
+    )
+
+
+def make_channel(channel_id, title, message_count, media_ratio=0.9, photo_ratio=0.1,
+                 min_size=50 * 1024, max_size=2 * 1024 * 1024, seed=0,
+                 extensions=('.pdf', '.docx', '.pptx', '.mp4'), captions=None,
+                 duplicate_ratio=0.0):
+    """
+    Build a synthetic channel.
+
+    Args:
+        channel_id: Channel ID (also used to make document IDs unique)
+        title: Channel title, which the downloader uses as folder name
+        message_count: Number of messages in the history
+        media_ratio: Share of messages that carry media
+        photo_ratio: Share of media messages that are photos
+        min_size, max_size: Document size range in bytes
+        seed: Random seed, so the same arguments always give the same channel
+        extensions: File extensions to pick document names from
+        captions: Optional list of captions to pick from
+        duplicate_ratio: Share of documents that re-upload an earlier document
+            (same name and bytes, new document ID)
+    """
+    rng = random.Random(f"{channel_id}:{seed}")
+    mime_types = {
+        '.pdf': 'application/pdf',
+        '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+        '.pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+        '.mp4': 'video/mp4',
+        '.jpg': 'image/jpeg',
+    }
+    captions = captions or ['', '', 'Lecture notes', 'Revision questions', 'Past paper']
+    start = datetime(2024, 1, 1)
+
+    messages = []
+    documents = []
+    content_ids = {}
+    for message_id in range(1, message_count + 1):
+        date = start + timedelta(minutes=message_id)
+        media = None
+        if rng.random() < media_ratio:
+            media_id = channel_id * 10_000_000 + message_id
+            size = rng.randint(min_size, max_size)
+            if documents and rng.random() < duplicate_ratio:
+                earlier = rng.choice(documents)
+                content_ids[media_id] = content_ids.get(earlier.id, earlier.id)
+                media = types.MessageMediaDocument(document=make_document(
+                    media_id, earlier.attributes[0].file_name, earlier.size, earlier.mime_type, date
+                ))
+            elif rng.random() < photo_ratio:
+                media = types.MessageMediaPhoto(photo=make_photo(media_id, date, size))
+            else:
+                ext = rng.choice(extensions)
+                name = f"file_{channel_id}_{message_id}{ext}"
+                media = types.MessageMediaDocument(document=make_document(
+                    media_id, name, size, mime_types.get(ext, 'application/octet-stream'), date
+                ))
+                documents.append(media.document)
+        messages.append(FakeMessage(message_id, date, rng.choice(captions), media))
+
+    return FakeChannel(channel_id, title, messages, content_ids)
+
+
+class FakeTelegramClient:
+    """Stand-in for TelegramClient serving synthetic channels."""
+
+    def __init__(self, channels, latency=0.0, bandwidth=None, error_rate=0.0,
+                 flood_rate=0.0, flood_seconds=1, seed=0):
+        """
+        Args:
+            channels: FakeChannel objects to serve
+            latency: Seconds of round-trip latency per request
+            bandwidth: Shared link bandwidth in bytes per second (None = unlimited)
+            error_rate: Chance that a request fails with a connection error
+            flood_rate: Chance that a request fails with FloodWaitError
+            flood_seconds: Wait time reported by injected FloodWaitErrors
+            seed: Random seed for error injection
+        """
+        self.channels = {channel.id: channel for channel in channels}
+        self.content_ids = {}
+        self._document_sizes = {}
+        for channel in channels:
+            self.content_ids.update(channel.content_ids)
+            for message in channel.messages:
+                document = getattr(message.media, 'document', None)
+                if document:
+                    self._document_sizes[document.id] = document.size
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.flood_rate = flood_rate
+        self.flood_seconds = flood_seconds
+        self.flood_sleep_threshold = 60
+        self.stats = Counter()
+        self._rng = random.Random(seed)
+        self._link = asyncio.Lock()
+
+    # -- request simulation ------------------------------------------------
+
+    async def _request(self, kind, payload_bytes=0):
+        self.stats[kind] += 1
+        await asyncio.sleep(self.latency)
+
+        roll = self._rng.random()
+        if roll < self.flood_rate:
+            self.stats['flood_waits'] += 1
+            raise errors.FloodWaitError(request=None, capture=self.flood_seconds)
+        if roll < self.flood_rate + self.error_rate:
+            self.stats['errors'] += 1
+            raise ConnectionError(f"Injected failure in {kind}")
+
+        if payload_bytes and self.bandwidth:
+            # Transfers share one link, so parallel requests cannot beat its bandwidth
+            async with self._link:
+                await asyncio.sleep(payload_bytes / self.bandwidth)
+        self.stats['bytes_served'] += payload_bytes
+
+    # -- TelegramClient API subset -------------------------------------------
+
+    async def __call__(self, request):
+        """Raw API requests; only upload.getFileHashes is supported."""
+        if isinstance(request, functions.upload.GetFileHashesRequest):
+            await self._request('get_file_hashes')
+            size = self._document_sizes[request.location.id]
+            content_id = self.content_ids.get(request.location.id, request.location.id)
+            hashes = []
+            offset = request.offset - request.offset % FILE_HASH_SIZE
+            while offset < size and len(hashes) < FILE_HASHES_PER_REQUEST:
+                length = min(FILE_HASH_SIZE, size - offset)
+                digest = hashlib.sha256(file_bytes(content_id, offset, length)).digest()
+                hashes.append(types.FileHash(offset=offset, limit=FILE_HASH_SIZE, hash=digest))
+                offset += FILE_HASH_SIZE
+            return hashes
+        raise NotImplementedError(f"{type(request).__name__} is not faked")
+
+    async def start(self, phone=None, **kwargs):
+        return self
+
+    async def connect(self):
+        pass
+
+    async def disconnect(self):
+        pass
+
+    async def get_entity(self, entity):
+        await self._request('get_entity')
+        channel_id = getattr(entity, 'id', entity)
+        if channel_id not in self.channels:
+            raise ValueError(f"Cannot find any entity corresponding to {entity!r}")
+        return self.channels[channel_id]
+
+    async def iter_messages(self, entity, limit=None, min_id=0, max_id=0, offset_id=0,
+                            reverse=False, wait_time=None, **kwargs):
+        channel = self.channels[getattr(entity, 'id', entity)]
+        messages = [
+            m for m in channel.messages
+            if m.id > (min_id or 0) and (not max_id or m.id < max_id)
+            and (not offset_id or (m.id > offset_id if reverse else m.id < offset_id))
+        ]
+        if not reverse:
+            messages = messages[::-1]
+        if limit is not None:
+            messages = messages[:limit]
+
+        for start in range(0, len(messages), HISTORY_BATCH_SIZE):
+            await self._request('get_history')
+            for message in messages[start:start + HISTORY_BATCH_SIZE]:
+                yield message
+
+    async def get_messages(self, entity, ids=None, **kwargs):
+        channel = self.channels[getattr(entity, 'id', entity)]
+        by_id = {m.id: m for m in channel.messages}
+        if ids is None:
+            return [m async for m in self.iter_messages(entity, **kwargs)]
+
+        await self._request('get_messages')
+        if isinstance(ids, int):
+            return by_id.get(ids)
+        return [by_id.get(message_id) for message_id in ids]
+
+    async def iter_download(self, file, offset=0, stride=None, limit=None,
+                            chunk_size=None, request_size=DEFAULT_REQUEST_SIZE,
+                            file_size=None, **kwargs):
+        document = getattr(file, 'document', None) or getattr(file, 'photo', None) or file
+        size = file_size or _media_size(document)
+        stride = stride or request_size
+        count = 0
+        while offset < size and (limit is None or count < limit):
+            length = min(request_size, size - offset)
+            await self._request('get_file', length)
+            yield file_bytes(self.content_ids.get(document.id, document.id), offset, length)
+            offset += stride
+            count += 1
+
+    async def download_media(self, message, file=None, progress_callback=None, thumb=None, **kwargs):
+        """Sequential download, one request in flight, like Telethon's download_media."""
+        media = message.media
+        document = getattr(media, 'document', None)
+        photo = getattr(media, 'photo', None)
+        if document is not None:
+            name = next((a.file_name for a in document.attributes if hasattr(a, 'file_name')),
+                        f"document_{document.id}")
+            target = document
+        elif photo is not None:
+            name = f"photo_{message.date:%Y-%m-%d_%H-%M-%S}.jpg"
+            target = photo
+        else:
+            return None
+
+        size = _media_size(target)
+        if thumb is not None:
+            return await self._download_thumb(target, thumb, file, name, progress_callback)
+        if file is bytes:
+            return b''.join([chunk async for chunk in self.iter_download(target, file_size=size)])
+
+        path = file if file and not os.path.isdir(file) else _unique_path(file or '.', name)
+        done = 0
+        with open(path, 'wb') as f:
+            async for chunk in self.iter_download(target, file_size=size):
+                f.write(chunk)
+                done += len(chunk)
+                if progress_callback:
+                    result = progress_callback(done, size)
+                    if asyncio.iscoroutine(result):
+                        await result
+        return path
+
+    async def _download_thumb(self, media, thumb, file, name, progress_callback):
+        """download_media(thumb=...): one request for a photo size or document thumbnail."""
+        sizes = media.sizes if isinstance(media, types.Photo) else (media.thumbs or [])
+        if isinstance(thumb, int):
+            thumb = sorted(sizes, key=lambda size: getattr(size, 'size', 0))[thumb]
+        await self._request('get_file', thumb.size)
+        data = file_bytes(f"{self.content_ids.get(media.id, media.id)}:{thumb.type}", 0, thumb.size)
+        if file is bytes:
+            return data
+        path = file if file and not os.path.isdir(file) else _unique_path(file or '.', name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        if progress_callback:
+            result = progress_callback(len(data), len(data))
+            if asyncio.iscoroutine(result):
+                await result
+        return path
+
+
+def _media_size(media):
+    if isinstance(media, types.Photo):
+        return max(size.size for size in media.sizes if hasattr(size, 'size'))
+    return media.size
+
+
+def _unique_path(directory, name):
+    path = os.path.join(directory, name)
+    base, ext = os.path.splitext(name)
+    counter = 1
+    while os.path.exists(path):
+        path = os.path.join(directory, f"{base} ({counter}){ext}")
+        counter += 1
+    return path
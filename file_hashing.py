@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Content hashes computed while a file downloads.
+
+Every download is hashed chunk by chunk as the data arrives, so verifying or
+deduplicating a file never needs a second full read from disk. Two hashes are
+kept:
+
+- content_hash: "sha256:<hex>", strong enough for deduplication
+- fast_hash: "xxh64:<hex>" if the xxhash package is installed, otherwise
+  "crc32:<hex>"; cheap to recompute for quick integrity checks
+"""
+
+import hashlib
+import zlib
+
+try:
+    import xxhash
+except ImportError:  # optional dependency
+    xxhash = None
+
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+class _Crc32:
+    """zlib.crc32 with the update()/hexdigest() interface of hashlib."""
+
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data):
+        self.value = zlib.crc32(data, self.value)
+
+    def hexdigest(self):
+        return f"{self.value:08x}"
+
+
+def _new_fast_hash():
+    if xxhash is not None:
+        return 'xxh64', xxhash.xxh64()
+    return 'crc32', _Crc32()
+
+
+class StreamingHasher:
+    """
+    Hash the parts of a file in file order, whatever order they arrive in.
+
+    Parallel streams finish parts out of order; parts ahead of the contiguous
+    prefix are held in memory until the prefix reaches them.
+    """
+
+    def __init__(self, first_part=0):
+        self.sha256 = hashlib.sha256()
+        self.fast_name, self.fast = _new_fast_hash()
+        self.next_part = first_part
+        self.waiting = {}  # part index -> bytes, for parts ahead of the prefix
+        self.size = 0
+
+    def update(self, data):
+        """Hash the next bytes of the file."""
+        self.sha256.update(data)
+        self.fast.update(data)
+        self.size += len(data)
+
+    def add_part(self, index, data):
+        """Hash part `index` now or as soon as every part before it was hashed."""
+        self.waiting[index] = data
+        while self.next_part in self.waiting:
+            self.update(self.waiting.pop(self.next_part))
+            self.next_part += 1
+
+    def hash_prefix(self, path, length):
+        """Hash the first length bytes of a file (the part kept from an earlier attempt)."""
+        with open(path, 'rb') as f:
+            while length > 0:
+                block = f.read(min(READ_BLOCK_SIZE, length))
+                if not block:
+                    break
+                self.update(block)
+                length -= len(block)
+
+    def result(self):
+        """Return {'content_hash': ..., 'fast_hash': ...}."""
+        return {
+            'content_hash': 'sha256:' + self.sha256.hexdigest(),
+            'fast_hash': f"{self.fast_name}:{self.fast.hexdigest()}",
+        }
+
+
+def hash_file(path):
+    """Hash a file that is already on disk; returns the same dict as StreamingHasher.result()."""
+    hasher = StreamingHasher()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_BLOCK_SIZE), b''):
+            hasher.update(block)
+    return hasher.result()
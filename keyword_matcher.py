@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Keyword categorisation compiled into one Aho-Corasick automaton.
+
+Rules are an ordered {category: [keywords]} dict; a text belongs to the first
+category (in dict order) with any keyword occurring in it as a substring.
+Instead of testing every keyword with `in` (hundreds of scans per file name),
+the keywords are compiled once into a deterministic automaton that reads the
+text a single time and reports every occurrence, overlapping ones included,
+so the result is exactly that of the keyword-by-keyword loop.
+
+With whole_words=True a keyword only counts where it stands as whole words,
+as if wrapped in regex word boundaries: punctuation and underscores in text
+and keywords become single spaces and both are padded with a space, so
+" sti " no longer matches inside "questions".
+"""
+
+import re
+
+_SEPARATORS = re.compile(r'[\W_]+')
+
+
+def _words(text):
+    """Text as space-separated words with a space at each end."""
+    return f" {_SEPARATORS.sub(' ', text.lower()).strip()} "
+
+
+class KeywordMatcher:
+    """Case-insensitive, first-category-wins substring matcher."""
+
+    def __init__(self, categories, whole_words=False):
+        """
+        Args:
+            categories: Dict of {category: [keywords]}; earlier categories win
+            whole_words: Match keywords only as whole words, not inside longer words
+        """
+        self.categories = list(categories)
+        self.whole_words = whole_words
+        no_match = len(self.categories)
+
+        # Trie of all keywords; rank[node] is the best category of a keyword ending there
+        children = [{}]
+        rank = [no_match]
+        for category_rank, keywords in enumerate(categories.values()):
+            for keyword in keywords:
+                if whole_words:
+                    keyword = _words(keyword)
+                node = 0
+                for char in keyword.lower():
+                    if char not in children[node]:
+                        children[node][char] = len(children)
+                        children.append({})
+                        rank.append(no_match)
+                    node = children[node][char]
+                rank[node] = min(rank[node], category_rank)
+
+        # Breadth-first: fail links, best rank of every keyword that is a suffix
+        # of the node's string, and the full transition table (no fail loop while matching)
+        fail = [0] * len(children)  # the root's children fail to the root
+        delta = [dict(children[0])]
+        delta.extend({} for _ in range(len(children) - 1))
+        queue = list(children[0].values())
+        for node in queue:
+            rank[node] = min(rank[node], rank[fail[node]])
+            delta[node] = {**delta[fail[node]], **children[node]}
+            # Fail targets are shallower than the node, so they are already complete
+            for char, child in children[node].items():
+                fail[child] = delta[fail[node]].get(char, 0)
+                queue.append(child)
+        self._delta = delta
+        self._rank = rank
+        self._no_match = no_match
+
+    def match(self, text):
+        """Return the first category with a keyword in text, or None."""
+        rank = self._rank
+        best = rank[0]  # an empty keyword matches everything
+        if best == 0:
+            return self.categories[0]
+
+        if self.whole_words:
+            text = _words(text)
+        delta = self._delta
+        node = 0
+        for char in text.lower():
+            node = delta[node].get(char, 0)
+            if rank[node] < best:
+                best = rank[node]
+                if best == 0:
+                    break
+        return self.categories[best] if best < self._no_match else None
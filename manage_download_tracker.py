@@ -3,92 +3,131 @@
 Utility to view and manage the download tracker.
 """
 
-import json
 import os
 from datetime import datetime
 
+import tracker_store
+
+# Search results printed at once
+SEARCH_RESULTS_SHOWN = 50
+
+# Files printed per page when listing the whole tracker
+LIST_PAGE_SIZE = 20
+
+# Listing orders offered by the menu: (label, column, descending)
+SORT_ORDERS = [
+    ("Download date (newest first)", 'download_date', True),
+    ("Original message date (newest first)", 'original_message_date', True),
+    ("Size (largest first)", 'file_size', True),
+    ("Filename (A-Z)", 'filename', False),
+]
+
 def load_tracker(channel_folder):
-    """Load the download tracker file."""
-    tracker_file = os.path.join(channel_folder, 'downloaded_files_tracker.json')
-    if not os.path.exists(tracker_file):
-        print(f"No tracker file found at: {tracker_file}")
+    """Open the download tracker store of a channel folder."""
+    if not tracker_store.has_tracker(channel_folder):
+        print(f"No tracker found in: {channel_folder}")
         return None
     
-    with open(tracker_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return tracker_store.open_store(channel_folder)
 
-def show_statistics(tracker):
+def show_statistics(store):
     """Display download statistics."""
-    stats = tracker.get('statistics', {})
-    files = tracker.get('downloaded_files', {})
+    stats = tracker_store.get_statistics(store)
     
     print("\n" + "="*60)
     print("DOWNLOAD STATISTICS")
     print("="*60)
     print(f"Total files tracked: {stats.get('total_downloads', 0)}")
     print(f"Last download: {stats.get('last_download_date', 'Never')}")
-    print(f"Unique files: {len(files)}")
+    print(f"Unique files: {tracker_store.count_files(store)}")
     print("="*60)
 
-def list_downloaded_files(tracker, limit=None):
-    """List all downloaded files."""
-    files = tracker.get('downloaded_files', {})
+def print_file_entry(i, file_id, info):
+    """Print one tracker entry of a listing."""
+    print(f"\n{i}. {info.get('filename', 'Unknown')}")
+    print(f"   File ID: {file_id}")
+    print(f"   Message ID: {info.get('message_id', 'N/A')}")
+    print(f"   Downloaded: {info.get('download_date', 'N/A')}")
+    print(f"   Original date: {info.get('original_message_date', 'N/A')}")
     
-    print(f"\n{'='*60}")
-    print(f"DOWNLOADED FILES ({len(files)} total)")
-    print("="*60)
+    # Show file size if available
+    file_size = info.get('file_size')
+    if file_size:
+        size_mb = file_size / (1024 * 1024)
+        print(f"   Size: {size_mb:.2f} MB")
     
-    sorted_files = sorted(
-        files.items(), 
-        key=lambda x: x[1].get('download_date', ''), 
-        reverse=True
-    )
+    # Show message text if available
+    message_text = info.get('message_text', '')
+    if message_text:
+        preview = message_text[:80] + "..." if len(message_text) > 80 else message_text
+        print(f"   📝 Message: {preview}")
+
+def list_downloaded_files(store, limit=None, sort='download_date', descending=True):
+    """
+    List downloaded files, a page at a time.
     
-    if limit:
-        sorted_files = sorted_files[:limit]
+    Args:
+        store: Tracker store from load_tracker
+        limit: Show only this many files (no paging)
+        sort: Column to sort by (see tracker_store.SORT_COLUMNS)
+        descending: Newest/largest first
+    """
+    total = tracker_store.count_files(store)
     
-    for i, (file_id, info) in enumerate(sorted_files, 1):
-        print(f"\n{i}. {info.get('filename', 'Unknown')}")
-        print(f"   File ID: {file_id}")
-        print(f"   Message ID: {info.get('message_id', 'N/A')}")
-        print(f"   Downloaded: {info.get('download_date', 'N/A')}")
-        print(f"   Original date: {info.get('original_message_date', 'N/A')}")
-        
-        # Show file size if available
-        file_size = info.get('file_size')
-        if file_size:
-            size_mb = file_size / (1024 * 1024)
-            print(f"   Size: {size_mb:.2f} MB")
-        
-        # Show message text if available
-        message_text = info.get('message_text', '')
-        if message_text:
-            preview = message_text[:80] + "..." if len(message_text) > 80 else message_text
-            print(f"   📝 Message: {preview}")
+    print(f"\n{'='*60}")
+    print(f"DOWNLOADED FILES ({total} total)")
+    print("="*60)
     
-    if limit and len(files) > limit:
-        print(f"\n... and {len(files) - limit} more files")
+    # Each page is read from the sort column's index, continuing after the previous one
+    page_size = limit or LIST_PAGE_SIZE
+    cursor = None
+    shown = 0
+    while True:
+        entries, cursor = tracker_store.page_files(
+            store, sort=sort, descending=descending, after=cursor, limit=page_size
+        )
+        for file_id, info in entries:
+            shown += 1
+            print_file_entry(shown, file_id, info)
+        
+        if cursor is None:
+            return
+        if limit:
+            print(f"\n... and {total - shown} more files")
+            return
+        answer = input(f"\n-- {shown}/{total} shown. Enter for more, q to stop: ").strip().lower()
+        if answer == 'q':
+            return
 
-def search_files(tracker, search_term):
-    """Search for files by filename or message text."""
-    files = tracker.get('downloaded_files', {})
-    results = []
-    
+def choose_sort_order():
+    """Ask which order to list files in; returns (column, descending)."""
+    print("\nSort by:")
+    for i, (label, _, _) in enumerate(SORT_ORDERS, 1):
+        print(f"{i}. {label}")
+    choice = input(f"Enter your choice (1-{len(SORT_ORDERS)}, Enter for 1): ").strip() or '1'
+    try:
+        _, column, descending = SORT_ORDERS[int(choice) - 1]
+    except (ValueError, IndexError):
+        print("Invalid choice, listing newest downloads first.")
+        _, column, descending = SORT_ORDERS[0]
+    return column, descending
+
+def search_files(store, search_term, limit=SEARCH_RESULTS_SHOWN):
+    """Search for files by filename or message text (words match by prefix, best matches first)."""
     search_term = search_term.lower()
-    
-    for file_id, info in files.items():
-        filename = info.get('filename', '').lower()
-        message_text = info.get('message_text', '').lower()
-        
-        if search_term in filename or search_term in message_text:
-            results.append((file_id, info))
+    # One extra result tells whether there are more than we show
+    results = tracker_store.search_files(store, search_term, limit=limit + 1 if limit else None)
     
     if not results:
         print(f"\nNo files found matching '{search_term}'")
         return
     
     print(f"\n{'='*60}")
-    print(f"SEARCH RESULTS: {len(results)} file(s) found")
+    if limit and len(results) > limit:
+        results = results[:limit]
+        print(f"SEARCH RESULTS: best {limit} matches (refine the search to see others)")
+    else:
+        print(f"SEARCH RESULTS: {len(results)} file(s) found")
     print("="*60)
     
     for i, (file_id, info) in enumerate(results, 1):
@@ -103,7 +142,6 @@ def search_files(tracker, search_term):
 
 def reset_tracker(channel_folder):
     """Reset the download tracker (use with caution!)."""
-    tracker_file = os.path.join(channel_folder, 'downloaded_files_tracker.json')
     
     confirm = input("\n⚠️  This will reset the download tracker. Files will be re-downloaded!\nAre you sure? (yes/no): ")
     
@@ -111,56 +149,39 @@ def reset_tracker(channel_folder):
         print("Operation cancelled.")
         return
     
-    new_tracker = {
-        'downloaded_files': {},
-        'statistics': {
-            'total_downloads': 0,
-            'last_download_date': None
-        }
-    }
-    
-    with open(tracker_file, 'w', encoding='utf-8') as f:
-        json.dump(new_tracker, f, indent=2, ensure_ascii=False)
+    store = tracker_store.open_store(channel_folder)
+    with store:
+        tracker_store.reset_files(store)
+    store.close()
     
-    print(f"✓ Tracker reset! File: {tracker_file}")
+    print(f"✓ Tracker reset! File: {tracker_store.db_path(channel_folder)}")
 
-def remove_file_from_tracker(tracker, channel_folder, file_id_or_name):
+def remove_file_from_tracker(store, file_id_or_name):
     """Remove a specific file from the tracker."""
-    files = tracker.get('downloaded_files', {})
-    tracker_file = os.path.join(channel_folder, 'downloaded_files_tracker.json')
-    
     # Try to find by file ID first
-    if file_id_or_name in files:
-        removed = files.pop(file_id_or_name)
+    removed = tracker_store.delete_file(store, file_id_or_name)
+    if removed:
         print(f"✓ Removed: {removed.get('filename', 'Unknown')}")
     else:
         # Search by filename
-        found = False
-        for file_id, info in list(files.items()):
-            if file_id_or_name.lower() in info.get('filename', '').lower():
-                removed = files.pop(file_id)
-                print(f"✓ Removed: {removed.get('filename', 'Unknown')}")
-                found = True
-                break
-        
-        if not found:
+        match = tracker_store.find_file_by_name(store, file_id_or_name)
+        if not match:
             print(f"File not found: {file_id_or_name}")
             return
-    
-    # Update statistics
-    tracker['statistics']['total_downloads'] = len(files)
+        
+        removed = tracker_store.delete_file(store, match[0])
+        print(f"✓ Removed: {removed.get('filename', 'Unknown')}")
     
     # Save updated tracker
-    with open(tracker_file, 'w', encoding='utf-8') as f:
-        json.dump(tracker, f, indent=2, ensure_ascii=False)
+    store.commit()
     
-    print(f"✓ Tracker updated!")
+    print("✓ Tracker updated! The next run downloads the file again.")
 
 def main():
     """Interactive tracker manager."""
     # Find channel folders
     channel_folders = [d for d in os.listdir('.') if os.path.isdir(d) and 
-                      os.path.exists(os.path.join(d, 'downloaded_files_tracker.json'))]
+                      tracker_store.has_tracker(d)]
     
     if not channel_folders:
         print("No channel folders with download tracker found.")
@@ -185,8 +206,8 @@ def main():
             print("Invalid choice.")
             return
     
-    tracker = load_tracker(channel_folder)
-    if not tracker:
+    store = load_tracker(channel_folder)
+    if not store:
         return
     
     while True:
@@ -204,31 +225,32 @@ def main():
         choice = input("\nEnter your choice (1-7): ").strip()
         
         if choice == '1':
-            show_statistics(tracker)
+            show_statistics(store)
         
         elif choice == '2':
-            list_downloaded_files(tracker)
+            sort, descending = choose_sort_order()
+            list_downloaded_files(store, sort=sort, descending=descending)
         
         elif choice == '3':
-            list_downloaded_files(tracker, limit=20)
+            list_downloaded_files(store, limit=20)
         
         elif choice == '4':
             search_term = input("Enter search term: ")
-            search_files(tracker, search_term)
+            search_files(store, search_term)
         
         elif choice == '5':
             file_id = input("Enter file ID or filename: ")
-            remove_file_from_tracker(tracker, channel_folder, file_id)
-            # Reload tracker
-            tracker = load_tracker(channel_folder)
+            remove_file_from_tracker(store, file_id)
         
         elif choice == '6':
+            store.close()
             reset_tracker(channel_folder)
             # Reload tracker
-            tracker = load_tracker(channel_folder)
+            store = load_tracker(channel_folder)
         
         elif choice == '7':
             print("\nExiting...")
+            store.close()
             break
         
         else:
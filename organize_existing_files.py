@@ -3,152 +3,164 @@
 Organize existing medical files into categories based on medical knowledge.
 """
 
+import ctypes
+import errno
+import json
 import os
 import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from keyword_matcher import KeywordMatcher
+
+# Medical categories with their keywords; the first category with a keyword
+# in the file name wins
+CATEGORIES = {
+    '01_Microbiology': [
+        'microbiology', 'bacteria', 'virus', 'virology', 'vibrionaceae', 
+        'spirillaceae', 'actinomycetaceae', 'spirochaetales', 'escherichia', 
+        'klebsiella', 'salmonella', 'proteus', 'brucellaceae', 'neisseria',
+        'corynebacteriaceae', 'bacterial', 'pathogen', 'parasitology',
+        'herpesviridae', 'hepadnaviridae', 'poxviridae', 'papovaviridae',
+        'parpoviridae', 'adenoviridae', 'evasion mechanism', 'malaria',
+        'pfalciparum', 'pvivax', 'pmalariae', 'povale'
+    ],
+    
+    '02_Clinical_Chemistry': [
+        'clinical chemistry', 'chemistry', 'kidney', 'blood gases', 'liver',
+        'lipid profile', 'cardiac markers', 'tumour markers', 'glucose',
+        'biochemistry', 'enzymes', 'hormones', 'proteolytic'
+    ],
+    
+    '03_Hematology': [
+        'haematology', 'hematology', 'blood', 'anaemia', 'anemia',
+        'macrocytic', 'microcytic', 'normocytic', 'hemolytic', 'hemostasis',
+        'crossmatch', 'blood group', 'transfusion', 'ahg', 'grouping antisera',
+        'phlebotomy', 'coagulation'
+    ],
+    
+    '04_Histopathology_Cytopathology': [
+        'histopathology', 'histology', 'cytopathology', 'pap smear', 'pap-smear',
+        'museum techniques', 'staining', 'adhesives', 'mounting', 'ringing',
+        'histotechniques', 'tissue', 'biopsy', 'cytology'
+    ],
+    
+    '05_Immunology': [
+        'immunology', 'immune', 'immunodeficiency', 'hiv', 'sti', 'elisa',
+        'flow cytometry', 'antibody', 'antigen', 'serology'
+    ],
+    
+    '06_Emergency_Medical_Services': [
+        'ems', 'emergency', 'trauma', 'medical emergencies', 'incident command',
+        'ics', 'disaster', 'head injury', 'triage', 'prehospital',
+        'special population', 'emergency drugs', 'environmental emergencies'
+    ],
+    
+    '07_Orthopedics_Rehabilitation': [
+        'orthopedics', 'orthopaedics', 'fracture', 'dislocation', 'femur',
+        'tibia', 'fibula', 'humerus', 'radius', 'shoulder', 'elbow', 'hip',
+        'biomechanics', 'traction', 'genu', 'talipes', 'equino-varus',
+        'osteomyelitis', 'osteoarthritis', 'osteoporosis', 'rickets',
+        'osteomalacia', 'arthritis', 'rheumatoid', 'gouty', 'septic',
+        'pyogenic', 'ankylosing spondylitis', 'tumours of bone',
+        'rehabilitation', 'physiotherapy', 'exercise therapy', 'electrotherapy',
+        'cbr', 'community based rehabilitation'
+    ],
+    
+    '08_Surgery_Perioperative': [
+        'surgery', 'perioperative', 'cancer surgery', 'chemotherapy',
+        'surgical', 'operative', 'forensic', 'palliative'
+    ],
+    
+    '09_Medicine_Specialty': [
+        'medicine', 'paediatrics', 'pediatrics', 'pathology', 'pathophysiology',
+        'pharmacology', 'therapeutics', 'psychiatry', 'psychology',
+        'dermatology', 'ophthalmology', 'opthalmology', 'e n t', 'ent',
+        'genito-urinary', 'grief', 'bereavement', 'end of life'
+    ],
+    
+    '10_Community_Public_Health': [
+        'community health', 'public health', 'epidemiology', 'communicable diseases',
+        'immunizable', 'childhood immunizable', 'imci', 'i m c i',
+        'vector borne', 'ivbd', 'i v b d', 'maternal', 'child health',
+        'nutrition', 'primary health care', 'disease prevention',
+        'community diagnosis', 'community strategy', 'environment and health',
+        'drug and substance abuse', 'occupational health'
+    ],
+    
+    '11_Leadership_Management': [
+        'leadership', 'management', 'mngt', 'hsm', 'health service management',
+        'human resource', 'delegation', 'decision making', 'theories',
+        'principles', 'functions of management', 'conflict management',
+        'organization', 'essential medicine', 'commodities', 'supplies',
+        'financial resource', 'monitoring', 'evaluation', 'project management',
+        'quality assurance', 'resource management'
+    ],
+    
+    '12_Health_Informatics_IT': [
+        'health information', 'informatics', 'h i s', 'hospital system',
+        'lims', 'computer', 'communication', 'networking', 'data collection',
+        'health records', 'health statistics'
+    ],
+    
+    '13_Research_Biostatistics': [
+        'research', 'biostatistics', 'statistics', 'sampling', 'sample size',
+        'research design', 'problem selection', 'data collection', 'citation',
+        'reference', 'measures of relationship', 'data analysis'
+    ],
+    
+    '14_Medical_Imaging': [
+        'imaging', 'radiography', 'image processing', 'imaging equipment',
+        'imaging therapeutic', 'radiology', 'x-ray'
+    ],
+    
+    '15_Pharmacy': [
+        'pharmaceutical', 'pharmacy', 'medicinal chemistry', 'pharmacognosy',
+        'phytochemistry', 'physical pharmaceutics', 'pharmaceutical engineering',
+        'pharmaceutical jurisprudence', 'pharmaceutical industry'
+    ],
+    
+    '16_Health_Safety_Ethics': [
+        'health and safety', 'biosafety', 'safety', 'law', 'ethics',
+        'gender', 'law governing', 'kenya biosafety'
+    ],
+    
+    '17_Exams_CATs_FQE': [
+        'exam', 'cat', 'fqe', 'question paper', 'mcq', 'revision',
+        'past paper', 'test', 'quiz', 'pyq', 'draft'
+    ],
+    
+    '18_Course_Outlines_Notes': [
+        'course outline', 'notes', 'lecture', 'unit-', 'unit '
+    ]
+}
+
+# Compiled once; matches exactly like checking every keyword in turn
+_CATEGORY_MATCHER = KeywordMatcher(CATEGORIES)
+# Captions are prose: "sti" must not match inside "questions"
+_CAPTION_MATCHER = KeywordMatcher(CATEGORIES, whole_words=True)
+
 def categorize_file(filename):
     """Categorize a file based on its name using medical knowledge."""
     filename_lower = filename.lower()
     
-    # Define comprehensive medical categories with keywords
-    categories = {
-        '01_Microbiology': [
-            'microbiology', 'bacteria', 'virus', 'virology', 'vibrionaceae', 
-            'spirillaceae', 'actinomycetaceae', 'spirochaetales', 'escherichia', 
-            'klebsiella', 'salmonella', 'proteus', 'brucellaceae', 'neisseria',
-            'corynebacteriaceae', 'bacterial', 'pathogen', 'parasitology',
-            'herpesviridae', 'hepadnaviridae', 'poxviridae', 'papovaviridae',
-            'parpoviridae', 'adenoviridae', 'evasion mechanism', 'malaria',
-            'pfalciparum', 'pvivax', 'pmalariae', 'povale'
-        ],
-        
-        '02_Clinical_Chemistry': [
-            'clinical chemistry', 'chemistry', 'kidney', 'blood gases', 'liver',
-            'lipid profile', 'cardiac markers', 'tumour markers', 'glucose',
-            'biochemistry', 'enzymes', 'hormones', 'proteolytic'
-        ],
-        
-        '03_Hematology': [
-            'haematology', 'hematology', 'blood', 'anaemia', 'anemia',
-            'macrocytic', 'microcytic', 'normocytic', 'hemolytic', 'hemostasis',
-            'crossmatch', 'blood group', 'transfusion', 'ahg', 'grouping antisera',
-            'phlebotomy', 'coagulation'
-        ],
-        
-        '04_Histopathology_Cytopathology': [
-            'histopathology', 'histology', 'cytopathology', 'pap smear', 'pap-smear',
-            'museum techniques', 'staining', 'adhesives', 'mounting', 'ringing',
-            'histotechniques', 'tissue', 'biopsy', 'cytology'
-        ],
-        
-        '05_Immunology': [
-            'immunology', 'immune', 'immunodeficiency', 'hiv', 'sti', 'elisa',
-            'flow cytometry', 'antibody', 'antigen', 'serology'
-        ],
-        
-        '06_Emergency_Medical_Services': [
-            'ems', 'emergency', 'trauma', 'medical emergencies', 'incident command',
-            'ics', 'disaster', 'head injury', 'triage', 'prehospital',
-            'special population', 'emergency drugs', 'environmental emergencies'
-        ],
-        
-        '07_Orthopedics_Rehabilitation': [
-            'orthopedics', 'orthopaedics', 'fracture', 'dislocation', 'femur',
-            'tibia', 'fibula', 'humerus', 'radius', 'shoulder', 'elbow', 'hip',
-            'biomechanics', 'traction', 'genu', 'talipes', 'equino-varus',
-            'osteomyelitis', 'osteoarthritis', 'osteoporosis', 'rickets',
-            'osteomalacia', 'arthritis', 'rheumatoid', 'gouty', 'septic',
-            'pyogenic', 'ankylosing spondylitis', 'tumours of bone',
-            'rehabilitation', 'physiotherapy', 'exercise therapy', 'electrotherapy',
-            'cbr', 'community based rehabilitation'
-        ],
-        
-        '08_Surgery_Perioperative': [
-            'surgery', 'perioperative', 'cancer surgery', 'chemotherapy',
-            'surgical', 'operative', 'forensic', 'palliative'
-        ],
-        
-        '09_Medicine_Specialty': [
-            'medicine', 'paediatrics', 'pediatrics', 'pathology', 'pathophysiology',
-            'pharmacology', 'therapeutics', 'psychiatry', 'psychology',
-            'dermatology', 'ophthalmology', 'opthalmology', 'e n t', 'ent',
-            'genito-urinary', 'grief', 'bereavement', 'end of life'
-        ],
-        
-        '10_Community_Public_Health': [
-            'community health', 'public health', 'epidemiology', 'communicable diseases',
-            'immunizable', 'childhood immunizable', 'imci', 'i m c i',
-            'vector borne', 'ivbd', 'i v b d', 'maternal', 'child health',
-            'nutrition', 'primary health care', 'disease prevention',
-            'community diagnosis', 'community strategy', 'environment and health',
-            'drug and substance abuse', 'occupational health'
-        ],
-        
-        '11_Leadership_Management': [
-            'leadership', 'management', 'mngt', 'hsm', 'health service management',
-            'human resource', 'delegation', 'decision making', 'theories',
-            'principles', 'functions of management', 'conflict management',
-            'organization', 'essential medicine', 'commodities', 'supplies',
-            'financial resource', 'monitoring', 'evaluation', 'project management',
-            'quality assurance', 'resource management'
-        ],
-        
-        '12_Health_Informatics_IT': [
-            'health information', 'informatics', 'h i s', 'hospital system',
-            'lims', 'computer', 'communication', 'networking', 'data collection',
-            'health records', 'health statistics'
-        ],
-        
-        '13_Research_Biostatistics': [
-            'research', 'biostatistics', 'statistics', 'sampling', 'sample size',
-            'research design', 'problem selection', 'data collection', 'citation',
-            'reference', 'measures of relationship', 'data analysis'
-        ],
-        
-        '14_Medical_Imaging': [
-            'imaging', 'radiography', 'image processing', 'imaging equipment',
-            'imaging therapeutic', 'radiology', 'x-ray'
-        ],
-        
-        '15_Pharmacy': [
-            'pharmaceutical', 'pharmacy', 'medicinal chemistry', 'pharmacognosy',
-            'phytochemistry', 'physical pharmaceutics', 'pharmaceutical engineering',
-            'pharmaceutical jurisprudence', 'pharmaceutical industry'
-        ],
-        
-        '16_Health_Safety_Ethics': [
-            'health and safety', 'biosafety', 'safety', 'law', 'ethics',
-            'gender', 'law governing', 'kenya biosafety'
-        ],
-        
-        '17_Exams_CATs_FQE': [
-            'exam', 'cat', 'fqe', 'question paper', 'mcq', 'revision',
-            'past paper', 'test', 'quiz', 'pyq', 'draft'
-        ],
-        
-        '18_Course_Outlines_Notes': [
-            'course outline', 'notes', 'lecture', 'unit-', 'unit '
-        ]
-    }
-    
     # Check each category
-    for category, keywords in categories.items():
-        for keyword in keywords:
-            if keyword in filename_lower:
-                return category
+    category = _CATEGORY_MATCHER.match(filename_lower)
+    if category:
+        return category
     
     # Check file extension for media files
     if filename_lower.endswith(('.jpg', '.jpeg', '.png', '.gif')):
         return '19_Images_Photos'
     elif filename_lower.endswith(('.mp4', '.avi', '.mov', '.mkv')):
         return '20_Videos'
-    elif filename_lower.endswith(('.pdf', '.PDF')):
-        # Try to categorize PDFs more specifically
-        for category, keywords in categories.items():
-            for keyword in keywords:
-                if keyword in filename_lower:
-                    return category
+    elif filename_lower.endswith('.pdf'):
         return '21_PDFs_Uncategorized'
     elif filename_lower.endswith(('.doc', '.docx')):
         return '22_Documents_Uncategorized'
@@ -157,14 +169,106 @@ def categorize_file(filename):
     
     return '99_Uncategorized'
 
-def organize_files(source_dir, target_base_dir, mode='copy'):
+# Categories chosen from the file type alone, when no keyword matched
+FALLBACK_CATEGORIES = {
+    '19_Images_Photos', '20_Videos', '21_PDFs_Uncategorized',
+    '22_Documents_Uncategorized', '23_Presentations_Uncategorized', '99_Uncategorized'
+}
+
+def categorize_message(filename, caption=''):
+    """Categorize a file by its name, or by whole words of its message caption if the name has no keyword."""
+    category = categorize_file(filename)
+    if category in FALLBACK_CATEGORIES and caption:
+        caption_category = _CAPTION_MATCHER.match(caption)
+        if caption_category:
+            return caption_category
+    return category
+
+# FICLONE ioctl (Linux): the target shares the source's data blocks until
+# either is modified (Btrfs, XFS, bcachefs, OCFS2, ...)
+FICLONE = 0x40049409
+
+# Threads for the files that really have to be copied
+COPY_WORKERS = 8
+
+# Kept in the target folder: what each source file was organised into, so
+# reruns only handle new, changed or re-categorised files
+MANIFEST_FILE = '.organize_manifest.json'
+
+def reflink(source, target):
+    """Create target as a copy-on-write clone of source; raises OSError if the filesystem cannot."""
+    if sys.platform == 'darwin':
+        # APFS clonefile(2)
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(source), os.fsencode(target), 0) != 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), str(target))
+        return
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "Reflinks are not supported on this platform", str(target))
+    
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(target)
+            raise
+    shutil.copystat(source, target)
+
+def place_file(source, target, mode):
+    """
+    Put a file in its category folder.
+    
+    'hardlink' and 'reflink' take no extra space and fall back to a copy when
+    the filesystem (or a different volume) does not support them.
+    
+    Returns:
+        How the file was placed: 'copy', 'move', 'hardlink' or 'reflink'
+    """
+    if mode == 'move':
+        shutil.move(str(source), str(target))
+        return 'move'
+    if mode == 'hardlink':
+        try:
+            os.link(source, target)
+            return 'hardlink'
+        except OSError:
+            pass
+    elif mode == 'reflink':
+        try:
+            reflink(source, target)
+            return 'reflink'
+        except OSError:
+            pass
+    shutil.copy2(source, target)
+    return 'copy'
+
+def load_manifest(target_base_path):
+    """Return {source file name: {size, mtime_ns, category, target}} of earlier runs."""
+    manifest_path = Path(target_base_path) / MANIFEST_FILE
+    if not manifest_path.exists():
+        return {}
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_manifest(target_base_path, manifest):
+    """Atomically replace the manifest file."""
+    manifest_path = Path(target_base_path) / MANIFEST_FILE
+    tmp_path = manifest_path.with_name(manifest_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, manifest_path)
+
+def organize_files(source_dir, target_base_dir, mode='copy', workers=COPY_WORKERS):
     """
     Organize files from source directory into categorized folders.
     
     Args:
         source_dir: Directory containing files to organize
         target_base_dir: Base directory for organized files
-        mode: 'copy' or 'move'
+        mode: 'copy', 'move', 'hardlink' or 'reflink' (see place_file)
+        workers: Files placed in parallel (copies are I/O-bound)
     """
     source_path = Path(source_dir)
     target_base_path = Path(target_base_dir)
@@ -183,13 +287,36 @@ def organize_files(source_dir, target_base_dir, mode='copy'):
     print(f"Mode: {mode.upper()}")
     print("-" * 60)
     
-    # Track statistics
-    stats = {}
-    processed = 0
+    # What earlier runs placed; moved files leave the source folder, so moves need none
+    manifest = load_manifest(target_base_path) if mode != 'move' else {}
+    unchanged = 0
+    recategorized = 0
     
+    # Pick every target path up front, so parallel placements never race for a name
+    jobs = []
+    taken = set()
     for file_path in all_files:
         filename = file_path.name
         category = categorize_file(filename)
+        file_stat = file_path.stat()
+        place_source, place_mode = file_path, mode
+        
+        entry = manifest.get(filename)
+        if entry:
+            old_target = target_base_path / entry['target']
+            same_file = (entry['size'] == file_stat.st_size
+                         and entry['mtime_ns'] == file_stat.st_mtime_ns)
+            if same_file and old_target.exists():
+                if entry['category'] == category:
+                    # Already organised and unchanged
+                    unchanged += 1
+                    continue
+                # The rules changed: move the organised file to its new category
+                place_source, place_mode = old_target, 'move'
+                recategorized += 1
+            elif old_target.exists():
+                # The source changed since it was placed: replace the outdated file
+                old_target.unlink()
         
         # Create category directory
         category_dir = target_base_path / category
@@ -201,33 +328,64 @@ def organize_files(source_dir, target_base_dir, mode='copy'):
         # Handle duplicate filenames
         counter = 1
         original_target = target_path
-        while target_path.exists():
+        while target_path.exists() or target_path in taken:
             stem = original_target.stem
             suffix = original_target.suffix
             target_path = category_dir / f"{stem}_{counter}{suffix}"
             counter += 1
-        
-        # Copy or move file
+        taken.add(target_path)
+        jobs.append((file_path, file_stat, place_source, target_path, category, place_mode))
+    
+    # Track statistics
+    stats = {}
+    methods = {}
+    processed = 0
+    
+    # Copy, move or link the files
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(place_file, place_source, target_path, place_mode): (file_path, file_stat, target_path, category)
+            for file_path, file_stat, place_source, target_path, category, place_mode in jobs
+        }
         try:
-            if mode == 'copy':
-                shutil.copy2(file_path, target_path)
-            else:
-                shutil.move(str(file_path), str(target_path))
-            
-            processed += 1
-            stats[category] = stats.get(category, 0) + 1
-            
-            if processed % 50 == 0:
-                print(f"Processed {processed}/{len(all_files)} files...")
-                
-        except Exception as e:
-            print(f"Error processing {filename}: {e}")
+            for future in as_completed(futures):
+                file_path, file_stat, target_path, category = futures[future]
+                try:
+                    method = future.result()
+                    
+                    processed += 1
+                    stats[category] = stats.get(category, 0) + 1
+                    methods[method] = methods.get(method, 0) + 1
+                    if mode != 'move':
+                        manifest[file_path.name] = {
+                            'size': file_stat.st_size,
+                            'mtime_ns': file_stat.st_mtime_ns,
+                            'category': category,
+                            'target': target_path.relative_to(target_base_path).as_posix(),
+                        }
+                    
+                    if processed % 50 == 0:
+                        print(f"Processed {processed}/{len(jobs)} files...")
+                        
+                except Exception as e:
+                    print(f"Error processing {file_path.name}: {e}")
+        finally:
+            # Saved even if interrupted, so the next run skips what was placed
+            if mode != 'move':
+                save_manifest(target_base_path, manifest)
     
     # Print summary
     print("\n" + "=" * 60)
     print("ORGANIZATION COMPLETE!")
     print("=" * 60)
-    print(f"\nTotal files processed: {processed}/{len(all_files)}")
+    print(f"\nTotal files processed: {processed}/{len(jobs)}")
+    if unchanged:
+        print(f"Already organised and unchanged (skipped): {unchanged}")
+    if recategorized:
+        print(f"Moved to a new category after a rule change: {recategorized}")
+    if mode in ('hardlink', 'reflink') and methods.get('copy'):
+        print(f"⚠️  {methods['copy']} file(s) copied: the filesystem does not support {mode}s here")
+    print(", ".join(f"{method}: {count}" for method, count in sorted(methods.items())))
     print(f"\nFiles per category:")
     print("-" * 60)
     
@@ -239,8 +397,6 @@ def organize_files(source_dir, target_base_dir, mode='copy'):
 
 def main():
     """Interactive organizer."""
-    import sys
-    
     # Default paths
     source_dir = "Malcom Skylar/downloads"
     target_dir = "Malcom Skylar/organized"
@@ -272,12 +428,14 @@ def main():
     print("\nChoose organization mode:")
     print("1. COPY files (keeps originals in downloads folder)")
     print("2. MOVE files (removes from downloads folder)")
+    print("3. HARDLINK files (keeps originals, no extra disk space; copies if unsupported)")
+    print("4. REFLINK files (copy-on-write clones on Btrfs/XFS/APFS; copies if unsupported)")
     
-    choice = input("\nEnter your choice (1 or 2) [1]: ").strip() or '1'
-    mode = 'copy' if choice == '1' else 'move'
+    choice = input("\nEnter your choice (1-4) [3]: ").strip() or '3'
+    mode = {'1': 'copy', '2': 'move', '4': 'reflink'}.get(choice, 'hardlink')
     
     # Confirm
-    action_word = "copied" if mode == 'copy' else "moved"
+    action_word = {'copy': "copied", 'move': "moved", 'hardlink': "hard-linked", 'reflink': "cloned"}[mode]
     print(f"\n⚠️  {file_count} files will be {action_word} to '{target_dir}'")
     confirm = input("Continue? (yes/no) [yes]: ").strip().lower() or 'yes'
     
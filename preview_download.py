@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Preview downloads: a small photo size or a document's thumbnail instead of the file.
+
+Telegram stores every photo in several sizes and most documents (videos,
+PDFs, images sent as files) with a thumbnail, so a channel can be triaged
+by downloading a few tens of KB per message instead of the full files.
+Previews are recorded in the tracker as preview-only and are upgraded to
+full downloads by a later run in 'full' mode.
+
+Telegram's photo size types, by longest side in pixels:
+    's' 100, 'm' 320, 'x' 800, 'y' 1280, 'w' 2560
+"""
+
+import os
+
+from telethon.tl import types
+
+from document_download import unique_path
+from download_filters import media_attributes
+
+SIZE_SIDES = {'s': 100, 'm': 320, 'x': 800, 'y': 1280, 'w': 2560}
+
+# Sizes that can be saved as an image (not vector outlines or video thumbnails)
+_IMAGE_SIZES = (types.PhotoSize, types.PhotoCachedSize, types.PhotoSizeProgressive, types.PhotoStrippedSize)
+
+
+def _side(size):
+    return max(getattr(size, 'w', 0), getattr(size, 'h', 0))
+
+
+def pick_thumb(sizes, size_type='m'):
+    """
+    Choose the size to download from a photo's sizes or a document's thumbs.
+
+    Returns:
+        The size of type size_type, otherwise the largest one not bigger than
+        it, otherwise the smallest one; None if there is no image size at all
+    """
+    candidates = [size for size in sizes or [] if isinstance(size, _IMAGE_SIZES)]
+    if not candidates:
+        return None
+    for size in candidates:
+        if size.type == size_type:
+            return size
+    limit = SIZE_SIDES.get(size_type, SIZE_SIDES['m'])
+    fitting = [size for size in candidates if _side(size) <= limit]
+    return max(fitting, key=_side) if fitting else min(candidates, key=_side)
+
+
+def preview_name(message):
+    """File name of a message's preview: <message id>_<original name>.jpg"""
+    file_name = media_attributes(message)[3]
+    if file_name:
+        stem = os.path.splitext(file_name)[0]
+    else:
+        stem = f"photo_{message.date:%Y-%m-%d_%H-%M-%S}" if message.date else "photo"
+    return f"{message.id}_{stem}.jpg"
+
+
+async def download_preview(client, message, preview_dir, size_type='m',
+                           rate_controller=None, bandwidth_limiter=None):
+    """
+    Download the preview of a photo or document message.
+
+    Args:
+        client: Connected TelegramClient
+        message: Message with a photo or document
+        preview_dir: Folder for the preview images
+        size_type: Preferred photo size type (see SIZE_SIDES)
+        rate_controller: Optional RateController that waits out and retries FloodWaits
+            (timeouts lower its concurrency limit and are raised)
+        bandwidth_limiter: Optional BandwidthLimiter shared with the other downloads
+
+    Returns:
+        Path of the saved preview, or None if the media has no thumbnail
+    """
+    document = getattr(message.media, 'document', None)
+    photo = getattr(message.media, 'photo', None)
+    sizes = document.thumbs if document else photo.sizes if photo else None
+    thumb = pick_thumb(sizes, size_type)
+    if thumb is None:
+        return None
+
+    os.makedirs(preview_dir, exist_ok=True)
+    path = unique_path(preview_dir, preview_name(message))
+    kwargs = {'file': path, 'thumb': thumb}
+    if bandwidth_limiter:
+        kwargs['progress_callback'] = bandwidth_limiter.progress_callback()
+    if rate_controller:
+        return await rate_controller.call(client.download_media, message, **kwargs)
+    return await client.download_media(message, **kwargs)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Adaptive, FloodWait-aware rate control for Telegram requests.
+
+Every API call and download of a run goes through one RateController:
+
+- FloodWait and slow-mode errors pause *all* requests for exactly the number
+  of seconds Telegram asked for, after which the failed request is retried.
+- The number of concurrent downloads adapts AIMD-style: after every `limit`
+  healthy responses one more download may run; a flood error or timeout
+  halves it. This keeps the run close to the server's real limit without
+  repeatedly hitting it and getting the account throttled for hours.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from telethon import errors
+
+# Plain socket/asyncio timeouts and Telegram's own -503 "Timeout" error
+TIMEOUT_ERRORS = (asyncio.TimeoutError, TimeoutError, errors.TimedOutError)
+
+
+class RateController:
+    """Shared pause-on-flood gate plus an AIMD limit on concurrent downloads."""
+
+    def __init__(self, initial=4, minimum=1, maximum=16, max_flood_wait=3600, label=""):
+        """
+        Args:
+            initial: Concurrent downloads to start with
+            minimum, maximum: Bounds for the adaptive limit
+            max_flood_wait: Longest FloodWait (seconds) that is waited out;
+                longer ones are raised to the caller instead
+            label: Prefix for progress lines
+        """
+        self.limit = max(minimum, min(initial, maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.max_flood_wait = max_flood_wait
+        self.label = label
+        self.active = 0  # downloads holding a slot right now
+        self.flood_waits = 0
+        self.flood_seconds = 0
+        self.timeouts = 0
+        self._healthy = 0  # successful responses since the limit last changed
+        self._resume_at = 0.0  # time.monotonic() until which requests are paused
+        self._slot_freed = asyncio.Event()
+
+    def paused_for(self):
+        """Seconds left in the current flood pause (0 if not paused)."""
+        return max(0.0, self._resume_at - time.monotonic())
+
+    async def wait_ready(self):
+        """Wait until no flood pause is in effect."""
+        while True:
+            delay = self._resume_at - time.monotonic()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one of the `limit` download slots for the duration of the block."""
+        while self.active >= self.limit:
+            self._slot_freed.clear()
+            await self._slot_freed.wait()
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._slot_freed.set()
+
+    def on_success(self):
+        """Additive increase: one more slot after a full window of healthy responses."""
+        self._healthy += 1
+        if self._healthy >= self.limit and self.limit < self.maximum:
+            self.limit += 1
+            self._healthy = 0
+            self._slot_freed.set()
+
+    def back_off(self):
+        """Multiplicative decrease of the concurrency limit."""
+        self.limit = max(self.minimum, self.limit // 2)
+        self._healthy = 0
+
+    def set_limit(self, limit):
+        """
+        Fix the concurrency limit while running (e.g. from the control socket).
+
+        The limit becomes the new maximum, so additive increase does not grow
+        past it; flood errors and timeouts can still halve it.
+        """
+        self.limit = self.maximum = max(1, limit)
+        self.minimum = min(self.minimum, self.limit)
+        self._healthy = 0
+        self._slot_freed.set()
+
+    async def handle_error(self, error):
+        """
+        React to a failed request.
+
+        Returns:
+            True if the request should be retried (the flood pause is already
+            over by then), False if the error should be raised
+        """
+        if isinstance(error, errors.FloodError) and getattr(error, 'seconds', None) is not None:
+            self.flood_waits += 1
+            self.back_off()
+            if error.seconds > self.max_flood_wait:
+                return False
+
+            resume_at = time.monotonic() + error.seconds
+            if resume_at > self._resume_at:
+                self._resume_at = resume_at
+                self.flood_seconds += error.seconds
+                print(f"{self.label}⏳ Telegram asked to wait {error.seconds}s; "
+                      f"pausing requests (concurrent downloads now {self.limit})")
+            await self.wait_ready()
+            return True
+
+        if isinstance(error, TIMEOUT_ERRORS):
+            self.timeouts += 1
+            self.back_off()
+        return False
+
+    async def call(self, func, *args, **kwargs):
+        """Await func(*args, **kwargs), waiting out and retrying flood errors."""
+        while True:
+            await self.wait_ready()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                if not await self.handle_error(e):
+                    raise
+                continue
+            self.on_success()
+            return result
+
+    async def iter_messages(self, client, entity, **kwargs):
+        """client.iter_messages that waits out flood errors and continues where it stopped."""
+        offset_id = kwargs.pop('offset_id', 0)
+        while True:
+            await self.wait_ready()
+            try:
+                async for message in client.iter_messages(entity, offset_id=offset_id, **kwargs):
+                    # Newest first, so a restart asks for messages older than this one
+                    offset_id = message.id
+                    yield message
+                    await self.wait_ready()
+                return
+            except Exception as e:
+                if not await self.handle_error(e):
+                    raise
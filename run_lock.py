@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Per-channel run lock of the downloader.
+
+Each channel folder has a .download.lock file. A run holds an exclusive
+flock on it from the moment the channel is opened until its tracker is
+closed, so a second run on the same channel refuses to start instead of
+writing to the tracker at the same time. The kernel drops the lock when
+the process exits, however it exits, so a crashed run never leaves a
+stale lock behind.
+
+The file also describes the run holding it (pid, host, start time, mode
+and progress counters, rewritten every few seconds), so
+check_download_running.py can report on a run by reading the file. It
+does not need to search the process table for the script name.
+"""
+
+import json
+import os
+import socket
+import time
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: the file still records the run, without locking
+    fcntl = None
+
+LOCK_FILE = '.download.lock'
+
+# How long to retry the lock; a status check holds it (shared) for a moment
+ACQUIRE_TIMEOUT = 1.0
+
+
+class AlreadyRunning(Exception):
+    """Another process holds the channel's run lock."""
+
+    def __init__(self, path, info):
+        self.path = path
+        self.info = info or {}
+        pid = self.info.get('pid', '?')
+        host = self.info.get('host', '?')
+        started = self.info.get('started', '?')
+        super().__init__(f"another download is already running on this channel "
+                         f"(pid {pid} on {host}, started {started}; lock: {path})")
+
+
+def lock_path(channel_folder):
+    return os.path.join(channel_folder, LOCK_FILE)
+
+
+def _read_info(file):
+    """Parse the run description of an open lock file (None if empty or half-written)."""
+    file.seek(0)
+    try:
+        return json.loads(file.read() or 'null')
+    except ValueError:
+        return None
+
+
+class RunLock:
+    """Exclusive lock on a channel folder, holding a description of the run."""
+
+    def __init__(self, channel_folder, mode='full'):
+        """
+        Args:
+            channel_folder: Folder of the channel (holds the tracker)
+            mode: DOWNLOAD_MODE of the run, recorded for status checks
+        """
+        self.path = lock_path(channel_folder)
+        self.info = {
+            'pid': os.getpid(),
+            'host': socket.gethostname(),
+            'started': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'updated': None,
+            'finished': None,
+            'mode': mode,
+            'progress': {},
+        }
+        self._file = None
+
+    def acquire(self):
+        """
+        Take the lock and write the run description.
+
+        Raises:
+            AlreadyRunning if another process holds the lock
+        """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        # 'a+' neither truncates the holder's description nor fails if the file is missing
+        file = open(self.path, 'a+', encoding='utf-8')
+        if fcntl:
+            deadline = time.monotonic() + ACQUIRE_TIMEOUT
+            while True:
+                try:
+                    fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        info = _read_info(file)
+                        file.close()
+                        raise AlreadyRunning(self.path, info)
+                    time.sleep(0.05)
+        self._file = file
+        self.update()
+        return self
+
+    def update(self, progress=None):
+        """Rewrite the run description, with new progress counters if given."""
+        if progress is not None:
+            self.info['progress'] = progress
+        self.info['updated'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # Rewritten in place: replacing the file would leave the lock on the old one
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.write(json.dumps(self.info, ensure_ascii=False, indent=2))
+        self._file.flush()
+
+    def release(self, progress=None):
+        """Record the end of the run and drop the lock."""
+        if self._file is None:
+            return
+        self.info['finished'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.update(progress)
+        # Closing the file releases the flock
+        self._file.close()
+        self._file = None
+
+
+def read_lock(channel_folder):
+    """
+    Read a channel's lock without disturbing the run holding it.
+
+    Returns:
+        (running, info): whether a process holds the lock right now, and the
+        description written by the current or last run (None if there is none)
+    """
+    path = lock_path(channel_folder)
+    if not os.path.exists(path):
+        return False, None
+
+    with open(path, encoding='utf-8') as file:
+        if fcntl is None:
+            info = _read_info(file)
+            return bool(info) and not info.get('finished'), info
+        try:
+            fcntl.flock(file.fileno(), fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except BlockingIOError:
+            running = True
+        else:
+            running = False
+            fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+        # The holder may be halfway through rewriting it
+        for _ in range(5):
+            info = _read_info(file)
+            if info is not None:
+                break
+            time.sleep(0.02)
+    return running, info
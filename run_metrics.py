@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Metrics of a download run.
+
+Counters (files, bytes, skips and errors by cause), a per-file download time
+histogram and gauges (queue depth, concurrency, FloodWait time, bandwidth
+limit, tracker save time) are collected in one Metrics object and exposed as:
+
+- a Prometheus text endpoint on localhost:   http://127.0.0.1:9464/metrics
+- a JSON stats file rewritten every few seconds (atomic replace)
+- a structured log: one JSON object per event, appended to a .jsonl file
+
+so a slow run can be traced to the network, Telegram throttling or local disk.
+"""
+
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+
+# Upper bounds (seconds) of the per-file download time histogram buckets
+LATENCY_BUCKETS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600]
+
+PROMETHEUS_PREFIX = 'telegram_downloader_'
+
+HELP = {
+    'files_downloaded_total': 'Files downloaded',
+    'previews_downloaded_total': 'Preview-mode messages handled (thumbnail saved or none available)',
+    'bytes_downloaded_total': 'Bytes of downloaded files',
+    'messages_scanned_total': 'Messages read from channel history',
+    'files_skipped_total': 'Media messages not downloaded, by cause',
+    'errors_total': 'Failed downloads and scans, by cause',
+    'tracker_commit_seconds_total': 'Time spent committing the tracker store',
+    'tracker_write_seconds_total': 'Time spent recording finished files in the tracker, including group commits',
+    'tracker_commits_total': 'Tracker store commits',
+    'file_download_seconds': 'Time to download one file',
+}
+
+
+def _escape_label(value):
+    """Escape a label value for the Prometheus text format (backslash, quote, newline)."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in labels) + '}'
+
+
+class Metrics:
+    """Counters, one histogram and callback gauges for a run."""
+
+    def __init__(self, log_file=None):
+        """
+        Args:
+            log_file: Optional path of a JSON-lines structured event log
+        """
+        self.started = time.time()
+        self.counters = {}  # (name, labels tuple) -> value
+        self.histogram = {'buckets': [0] * len(LATENCY_BUCKETS), 'count': 0, 'sum': 0.0}
+        self.gauges = {}  # name -> function returning {labels tuple: value}
+        self.log_file = log_file
+        self._log = open(log_file, 'a', encoding='utf-8') if log_file else None
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def counter(self, name, **labels):
+        """Sum of a counter over all label values matching the given labels."""
+        wanted = set(labels.items())
+        return sum(value for (counter_name, counter_labels), value in self.counters.items()
+                   if counter_name == name and wanted <= set(counter_labels))
+
+    def observe_download(self, seconds):
+        """Add one file's download time to the histogram."""
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.histogram['buckets'][index] += 1
+        self.histogram['count'] += 1
+        self.histogram['sum'] += seconds
+
+    def gauge(self, name, read, help_text=''):
+        """Register a gauge; read() returns a number or a {labels tuple: number} dict."""
+        self.gauges[name] = (read, help_text)
+
+    def event(self, event, **fields):
+        """Write one structured log line (no-op unless a log file is set)."""
+        if self._log is None:
+            return
+        record = {'time': datetime.now().isoformat(timespec='milliseconds'), 'event': event, **fields}
+        self._log.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+        self._log.flush()
+
+    def close(self):
+        if self._log:
+            self._log.close()
+            self._log = None
+
+    def _gauge_values(self):
+        values = {}
+        for name, (read, _) in self.gauges.items():
+            value = read()
+            values[name] = value if isinstance(value, dict) else {(): value}
+        return values
+
+    # -- exporters -----------------------------------------------------------
+
+    def snapshot(self):
+        """All metrics as a JSON-serialisable dict, with run-average rates."""
+        elapsed = max(time.time() - self.started, 1e-9)
+        counters = {}
+        for (name, labels), value in sorted(self.counters.items()):
+            counters.setdefault(name, {})[','.join(f'{k}={v}' for k, v in labels) or 'total'] = value
+
+        histogram = dict(self.histogram)
+        histogram['bounds'] = LATENCY_BUCKETS
+        return {
+            'updated': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'elapsed_seconds': round(elapsed, 1),
+            'files_per_second': round(self.counter('files_downloaded_total') / elapsed, 3),
+            'bytes_per_second': round(self.counter('bytes_downloaded_total') / elapsed, 1),
+            'counters': counters,
+            'gauges': {
+                name: {','.join(f'{k}={v}' for k, v in labels) or 'value': value
+                       for labels, value in series.items()}
+                for name, series in self._gauge_values().items()
+            },
+            'file_download_seconds': histogram,
+        }
+
+    def prometheus_text(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        by_name = {}
+        for (name, labels), value in sorted(self.counters.items()):
+            by_name.setdefault(name, []).append((labels, value))
+        for name, series in by_name.items():
+            full_name = PROMETHEUS_PREFIX + name
+            lines.append(f"# HELP {full_name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {full_name} counter")
+            lines += [f"{full_name}{_label_text(labels)} {value}" for labels, value in series]
+
+        for name, series in self._gauge_values().items():
+            full_name = PROMETHEUS_PREFIX + name
+            lines.append(f"# HELP {full_name} {self.gauges[name][1] or name}")
+            lines.append(f"# TYPE {full_name} gauge")
+            lines += [f"{full_name}{_label_text(labels)} {value}" for labels, value in series.items()
+                      if value is not None]
+
+        full_name = PROMETHEUS_PREFIX + 'file_download_seconds'
+        lines.append(f"# HELP {full_name} {HELP['file_download_seconds']}")
+        lines.append(f"# TYPE {full_name} histogram")
+        for bound, count in zip(LATENCY_BUCKETS, self.histogram['buckets']):
+            lines.append(f'{full_name}_bucket{{le="{bound}"}} {count}')
+        lines.append(f'{full_name}_bucket{{le="+Inf"}} {self.histogram["count"]}')
+        lines.append(f"{full_name}_sum {self.histogram['sum']:.3f}")
+        lines.append(f"{full_name}_count {self.histogram['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+async def start_prometheus(metrics, port, host='127.0.0.1'):
+    """
+    Start serving metrics.prometheus_text() over HTTP.
+
+    The port is bound before this returns, so a port in use raises OSError
+    here; the caller then runs server.serve_forever() until cancelled.
+
+    Returns:
+        The listening asyncio.Server
+    """
+
+    async def handle(reader, writer):
+        try:
+            request_line = await reader.readline()
+            # Skip the request headers
+            while (await reader.readline()).strip():
+                pass
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[1].split('?')[0] in ('/', '/metrics'):
+                body = metrics.prometheus_text().encode()
+                status = '200 OK'
+            else:
+                body = b'Not found\n'
+                status = '404 Not Found'
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+def write_stats_file(metrics, path):
+    """Atomically replace path with the current metrics snapshot."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(metrics.snapshot(), f, indent=2, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)
+
+
+async def stats_file_writer(metrics, path, interval):
+    """Rewrite the JSON stats file every interval seconds until cancelled."""
+    try:
+        while True:
+            write_stats_file(metrics, path)
+            await asyncio.sleep(interval)
+    finally:
+        # Final numbers of the run
+        write_stats_file(metrics, path)
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Test categorisation by file name and message caption.
+"""
+
+from keyword_matcher import KeywordMatcher
+from organize_existing_files import categorize_message
+
+def test_name_keyword_wins_over_caption():
+    assert categorize_message('Surgery_notes.pdf', 'Microbiology revision') == '08_Surgery_Perioperative'
+
+def test_caption_used_when_name_has_no_keyword():
+    assert categorize_message('file_1.pdf', 'Microbiology: lecture 3') == '01_Microbiology'
+    assert categorize_message('file_1.pdf', 'STI screening') == '05_Immunology'
+    assert categorize_message('file_1.pdf', 'Pap smear guide') == '04_Histopathology_Cytopathology'
+
+def test_caption_keywords_match_whole_words_only():
+    """'sti' in "questions" or 'ems' in "systems" is not a keyword match."""
+    assert categorize_message('file_1.pdf', 'Revision questions') != '05_Immunology'
+    assert categorize_message('file_1.pdf', 'Body systems') == '21_PDFs_Uncategorized'
+    assert categorize_message('file_1.pdf', 'Student event') == '21_PDFs_Uncategorized'
+    assert categorize_message('file_1.docx', '') == '22_Documents_Uncategorized'
+
+def test_whole_word_matcher_keeps_category_order():
+    matcher = KeywordMatcher({'first': ['blood gases'], 'second': ['blood']}, whole_words=True)
+    assert matcher.match('Arterial blood-gases, part 2') == 'first'
+    assert matcher.match('Blood film') == 'second'
+    assert matcher.match('Bloodborne') is None
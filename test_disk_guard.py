@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test the free-space accounting of DiskSpaceGuard.
+"""
+
+import asyncio
+import errno
+
+import pytest
+
+import disk_guard
+from disk_guard import DiskSpaceGuard
+
+MB = 1024 * 1024
+
+class FakeDisk:
+    """A volume whose free space drops as files are allocated on it."""
+
+    def __init__(self, free):
+        self.free = free
+
+    def free_bytes(self, path):
+        return self.free
+
+def test_preallocated_space_is_not_reserved_twice(monkeypatch):
+    """Once a download's .part file is allocated, the next file can use the rest of the disk."""
+    disk = FakeDisk(250 * MB)
+    monkeypatch.setattr(disk_guard, 'free_bytes', disk.free_bytes)
+    guard = DiskSpaceGuard(min_free=50 * MB, action='skip')
+    part_file = {'allocated': 0}
+
+    async def scenario():
+        async with guard.space_for('.', 100 * MB, 'first', allocated=lambda: part_file['allocated']):
+            assert guard.reserved == 100 * MB
+            # preallocate() takes the whole size from the free space
+            part_file['allocated'] = 100 * MB
+            disk.free -= 100 * MB
+            assert guard.reserved == 0
+            async with guard.space_for('.', 100 * MB, 'second'):
+                assert guard.reserved == 100 * MB
+        assert guard.reserved == 0
+
+    asyncio.run(scenario())
+
+def test_resumed_download_reserves_only_the_rest(monkeypatch):
+    """A .part file kept from an earlier run already holds part of the file."""
+    monkeypatch.setattr(disk_guard, 'free_bytes', FakeDisk(120 * MB).free_bytes)
+    guard = DiskSpaceGuard(min_free=50 * MB, action='skip')
+
+    async def scenario():
+        async with guard.space_for('.', 100 * MB, 'resumed', allocated=lambda: 40 * MB):
+            assert guard.reserved == 60 * MB
+
+    asyncio.run(scenario())
+
+def test_skip_action_raises_enospc(monkeypatch):
+    monkeypatch.setattr(disk_guard, 'free_bytes', FakeDisk(120 * MB).free_bytes)
+    guard = DiskSpaceGuard(min_free=50 * MB, action='skip')
+
+    async def scenario():
+        async with guard.space_for('.', 100 * MB, 'too big'):
+            pass
+
+    with pytest.raises(OSError) as error:
+        asyncio.run(scenario())
+    assert error.value.errno == errno.ENOSPC
+    assert guard.reserved == 0
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Test that a run stopped in the middle of downloads does not move the high-water mark.
+"""
+
+import asyncio
+
+import download_telegram_files as downloader
+import tracker_store
+from fake_telegram import FakeTelegramClient, make_channel
+
+def test_cancelled_downloads_keep_high_water_mark(tmp_path, monkeypatch):
+    """Cancel a run after its scan finished, while every file is still downloading."""
+    monkeypatch.chdir(tmp_path)
+    channel = make_channel(1, "Interrupted channel", 3, media_ratio=1.0, photo_ratio=0.0,
+                           min_size=4 * 1024 * 1024, max_size=4 * 1024 * 1024)
+    monkeypatch.setattr(downloader, 'CHANNELS', [channel.id])
+    # One worker per file, so nothing is left waiting in the queue
+    monkeypatch.setattr(downloader, 'DOWNLOAD_WORKERS', 4)
+    monkeypatch.setattr(downloader, 'DEDUP_MODE', None)
+    monkeypatch.setattr(downloader, 'CONTROL_SOCKET', None)
+    monkeypatch.setattr(downloader, 'EXPORT_JSON_AFTER_RUN', False)
+
+    async def run_and_cancel():
+        # 4 MB files at 1 MB/s: still downloading when the run is stopped
+        client = FakeTelegramClient([channel], bandwidth=1024 * 1024)
+        run = asyncio.create_task(downloader.main(client_factory=lambda: client))
+        await asyncio.sleep(1)
+        run.cancel()
+        try:
+            await run
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run_and_cancel())
+
+    store = tracker_store.open_store(channel.title, readonly=True)
+    sync_state = tracker_store.get_state(store, 'sync_state', {})
+    tracked = tracker_store.count_files(store)
+    store.close()
+
+    assert tracked < 3
+    assert 'last_message_id' not in sync_state
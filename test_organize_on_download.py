@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Test that files saved straight into category folders keep one metadata row each.
+"""
+
+import asyncio
+import os
+
+import download_telegram_files as downloader
+import tracker_store
+from fake_telegram import FakeTelegramClient, make_channel
+
+def test_same_name_in_two_categories_keeps_both_metadata_rows(tmp_path, monkeypatch):
+    """Re-uploads share a file name but their captions send them to different folders."""
+    monkeypatch.chdir(tmp_path)
+    channel = make_channel(1, "Organized channel", 40, media_ratio=1.0, photo_ratio=0.0,
+                           min_size=1024, max_size=4096, extensions=('.pdf',),
+                           captions=['Microbiology notes', 'Surgery notes'],
+                           duplicate_ratio=0.5)
+    monkeypatch.setattr(downloader, 'CHANNELS', [channel.id])
+    monkeypatch.setattr(downloader, 'ORGANIZE_ON_DOWNLOAD', True)
+    monkeypatch.setattr(downloader, 'CATEGORIZE_BY_CAPTION', True)
+    monkeypatch.setattr(downloader, 'DEDUP_MODE', None)
+    monkeypatch.setattr(downloader, 'CONTROL_SOCKET', None)
+    monkeypatch.setattr(downloader, 'EXPORT_JSON_AFTER_RUN', False)
+
+    client = FakeTelegramClient([channel])
+    asyncio.run(downloader.main(client_factory=lambda: client))
+
+    names = [name for _, _, files in os.walk(os.path.join(channel.title, 'organized'))
+             for name in files]
+    store = tracker_store.open_store(channel.title, readonly=True)
+    metadata_rows = tracker_store.count_metadata(store)
+    tracked = tracker_store.count_files(store)
+    store.close()
+
+    assert len(names) == tracked == 40
+    assert len(set(names)) == len(names)
+    assert metadata_rows == len(names)
@@ -3,31 +3,35 @@
 Test that the download script preserves message_text fields.
 """
 
-import json
-import os
+import tracker_store
 
 def test_tracker_fields():
-    """Test that tracker has message_text fields."""
-    tracker_file = 'Malcom Skylar/downloaded_files_tracker.json'
+    """Test that tracker entries have their message text and file size."""
+    channel_folder = 'Malcom Skylar'
     
-    if not os.path.exists(tracker_file):
-        print("❌ Tracker file not found!")
+    if not tracker_store.has_tracker(channel_folder):
+        print("❌ Tracker not found!")
         return False
     
-    with open(tracker_file, 'r', encoding='utf-8') as f:
-        tracker = json.load(f)
+    store = tracker_store.open_store(channel_folder, readonly=True)
     
-    total = len(tracker['downloaded_files'])
-    with_message = sum(1 for info in tracker['downloaded_files'].values() 
-                       if 'message_text' in info)
-    with_size = sum(1 for info in tracker['downloaded_files'].values() 
-                    if 'file_size' in info)
+    # Both columns are NOT NULL with a default, so a missing value is '' or 0.
+    # An empty caption is only missing if the file's metadata has one.
+    total, without_message, missing_message, missing_size = store.execute("""
+        SELECT COUNT(*),
+               COALESCE(SUM(f.message_text = ''), 0),
+               COALESCE(SUM(f.message_text = '' AND COALESCE(m.message_text, '') != ''), 0),
+               COALESCE(SUM(f.file_size = 0), 0)
+        FROM downloaded_files f LEFT JOIN file_metadata m ON m.filename = f.filename
+    """).fetchone()
+    store.close()
     
     print(f"Total files: {total}")
-    print(f"Files with message_text: {with_message}/{total}")
-    print(f"Files with file_size: {with_size}/{total}")
+    print(f"Files with message_text: {total - without_message}/{total} "
+          f"({missing_message} missing a caption their metadata has)")
+    print(f"Files with file_size: {total - missing_size}/{total}")
     
-    if with_message == total and with_size == total:
+    if not missing_message and not missing_size:
         print("✅ All files have required fields!")
         return True
     else:
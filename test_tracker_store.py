@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test the tracker store queries behind list_downloaded_files and the search commands.
+"""
+
+import pytest
+
+import tracker_store
+
+def make_store(tmp_path, count=23):
+    """A tracker with repeated dates and sizes and some entries without a date."""
+    store = tracker_store.open_store(str(tmp_path))
+    for i in range(count):
+        tracker_store.put_file(store, f"id{i}", {
+            "filename": f"file_{i % 7}.pdf",
+            "message_id": i + 1,
+            "download_date": f"2025-01-{i % 5 + 1:02d} 10:00:00",
+            "original_message_date": None if i % 4 == 0 else f"2024-12-{i % 3 + 1:02d} 09:00:00",
+            "message_text": "",
+            "file_size": (i % 6) * 1000,
+        })
+    return store
+
+def expected_order(store, sort, descending):
+    """Entries sorted in Python, with NULLs as the smallest values (as SQLite orders them)."""
+    rows = store.execute(f"SELECT rowid, file_id, {sort} AS value FROM downloaded_files").fetchall()
+    ordered = sorted(rows, key=lambda row: (0, 0, row['rowid']) if row['value'] is None
+                     else (1, row['value'], row['rowid']), reverse=descending)
+    return [row['file_id'] for row in ordered]
+
+@pytest.mark.parametrize('descending', [True, False])
+@pytest.mark.parametrize('sort', list(tracker_store.SORT_COLUMNS))
+def test_pages_cover_every_entry_once_in_order(tmp_path, sort, descending):
+    store = make_store(tmp_path)
+    expected = expected_order(store, sort, descending)
+    seen = []
+    cursor = None
+    while True:
+        entries, cursor = tracker_store.page_files(store, sort, descending, after=cursor, limit=4)
+        seen.extend(file_id for file_id, _ in entries)
+        if cursor is None:
+            break
+    store.close()
+    assert seen == expected
+
+def test_exact_last_page_returns_a_cursor_then_nothing(tmp_path):
+    store = make_store(tmp_path, count=8)
+    entries, cursor = tracker_store.page_files(store, 'file_size', limit=8)
+    assert len(entries) == 8 and cursor is not None
+    assert tracker_store.page_files(store, 'file_size', after=cursor, limit=8) == ([], None)
+    store.close()
+
+def test_unknown_sort_column_is_rejected(tmp_path):
+    store = make_store(tmp_path, count=1)
+    with pytest.raises(ValueError):
+        tracker_store.page_files(store, 'message_text')
+    store.close()
+
+def make_search_store(tmp_path):
+    store = tracker_store.open_store(str(tmp_path))
+    files = [
+        ("a", "Haematology_Notes.pdf", "Week 3"),
+        ("b", "Lecture_12.pdf", "Haematology notes for the CAT"),
+        ("c", "Blood_gases.pptx", "Clinical chemistry"),
+        ("d", "Microbiology.pdf", "Bacterial notes"),
+    ]
+    for message_id, (file_id, filename, text) in enumerate(files, 1):
+        tracker_store.put_file(store, file_id, {"filename": filename, "message_id": message_id,
+                                                "message_text": text, "file_size": 1000})
+        tracker_store.put_metadata(store, filename, {"message_id": message_id, "message_text": text})
+    return store
+
+def search_ids(store, term, **kwargs):
+    return [file_id for file_id, _ in tracker_store.search_files(store, term, **kwargs)]
+
+def test_search_matches_word_prefixes_filename_first(tmp_path):
+    store = make_search_store(tmp_path)
+    # Filename hits weigh more than caption hits
+    assert search_ids(store, "haem notes") == ["a", "b"]
+    assert search_ids(store, "haem notes", limit=1) == ["a"]
+    assert search_ids(store, "GASES") == ["c"]
+    # Prefixes of words only, not text inside a word
+    assert search_ids(store, "notes bacterial") == ["d"]
+    assert search_ids(store, "otes") == []
+    store.close()
+
+def test_search_index_follows_updates_and_deletes(tmp_path):
+    store = make_search_store(tmp_path)
+    tracker_store.put_file(store, "c", {"message_text": "Arterial samples"})
+    assert search_ids(store, "arterial") == ["c"]
+    assert search_ids(store, "chemistry") == []
+    tracker_store.delete_file(store, "a")
+    assert search_ids(store, "haem") == ["b"]
+    store.close()
+
+def test_search_without_index_falls_back_to_substrings(tmp_path, monkeypatch):
+    store = make_search_store(tmp_path)
+    monkeypatch.setattr(tracker_store, '_has_search_index', lambda conn: False)
+    assert sorted(search_ids(store, "otes")) == ["a", "b", "d"]
+    store.close()
+
+def test_search_metadata_by_column(tmp_path):
+    store = make_search_store(tmp_path)
+
+    def names(term, search_in):
+        return [name for name, _ in tracker_store.search_metadata(store, term, search_in)]
+
+    assert names("haematology", 'filename') == ["Haematology_Notes.pdf"]
+    assert names("haematology", 'text') == ["Lecture_12.pdf"]
+    assert sorted(names("haematology", 'both')) == ["Haematology_Notes.pdf", "Lecture_12.pdf"]
+    store.close()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+JSON snapshots and append-only journal of the download tracker and file metadata.
+
+Older versions of the downloader appended changes to tracker_journal.jsonl and
+folded them into downloaded_files_tracker.json and file_metadata.json. The
+tracker now lives in SQLite (see tracker_store.py); this module reads those
+JSON files and journal when migrating, and writes the JSON export.
+"""
+
+import json
+import os
+
+TRACKER_FILE = 'downloaded_files_tracker.json'
+METADATA_FILE = 'file_metadata.json'
+JOURNAL_FILE = 'tracker_journal.jsonl'
+
+SNAPSHOT_FILES = {
+    'tracker': TRACKER_FILE,
+    'metadata': METADATA_FILE,
+}
+
+
+def load_json(path, default):
+    """Load a JSON file, or return default if it does not exist."""
+    if not os.path.exists(path):
+        return default
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_json_atomic(path, data):
+    """Write JSON to a temp file and rename it over path, so a crash never truncates it."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def apply_event(docs, event):
+    """Apply one journal event: set docs[doc][path...] = value (or delete it)."""
+    target = docs[event['doc']]
+    *parents, key = event['path']
+    for part in parents:
+        target = target.setdefault(part, {})
+
+    if event.get('op') == 'delete':
+        target.pop(key, None)
+    else:
+        target[key] = event['value']
+
+
+def read_journal(channel_folder):
+    """Return all complete events in the journal, in order."""
+    journal_file = os.path.join(channel_folder, JOURNAL_FILE)
+    events = []
+    if not os.path.exists(journal_file):
+        return events
+
+    with open(journal_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                # Torn write from a crash; everything after it was never committed
+                break
+    return events
+
+
+def load_state(channel_folder):
+    """
+    Load metadata and tracker from their snapshots plus the journal.
+
+    Returns:
+        (metadata, tracker) dicts; empty dicts if nothing exists yet
+    """
+    docs = {
+        'metadata': load_json(os.path.join(channel_folder, METADATA_FILE), {}),
+        'tracker': load_json(os.path.join(channel_folder, TRACKER_FILE), {}),
+    }
+    for event in read_journal(channel_folder):
+        apply_event(docs, event)
+    return docs['metadata'], docs['tracker']
+
+
+def save_snapshot(channel_folder, tracker=None, metadata=None):
+    """
+    Write the given documents as new snapshots and drop their journal events.
+
+    Use this from tools that change the tracker or metadata directly, so stale
+    journal events are not replayed over their changes on the next load.
+    """
+    given = {'tracker': tracker, 'metadata': metadata}
+    written = {doc for doc, data in given.items() if data is not None}
+
+    for doc in written:
+        write_json_atomic(os.path.join(channel_folder, SNAPSHOT_FILES[doc]), given[doc])
+
+    journal_file = os.path.join(channel_folder, JOURNAL_FILE)
+    if not os.path.exists(journal_file):
+        return
+
+    # Keep events for documents that were not rewritten
+    remaining = [event for event in read_journal(channel_folder) if event['doc'] not in written]
+    if remaining:
+        tmp_path = journal_file + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for event in remaining:
+                f.write(json.dumps(event, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, journal_file)
+    else:
+        os.remove(journal_file)
@@ -0,0 +1,764 @@
+#!/usr/bin/env python3
+"""
+SQLite storage for the download tracker and file metadata.
+
+All scripts read and write <channel>/tracker.db through these functions
+instead of loading the whole JSON files into memory. Lookups go through
+indexes on file ID, message ID, filename and dates, so they do not slow
+down as the archive grows.
+
+The first time a channel folder is opened, the existing JSON files (plus
+any pending tracker journal) are migrated into the database. The JSON
+files can be regenerated at any time for compatibility:
+
+    python tracker_store.py export "Malcom Skylar"
+    python tracker_store.py migrate "Malcom Skylar"   # re-import from JSON
+"""
+
+import json
+import os
+import re
+import sqlite3
+import sys
+from urllib.request import pathname2url
+
+from tracker_journal import TRACKER_FILE, METADATA_FILE, JOURNAL_FILE, load_state, save_snapshot
+
+DB_FILE = 'tracker.db'
+
+# Bytes of the database file that reads access through a memory map instead
+# of read() calls (pages come straight from the OS page cache, nothing is
+# copied or parsed until a row is actually used)
+MMAP_SIZE = 256 * 1024 * 1024
+
+# Stored as PRAGMA user_version once a database has the current schema; bump
+# it whenever SCHEMA, ADDED_COLUMNS, ADDED_INDEXES or SEARCH_SCHEMA change
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloaded_files (
+    file_id TEXT PRIMARY KEY,
+    filename TEXT,
+    message_id INTEGER,
+    download_date TEXT,
+    original_message_date TEXT,
+    message_text TEXT NOT NULL DEFAULT '',
+    file_size INTEGER NOT NULL DEFAULT 0,
+    mime_type TEXT,
+    content_hash TEXT,
+    fast_hash TEXT,
+    duplicate_of TEXT,
+    preview_file TEXT,
+    preview_only INTEGER,
+    file_path TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_files_message_id ON downloaded_files(message_id);
+CREATE INDEX IF NOT EXISTS idx_files_filename ON downloaded_files(filename);
+CREATE INDEX IF NOT EXISTS idx_files_download_date ON downloaded_files(download_date);
+CREATE INDEX IF NOT EXISTS idx_files_original_date ON downloaded_files(original_message_date);
+
+CREATE TABLE IF NOT EXISTS file_metadata (
+    filename TEXT PRIMARY KEY,
+    message_id INTEGER,
+    message_text TEXT NOT NULL DEFAULT '',
+    date TEXT,
+    file_size INTEGER,
+    mime_type TEXT,
+    file_unique_id TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_metadata_file_id ON file_metadata(file_unique_id);
+CREATE INDEX IF NOT EXISTS idx_metadata_message_id ON file_metadata(message_id);
+CREATE INDEX IF NOT EXISTS idx_metadata_date ON file_metadata(date);
+
+CREATE TABLE IF NOT EXISTS message_index (
+    message_id INTEGER PRIMARY KEY,
+    file_id TEXT,
+    file_name TEXT,
+    mime_type TEXT,
+    file_size INTEGER NOT NULL DEFAULT 0,
+    message_date TEXT,
+    message_text TEXT NOT NULL DEFAULT '',
+    indexed_date TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_index_file_id ON message_index(file_id);
+
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Full-text search over filenames and captions (SQLite FTS5). The FTS tables
+# index the rows of downloaded_files and file_metadata by rowid, and triggers
+# keep them up to date on every insert, update and delete.
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(
+    filename, message_text, content='downloaded_files', content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS files_fts_insert AFTER INSERT ON downloaded_files BEGIN
+    INSERT INTO files_fts (rowid, filename, message_text)
+    VALUES (new.rowid, new.filename, new.message_text);
+END;
+CREATE TRIGGER IF NOT EXISTS files_fts_delete AFTER DELETE ON downloaded_files BEGIN
+    INSERT INTO files_fts (files_fts, rowid, filename, message_text)
+    VALUES ('delete', old.rowid, old.filename, old.message_text);
+END;
+CREATE TRIGGER IF NOT EXISTS files_fts_update AFTER UPDATE OF filename, message_text ON downloaded_files BEGIN
+    INSERT INTO files_fts (files_fts, rowid, filename, message_text)
+    VALUES ('delete', old.rowid, old.filename, old.message_text);
+    INSERT INTO files_fts (rowid, filename, message_text)
+    VALUES (new.rowid, new.filename, new.message_text);
+END;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS metadata_fts USING fts5(
+    filename, message_text, content='file_metadata', content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS metadata_fts_insert AFTER INSERT ON file_metadata BEGIN
+    INSERT INTO metadata_fts (rowid, filename, message_text)
+    VALUES (new.rowid, new.filename, new.message_text);
+END;
+CREATE TRIGGER IF NOT EXISTS metadata_fts_delete AFTER DELETE ON file_metadata BEGIN
+    INSERT INTO metadata_fts (metadata_fts, rowid, filename, message_text)
+    VALUES ('delete', old.rowid, old.filename, old.message_text);
+END;
+CREATE TRIGGER IF NOT EXISTS metadata_fts_update AFTER UPDATE OF filename, message_text ON file_metadata BEGIN
+    INSERT INTO metadata_fts (metadata_fts, rowid, filename, message_text)
+    VALUES ('delete', old.rowid, old.filename, old.message_text);
+    INSERT INTO metadata_fts (rowid, filename, message_text)
+    VALUES (new.rowid, new.filename, new.message_text);
+END;
+"""
+
+# Columns added after the first release of the schema, created on open if missing
+ADDED_COLUMNS = [
+    ('downloaded_files', 'mime_type', 'TEXT'),
+    ('downloaded_files', 'content_hash', 'TEXT'),
+    ('downloaded_files', 'duplicate_of', 'TEXT'),
+    ('downloaded_files', 'fast_hash', 'TEXT'),
+    ('downloaded_files', 'preview_file', 'TEXT'),
+    ('downloaded_files', 'preview_only', 'INTEGER'),
+    ('downloaded_files', 'file_path', 'TEXT'),
+]
+
+# Indexes on added columns (they cannot be in SCHEMA, which runs before the columns exist)
+ADDED_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_files_size ON downloaded_files(file_size);
+CREATE INDEX IF NOT EXISTS idx_files_content_hash ON downloaded_files(content_hash);
+"""
+
+# Tracker entry fields, in the order the JSON tracker has always used.
+# content_hash ("sha256:<hex>") and fast_hash ("xxh64:<hex>" or "crc32:<hex>")
+# are computed while the file downloads; duplicate_of is the file ID of an
+# earlier upload with the same content. preview_file is the thumbnail saved in
+# preview mode; preview_only is 1 until the full file has been downloaded.
+# file_path is where the file was saved, relative to the channel folder
+# (downloads/<name> or organized/<category>/<name>).
+FILE_FIELDS = [
+    'filename', 'message_id', 'download_date', 'original_message_date',
+    'message_text', 'file_size', 'mime_type', 'content_hash', 'duplicate_of',
+    'fast_hash', 'preview_file', 'preview_only', 'file_path',
+]
+
+METADATA_FIELDS = [
+    'message_id', 'message_text', 'date', 'file_size', 'mime_type', 'file_unique_id',
+]
+
+
+def db_path(channel_folder):
+    return os.path.join(channel_folder, DB_FILE)
+
+
+def has_tracker(channel_folder):
+    """Check whether a folder has a tracker database or JSON tracker."""
+    return (os.path.exists(db_path(channel_folder))
+            or os.path.exists(os.path.join(channel_folder, TRACKER_FILE)))
+
+
+def open_store(channel_folder, readonly=False):
+    """
+    Open (and create if needed) the tracker database of a channel folder.
+
+    A new database is filled from the folder's JSON files, if there are any.
+
+    Args:
+        channel_folder: Channel folder holding tracker.db
+        readonly: For scripts that only look entries up. Once the database
+            has the current schema it is opened without write access and
+            without any schema work, so opening costs the same however large
+            the tracker is and never waits for the downloader's writes.
+
+    Returns:
+        sqlite3.Connection with rows accessible by column name
+    """
+    path = db_path(channel_folder)
+    if readonly and os.path.exists(path):
+        conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}?mode=ro", uri=True)
+        if conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+            conn.row_factory = sqlite3.Row
+            conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+            return conn
+        # Older schema (or not migrated yet): upgrade it once with a normal open
+        conn.close()
+
+    os.makedirs(channel_folder, exist_ok=True)
+    is_new = not os.path.exists(path)
+
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    # WAL keeps readers working while the downloader writes; NORMAL sync is
+    # still crash-safe in WAL mode and makes each commit much cheaper
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    # INSERT OR REPLACE must fire the delete triggers that keep the search index right
+    conn.execute("PRAGMA recursive_triggers=ON")
+    conn.executescript(SCHEMA)
+    _add_missing_columns(conn)
+    _create_search_index(conn)
+
+    if is_new and (os.path.exists(os.path.join(channel_folder, TRACKER_FILE))
+                   or os.path.exists(os.path.join(channel_folder, METADATA_FILE))
+                   or os.path.exists(os.path.join(channel_folder, JOURNAL_FILE))):
+        count = migrate_from_json(conn, channel_folder)
+        print(f"✓ Migrated {count} tracked files from JSON into {path}")
+
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        conn.commit()
+    return conn
+
+
+def _add_missing_columns(conn):
+    """Bring a database created by an older version up to the current schema."""
+    for table, column, column_type in ADDED_COLUMNS:
+        existing = {row['name'] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+    conn.executescript(ADDED_INDEXES)
+
+
+def _create_search_index(conn):
+    """Create the FTS5 search tables (filled from existing rows the first time)."""
+    is_new = not _has_search_index(conn)
+    try:
+        conn.executescript(SEARCH_SCHEMA)
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5: searches fall back to substring scans
+        return
+    if is_new:
+        conn.execute("INSERT INTO files_fts (files_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO metadata_fts (metadata_fts) VALUES ('rebuild')")
+        conn.commit()
+
+
+def _has_search_index(conn):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'files_fts'"
+    ).fetchone() is not None
+
+
+def _fts_query(search_term):
+    """'Blood gas' -> '"blood"* AND "gas"*': every word must match, as a word prefix."""
+    words = re.findall(r'[^\W_]+', search_term.lower())
+    return ' AND '.join(f'"{word}"*' for word in words)
+
+
+def _split_extra(info, fields):
+    """Split an entry into known column values and a JSON string of everything else."""
+    values = [info.get(field) for field in fields]
+    extra = {key: value for key, value in info.items() if key not in fields}
+    return values, (json.dumps(extra, ensure_ascii=False) if extra else None)
+
+
+def _row_to_dict(row, fields):
+    # Columns that were never set stay out of the entry, as in the JSON files
+    info = {field: row[field] for field in fields if row[field] is not None}
+    if row['extra']:
+        info.update(json.loads(row['extra']))
+    return info
+
+
+# ---------------------------------------------------------------------------
+# Tracker entries (downloaded_files)
+# ---------------------------------------------------------------------------
+
+def is_tracked(conn, file_id, include_previews=False):
+    """Check whether a file ID has already been downloaded (or previewed, if include_previews)."""
+    row = conn.execute(
+        "SELECT preview_only FROM downloaded_files WHERE file_id = ?", (file_id,)
+    ).fetchone()
+    return row is not None and (include_previews or not row['preview_only'])
+
+
+def get_file(conn, file_id):
+    """Return the tracker entry of a file ID as a dict, or None."""
+    row = conn.execute(
+        "SELECT * FROM downloaded_files WHERE file_id = ?", (file_id,)
+    ).fetchone()
+    return _row_to_dict(row, FILE_FIELDS) if row else None
+
+
+def put_file(conn, file_id, info):
+    """
+    Insert or update a tracker entry, keeping any fields the update does not mention.
+
+    Returns:
+        True if the file ID was not tracked before
+    """
+    existing = get_file(conn, file_id)
+    merged = {**existing, **info} if existing else dict(info)
+    merged.setdefault('message_text', '')
+    merged.setdefault('file_size', 0)
+
+    values, extra = _split_extra(merged, FILE_FIELDS)
+    conn.execute(
+        f"""INSERT INTO downloaded_files (file_id, {', '.join(FILE_FIELDS)}, extra)
+            VALUES (?, {', '.join('?' for _ in FILE_FIELDS)}, ?)
+            ON CONFLICT(file_id) DO UPDATE SET
+            {', '.join(f'{field} = excluded.{field}' for field in FILE_FIELDS)},
+            extra = excluded.extra""",
+        [file_id, *values, extra]
+    )
+
+    # Previews only count as downloads once the full file is there
+    was_counted = existing is not None and not existing.get('preview_only')
+    if not merged.get('preview_only') and not was_counted:
+        stats = get_statistics(conn)
+        stats['total_downloads'] = stats.get('total_downloads', 0) + 1
+        set_state(conn, 'statistics', stats)
+    return existing is None
+
+
+def delete_file(conn, file_id):
+    """Remove a tracker entry, so the next run downloads it again. Returns the removed entry, or None."""
+    existing = get_file(conn, file_id)
+    if existing is None:
+        return None
+
+    conn.execute("DELETE FROM downloaded_files WHERE file_id = ?", (file_id,))
+    if not existing.get('preview_only'):
+        stats = get_statistics(conn)
+        stats['total_downloads'] = max(0, stats.get('total_downloads', 0) - 1)
+        set_state(conn, 'statistics', stats)
+
+    # The next run only scans messages above the high-water marks; move them
+    # below the removed file's message so it is downloaded again
+    message_id = existing.get('message_id')
+    sync_state = get_state(conn, 'sync_state', {})
+    lowered = False
+    for key in ('last_message_id', 'preview_last_message_id'):
+        if message_id and (sync_state.get(key) or 0) >= message_id:
+            sync_state[key] = message_id - 1
+            lowered = True
+    if lowered:
+        set_state(conn, 'sync_state', sync_state)
+    return existing
+
+
+def find_file_by_name(conn, name_fragment):
+    """Return (file_id, entry) of the first file whose name contains the fragment."""
+    row = conn.execute(
+        "SELECT * FROM downloaded_files WHERE instr(lower(filename), ?) > 0 LIMIT 1",
+        (name_fragment.lower(),)
+    ).fetchone()
+    return (row['file_id'], _row_to_dict(row, FILE_FIELDS)) if row else None
+
+
+def find_same_size_files(conn, file_size, file_name=None, mime_type=None, limit=5):
+    """
+    Return (file_id, entry) pairs of original downloads with exactly this size.
+
+    Entries with the same file name come first, then the same MIME type; files
+    with a different known MIME type are left out.
+    """
+    rows = conn.execute(
+        """SELECT * FROM downloaded_files
+           WHERE file_size = ? AND duplicate_of IS NULL AND preview_only IS NOT 1
+             AND (mime_type IS NULL OR ? IS NULL OR mime_type = ?)
+           ORDER BY filename = ? DESC, mime_type = ? DESC
+           LIMIT ?""",
+        (file_size, mime_type, mime_type, file_name, mime_type, limit)
+    )
+    return [(row['file_id'], _row_to_dict(row, FILE_FIELDS)) for row in rows]
+
+
+def find_file_by_hash(conn, content_hash):
+    """Return (file_id, entry) of the original download with this content hash, or None."""
+    row = conn.execute(
+        """SELECT * FROM downloaded_files
+           WHERE content_hash = ? AND duplicate_of IS NULL AND preview_only IS NOT 1 LIMIT 1""",
+        (content_hash,)
+    ).fetchone()
+    return (row['file_id'], _row_to_dict(row, FILE_FIELDS)) if row else None
+
+
+def count_files(conn):
+    return conn.execute("SELECT COUNT(*) FROM downloaded_files").fetchone()[0]
+
+
+def iter_files(conn, order_by=None, limit=None):
+    """Yield (file_id, entry) pairs, optionally sorted by an indexed column."""
+    sql = "SELECT * FROM downloaded_files"
+    if order_by:
+        sql += f" ORDER BY {order_by}"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    for row in conn.execute(sql):
+        yield row['file_id'], _row_to_dict(row, FILE_FIELDS)
+
+
+# Columns page_files can sort by (each has its own index on downloaded_files),
+# and whether they can hold NULL
+SORT_COLUMNS = {
+    'download_date': True,
+    'original_message_date': True,
+    'file_size': False,
+    'filename': True,
+}
+
+
+def page_files(conn, sort='download_date', descending=True, after=None, limit=20):
+    """
+    One page of tracker entries in index order (keyset pagination).
+
+    Each page continues from the last row of the previous one, so it is read
+    straight from the sort column's index: the first page of a million-entry
+    tracker costs the same as the hundredth, and nothing is sorted in memory.
+    Ties are broken by rowid, and entries without a value come last when
+    descending (first when ascending), as SQLite orders NULLs.
+
+    Args:
+        conn: Tracker store
+        sort: One of SORT_COLUMNS
+        descending: Largest/newest first
+        after: Cursor returned with the previous page (None for the first page)
+        limit: Entries per page
+
+    Returns:
+        (entries, cursor): list of (file_id, entry) pairs, and the cursor of
+        the next page (None after the last page)
+    """
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"Cannot sort by {sort!r}, expected one of {', '.join(SORT_COLUMNS)}")
+    op, direction = ('<', 'DESC') if descending else ('>', 'ASC')
+
+    # Where each remaining stretch of the order starts: the rows after the
+    # cursor among its own (NULL or non-NULL) values, then the other group
+    if after is None:
+        segments = [("1", [])]
+    elif after[0] is None:
+        segments = [(f"{sort} IS NULL AND rowid {op} ?", [after[1]])]
+        if not descending:
+            segments.append((f"{sort} IS NOT NULL", []))
+    else:
+        segments = [(f"({sort}, rowid) {op} (?, ?)", list(after))]
+        if descending and SORT_COLUMNS[sort]:
+            segments.append((f"{sort} IS NULL", []))
+
+    entries = []
+    last = None
+    for where, params in segments:
+        rows = conn.execute(
+            f"""SELECT rowid AS sort_rowid, * FROM downloaded_files WHERE {where}
+                ORDER BY {sort} {direction}, rowid {direction} LIMIT ?""",
+            params + [limit - len(entries)]
+        ).fetchall()
+        for row in rows:
+            entries.append((row['file_id'], _row_to_dict(row, FILE_FIELDS)))
+            last = row
+        if len(entries) == limit:
+            return entries, (last[sort], last['sort_rowid'])
+    return entries, None
+
+
+def search_files(conn, search_term, limit=None):
+    """
+    Return (file_id, entry) pairs matching a search, best matches first.
+
+    Every word of the search must start a word of the filename or message
+    text ("haem notes" finds "Haematology_Notes.pdf"). Without FTS5, or for a
+    search without words, entries containing the term anywhere are returned.
+
+    Args:
+        limit: Return at most this many entries (the best ones)
+    """
+    limit_sql = f" LIMIT {int(limit)}" if limit else ""
+    query = _fts_query(search_term)
+    if query and _has_search_index(conn):
+        # Filename hits weigh twice as much as caption hits
+        rows = conn.execute(
+            """SELECT d.* FROM files_fts JOIN downloaded_files d ON d.rowid = files_fts.rowid
+               WHERE files_fts MATCH ? ORDER BY bm25(files_fts, 2.0, 1.0)""" + limit_sql,
+            (query,)
+        )
+        return [(row['file_id'], _row_to_dict(row, FILE_FIELDS)) for row in rows]
+
+    term = search_term.lower()
+    rows = conn.execute(
+        """SELECT * FROM downloaded_files
+           WHERE instr(lower(filename), ?) > 0 OR instr(lower(message_text), ?) > 0""" + limit_sql,
+        (term, term)
+    )
+    return [(row['file_id'], _row_to_dict(row, FILE_FIELDS)) for row in rows]
+
+
+def reset_files(conn):
+    """Forget every tracked file."""
+    conn.execute("DELETE FROM downloaded_files")
+    set_state(conn, 'statistics', {'total_downloads': 0, 'last_download_date': None})
+    conn.execute("DELETE FROM state WHERE key = 'sync_state'")
+
+
+# ---------------------------------------------------------------------------
+# File metadata
+# ---------------------------------------------------------------------------
+
+def get_metadata(conn, filename):
+    row = conn.execute(
+        "SELECT * FROM file_metadata WHERE filename = ?", (filename,)
+    ).fetchone()
+    return _row_to_dict(row, METADATA_FIELDS) if row else None
+
+
+def put_metadata(conn, filename, info):
+    """Insert or replace the metadata of a downloaded file."""
+    info = dict(info)
+    info.setdefault('message_text', '')
+    values, extra = _split_extra(info, METADATA_FIELDS)
+    conn.execute(
+        f"""INSERT INTO file_metadata (filename, {', '.join(METADATA_FIELDS)}, extra)
+            VALUES (?, {', '.join('?' for _ in METADATA_FIELDS)}, ?)
+            ON CONFLICT(filename) DO UPDATE SET
+            {', '.join(f'{field} = excluded.{field}' for field in METADATA_FIELDS)},
+            extra = excluded.extra""",
+        [filename, *values, extra]
+    )
+
+
+def count_metadata(conn):
+    return conn.execute("SELECT COUNT(*) FROM file_metadata").fetchone()[0]
+
+
+def iter_metadata(conn):
+    """Yield (filename, metadata) pairs."""
+    for row in conn.execute("SELECT * FROM file_metadata"):
+        yield row['filename'], _row_to_dict(row, METADATA_FIELDS)
+
+
+def search_metadata(conn, search_term, search_in='text'):
+    """
+    Return (filename, metadata) pairs matching a term.
+
+    Args:
+        search_term: Term to search for (case-insensitive)
+        search_in: 'text', 'filename', or 'both'
+
+    Matches words by prefix, best first, like search_files.
+    """
+    query = _fts_query(search_term)
+    if query and _has_search_index(conn) and search_in in ('text', 'filename', 'both'):
+        column = {'text': 'message_text', 'filename': 'filename'}.get(search_in)
+        rows = conn.execute(
+            """SELECT m.* FROM metadata_fts JOIN file_metadata m ON m.rowid = metadata_fts.rowid
+               WHERE metadata_fts MATCH ? ORDER BY bm25(metadata_fts, 2.0, 1.0)""",
+            (f"{{{column}}} : ({query})" if column else query,)
+        )
+        return [(row['filename'], _row_to_dict(row, METADATA_FIELDS)) for row in rows]
+
+    term = search_term.lower()
+    conditions = []
+    params = []
+    if search_in in ['text', 'both']:
+        conditions.append("instr(lower(message_text), ?) > 0")
+        params.append(term)
+    if search_in in ['filename', 'both']:
+        conditions.append("instr(lower(filename), ?) > 0")
+        params.append(term)
+    if not conditions:
+        return []
+
+    rows = conn.execute(
+        f"SELECT * FROM file_metadata WHERE {' OR '.join(conditions)}", params
+    )
+    return [(row['filename'], _row_to_dict(row, METADATA_FIELDS)) for row in rows]
+
+
+# ---------------------------------------------------------------------------
+# Channel index (message_index): every media message, downloaded or not
+# ---------------------------------------------------------------------------
+
+INDEX_FIELDS = [
+    'message_id', 'file_id', 'file_name', 'mime_type', 'file_size',
+    'message_date', 'message_text', 'indexed_date',
+]
+
+
+def put_index_entries(conn, entries):
+    """Insert or replace index rows (dicts with INDEX_FIELDS keys) in one statement."""
+    conn.executemany(
+        f"INSERT OR REPLACE INTO message_index ({', '.join(INDEX_FIELDS)}) "
+        f"VALUES ({', '.join('?' for _ in INDEX_FIELDS)})",
+        [[entry.get(field) for field in INDEX_FIELDS] for entry in entries]
+    )
+
+
+def undownloaded_message_ids(conn, min_id=0):
+    """Message IDs in the index (newest first) whose file was not fully downloaded yet."""
+    rows = conn.execute(
+        """SELECT i.message_id FROM message_index i
+           LEFT JOIN downloaded_files d ON d.file_id = i.file_id
+           WHERE i.message_id > ? AND (d.file_id IS NULL OR d.preview_only IS 1)
+           ORDER BY i.message_id DESC""",
+        (min_id,)
+    )
+    return [row['message_id'] for row in rows]
+
+
+def index_summary(conn):
+    """
+    Summarise the channel index.
+
+    Returns:
+        dict with 'messages', 'bytes', 'pending', 'pending_bytes' (not downloaded
+        yet) and 'by_type': [(mime_type, count, bytes)], largest first
+    """
+    pending = """LEFT JOIN downloaded_files d ON d.file_id = i.file_id
+                 WHERE d.file_id IS NULL OR d.preview_only IS 1"""
+    messages, total = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(file_size), 0) FROM message_index").fetchone()
+    pending_count, pending_bytes = conn.execute(
+        f"SELECT COUNT(*), COALESCE(SUM(i.file_size), 0) FROM message_index i {pending}").fetchone()
+    by_type = conn.execute(
+        """SELECT COALESCE(mime_type, 'unknown'), COUNT(*), SUM(file_size) AS total
+           FROM message_index GROUP BY mime_type ORDER BY total DESC"""
+    ).fetchall()
+    return {
+        'messages': messages,
+        'bytes': total,
+        'pending': pending_count,
+        'pending_bytes': pending_bytes,
+        'by_type': [tuple(row) for row in by_type],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Small JSON values: statistics, sync state
+# ---------------------------------------------------------------------------
+
+def get_state(conn, key, default=None):
+    row = conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+    return json.loads(row['value']) if row else default
+
+
+def set_state(conn, key, value):
+    conn.execute(
+        "INSERT INTO state (key, value) VALUES (?, ?) "
+        "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+        (key, json.dumps(value, ensure_ascii=False))
+    )
+
+
+def get_statistics(conn):
+    return get_state(conn, 'statistics', {'total_downloads': 0, 'last_download_date': None})
+
+
+# ---------------------------------------------------------------------------
+# JSON migration and export
+# ---------------------------------------------------------------------------
+
+def migrate_from_json(conn, channel_folder):
+    """
+    Import the JSON tracker and metadata (plus pending journal events).
+
+    Existing database rows with the same keys are overwritten.
+
+    Returns:
+        Number of tracker entries imported
+    """
+    metadata, tracker = load_state(channel_folder)
+    files = tracker.get('downloaded_files', {})
+
+    with conn:
+        for file_id, info in files.items():
+            values, extra = _split_extra(
+                {'message_text': '', 'file_size': 0, **info}, FILE_FIELDS
+            )
+            conn.execute(
+                f"INSERT OR REPLACE INTO downloaded_files (file_id, {', '.join(FILE_FIELDS)}, extra) "
+                f"VALUES (?, {', '.join('?' for _ in FILE_FIELDS)}, ?)",
+                [file_id, *values, extra]
+            )
+
+        for filename, info in metadata.items():
+            put_metadata(conn, filename, info)
+
+        stats = dict(tracker.get('statistics', {}))
+        stats['total_downloads'] = count_files(conn)
+        stats.setdefault('last_download_date', None)
+        set_state(conn, 'statistics', stats)
+
+        # Keep any other top-level tracker sections (e.g. sync_state)
+        for key, value in tracker.items():
+            if key not in ('downloaded_files', 'statistics'):
+                set_state(conn, key, value)
+
+    return len(files)
+
+
+def export_to_json(conn, channel_folder):
+    """Write the database back out as downloaded_files_tracker.json and file_metadata.json."""
+    tracker = {
+        'downloaded_files': dict(iter_files(conn)),
+        'statistics': get_statistics(conn),
+    }
+    for row in conn.execute("SELECT key, value FROM state WHERE key != 'statistics'"):
+        tracker[row['key']] = json.loads(row['value'])
+
+    metadata = dict(iter_metadata(conn))
+    save_snapshot(channel_folder, tracker=tracker, metadata=metadata)
+    return len(tracker['downloaded_files'])
+
+
+def print_index_summary(conn):
+    summary = index_summary(conn)
+    print(f"Indexed media messages: {summary['messages']} ({summary['bytes'] / (1024 ** 3):.2f} GB)")
+    print(f"Not downloaded yet: {summary['pending']} ({summary['pending_bytes'] / (1024 ** 3):.2f} GB)")
+    for mime_type, count, size in summary['by_type'][:10]:
+        print(f"  {mime_type[:45]:<45} {count:>7}  {size / (1024 * 1024):>10.1f} MB")
+
+
+def main():
+    if len(sys.argv) != 3 or sys.argv[1] not in ('migrate', 'export', 'index'):
+        print("Usage:")
+        print("  python tracker_store.py migrate <channel_folder>   # JSON -> tracker.db")
+        print("  python tracker_store.py export <channel_folder>    # tracker.db -> JSON")
+        print("  python tracker_store.py index <channel_folder>     # summary of the channel index")
+        return
+
+    command, channel_folder = sys.argv[1], sys.argv[2]
+    if not os.path.isdir(channel_folder):
+        print(f"Channel folder not found: {channel_folder}")
+        return
+
+    existed = os.path.exists(db_path(channel_folder))
+    conn = open_store(channel_folder)
+
+    if command == 'index':
+        print_index_summary(conn)
+    elif command == 'migrate':
+        if existed:
+            count = migrate_from_json(conn, channel_folder)
+            print(f"✓ Migrated {count} tracked files from JSON into {db_path(channel_folder)}")
+    else:
+        count = export_to_json(conn, channel_folder)
+        print(f"✓ Exported {count} tracked files to {os.path.join(channel_folder, TRACKER_FILE)}")
+
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,64 +3,46 @@
 Update the download tracker with message text from metadata file.
 """
 
-import json
 import os
 
+import tracker_store
+
 def update_tracker_with_messages(channel_folder):
     """Add message text to tracker from metadata file."""
     
-    tracker_file = os.path.join(channel_folder, 'downloaded_files_tracker.json')
-    metadata_file = os.path.join(channel_folder, 'file_metadata.json')
-    
     # Check if files exist
-    if not os.path.exists(tracker_file):
-        print(f"Tracker file not found: {tracker_file}")
+    if not tracker_store.has_tracker(channel_folder):
+        print(f"Tracker not found in: {channel_folder}")
         return
     
-    if not os.path.exists(metadata_file):
-        print(f"Metadata file not found: {metadata_file}")
+    store = tracker_store.open_store(channel_folder)
+    if not tracker_store.count_metadata(store):
+        print(f"No file metadata found in: {channel_folder}")
         print("Note: Message text can only be added for files that have metadata.")
+        store.close()
         return
     
-    # Load both files
-    with open(tracker_file, 'r', encoding='utf-8') as f:
-        tracker = json.load(f)
-    
-    with open(metadata_file, 'r', encoding='utf-8') as f:
-        metadata = json.load(f)
-    
-    # Create a mapping of filename to metadata
-    filename_to_metadata = {filename: data for filename, data in metadata.items()}
-    
-    # Update tracker entries
-    updated_count = 0
-    added_empty_count = 0
-    for file_id, info in tracker['downloaded_files'].items():
-        filename = info.get('filename')
+    with store:
+        # Add/update message text and file size from the metadata with the same filename
+        updated_count = store.execute("""
+            UPDATE downloaded_files
+            SET message_text = COALESCE(
+                    (SELECT m.message_text FROM file_metadata m WHERE m.filename = downloaded_files.filename), ''),
+                file_size = COALESCE(
+                    (SELECT m.file_size FROM file_metadata m WHERE m.filename = downloaded_files.filename),
+                    file_size)
+            WHERE filename IN (SELECT filename FROM file_metadata)
+        """).rowcount
         
-        # Try to find matching metadata
-        if filename and filename in filename_to_metadata:
-            meta = filename_to_metadata[filename]
-            
-            # Add/update message text and file size
-            info['message_text'] = meta.get('message_text', '')
-            if 'file_size' in meta:
-                info['file_size'] = meta['file_size']
-            updated_count += 1
-        else:
-            # Add empty message text field for files without metadata
-            if 'message_text' not in info:
-                info['message_text'] = ''
-                added_empty_count += 1
-    
-    # Save updated tracker
-    with open(tracker_file, 'w', encoding='utf-8') as f:
-        json.dump(tracker, f, indent=2, ensure_ascii=False)
+        # message_text is NOT NULL DEFAULT '': files without a caption have ''
+        empty_count = store.execute(
+            "SELECT COUNT(*) FROM downloaded_files WHERE message_text = ''"
+        ).fetchone()[0]
     
     print(f"✓ Updated {updated_count} files with message text from metadata")
-    print(f"✓ Added empty message_text field to {added_empty_count} files")
-    print(f"✓ Total updated: {updated_count + added_empty_count} files")
-    print(f"✓ Tracker saved: {tracker_file}")
+    print(f"✓ Files without message text: {empty_count}")
+    print(f"✓ Tracker saved: {tracker_store.db_path(channel_folder)}")
+    store.close()
 
 def main():
     channel_folder = "Malcom Skylar"